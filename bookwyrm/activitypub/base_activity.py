@@ -12,7 +12,7 @@ from django.db import IntegrityError, transaction
 from django.utils.http import http_date
 
 from bookwyrm import models
-from bookwyrm.connectors import ConnectorException, get_data
+from bookwyrm.connectors import ConnectorException, fetch_client, get_data
 from bookwyrm.models import base_model
 from bookwyrm.signatures import make_signature
 from bookwyrm.settings import DOMAIN, INSTANCE_ACTOR_USERNAME
@@ -232,7 +232,7 @@ class ActivityObject:
                 )
         return instance
 
-    def serialize(self, **kwargs):
+    def serialize(self, **kwargs: Any) -> dict[str, Any]:
         """convert to dictionary with context attr"""
         omit = kwargs.get("omit", ())
         data = self.__dict__.copy()
@@ -416,7 +416,7 @@ def get_activitypub_data(url):
         # this shouldn't happen. it would be bad if it happened.
         raise ValueError("No private key found for sender")
     try:
-        resp = requests.get(
+        resp = fetch_client.get_session().get(
             url,
             headers={
                 # pylint: disable=line-too-long
@@ -1,19 +1,68 @@
 """ access the activity streams stored in redis """
+from collections import Counter, defaultdict
 from datetime import timedelta
+import json
+import time
+
 from django.dispatch import receiver
 from django.db import transaction
 from django.db.models import signals, Q
 from django.utils import timezone
 from opentelemetry import trace
 
-from bookwyrm import models
+from bookwyrm import models, settings
+from bookwyrm.audience_index import audience_index
 from bookwyrm.redis_store import RedisStore, r
+from bookwyrm.status_cache import (
+    get_hydrated_statuses,
+    get_status_versions,
+    hydrate_statuses,
+    invalidate_status,
+)
 from bookwyrm.tasks import app, STREAMS, IMPORT_TRIGGERED
 from bookwyrm.telemetry import open_telemetry
 
 
 tracer = open_telemetry.tracer()
 
+# the most statuses a single batch task will add to streams
+STREAMS_BATCH_SIZE = 500
+# how long to wait for a scheduled batch task before allowing another to be queued
+STREAMS_BATCH_SCHEDULE_TIMEOUT = 300
+# how many times to go back to redis for a page of statuses, when some are filtered
+STREAM_PAGE_MAX_READS = 5
+
+
+class StreamPage:
+    """a page of a stream, with cursors for the pages on either side"""
+
+    def __init__(self, statuses_with_cursors, has_next=False, has_previous=False):
+        self.object_list = [status for (status, _) in statuses_with_cursors]
+        cursors = [cursor for (_, cursor) in statuses_with_cursors]
+        self.has_next = has_next and bool(cursors)
+        self.has_previous = has_previous and bool(cursors)
+        # older statuses are loaded with "before", newer ones with "after"
+        self.next_cursor = cursors[-1] if cursors else None
+        self.previous_cursor = cursors[0] if cursors else None
+
+    def has_other_pages(self):
+        """is there anywhere to go from this page"""
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+def get_stream_cursor(rank, status_id):
+    """where a status is in a stream, as a string for the query string"""
+    return f"{rank!r}_{int(status_id)}"
+
 
 class ActivityStream(RedisStore):
     """a category of activity stream (like home, local, books)"""
@@ -56,6 +105,32 @@ class ActivityStream(RedisStore):
         # and go!
         pipeline.execute()
 
+    def add_statuses(self, statuses):
+        """add a batch of statuses to users' feeds, takes (status, increment_unread)
+        pairs and returns the number of feeds that were updated"""
+        values_by_store = defaultdict(dict)
+        unread = Counter()
+        unread_by_type = defaultdict(Counter)
+        for status, increment_unread in statuses:
+            audience = self.get_audience(status)
+            for user_id in audience:
+                values_by_store[self.stream_id(user_id)].update(self.get_value(status))
+                if increment_unread:
+                    unread[user_id] += 1
+                    unread_by_type[user_id][get_status_type(status)] += 1
+
+        # one zadd and one trim per feed, no matter how many statuses it gets
+        pipeline = self.add_objects_to_stores(values_by_store, execute=False)
+        for user_id, count in unread.items():
+            pipeline.incrby(self.unread_id(user_id), count)
+        for user_id, status_types in unread_by_type.items():
+            for status_type, count in status_types.items():
+                pipeline.hincrby(
+                    self.unread_by_status_type_id(user_id), status_type, count
+                )
+        pipeline.execute()
+        return len(values_by_store)
+
     def add_user_statuses(self, viewer, user):
         """add a user's statuses to another user's feed"""
         # only add the statuses that the viewer should be able to see (ie, not dms)
@@ -75,19 +150,58 @@ class ActivityStream(RedisStore):
         r.delete(self.unread_by_status_type_id(user.id))
 
         statuses = self.get_store(self.stream_id(user.id))
-        return (
-            models.Status.objects.select_subclasses()
-            .filter(id__in=statuses)
-            .select_related(
-                "user",
-                "reply_parent",
-                "comment__book",
-                "review__book",
-                "quotation__book",
+        return hydrate_statuses(statuses).order_by("-published_date")
+
+    # pylint: disable=too-many-arguments
+    def get_activity_stream_page(
+        self, user, before=None, after=None, queryset_filter=None, page_length=None
+    ):
+        """load one page of statuses older than "before" or newer than "after",
+        both of which are (rank, status id) cursors from a previous page.
+        queryset_filter is an optional function that narrows down which statuses
+        can be shown"""
+        # clear unreads for this feed
+        r.set(self.unread_id(user.id), 0)
+        r.delete(self.unread_by_status_type_id(user.id))
+
+        page_length = page_length or settings.PAGE_LENGTH
+        store = self.stream_id(user.id)
+        # one extra so we know whether there is anything beyond this page
+        count = page_length + 1
+        found = []
+        for _ in range(STREAM_PAGE_MAX_READS):
+            values = self.get_store_page(store, count, before=before, after=after)
+            if not values:
+                break
+            queryset = models.Status.objects.filter(
+                id__in=[int(v) for (v, _) in values]
             )
-            .prefetch_related("mention_books", "mention_users")
-            .order_by("-published_date")
-        )
+            if queryset_filter:
+                queryset = queryset_filter(queryset)
+            # only ids and edit dates are queried, the rest can be cached
+            statuses = get_hydrated_statuses(get_status_versions(queryset))
+            found += [
+                (statuses[int(v)], get_stream_cursor(rank, v))
+                for (v, rank) in values
+                if int(v) in statuses
+            ]
+            # there's nothing more to read, or we have enough statuses
+            if len(values) < count or len(found) >= count:
+                break
+            # statuses were filtered out, keep reading from where we stopped
+            last_value, last_rank = values[-1]
+            if after is not None:
+                after = (last_rank, int(last_value))
+            else:
+                before = (last_rank, int(last_value))
+
+        has_more = len(found) > page_length
+        found = found[:page_length]
+        if after is not None:
+            # newer statuses were read oldest first
+            found.reverse()
+            return StreamPage(found, has_next=True, has_previous=has_more)
+        return StreamPage(found, has_next=has_more, has_previous=before is not None)
 
     def get_unread_count(self, user):
         """get the unread status count for this user's feed"""
@@ -148,11 +262,18 @@ class ActivityStream(RedisStore):
             )
         return audience.distinct()
 
+    def _get_indexed_audience(self, status):  # pylint: disable=no-self-use
+        """the ids from _get_audience, resolved from the audience index"""
+        return audience_index.get_audience(status)
+
     @tracer.start_as_current_span("ActivityStream.get_audience")
     def get_audience(self, status):
         """given a status, what users should see it"""
         trace.get_current_span().set_attribute("stream_id", self.key)
-        audience = self._get_audience(status).values_list("id", flat=True)
+        if audience_index.enabled:
+            audience = self._get_indexed_audience(status)
+        else:
+            audience = self._get_audience(status).values_list("id", flat=True)
         status_author = models.User.objects.filter(
             is_active=True, local=True, id=status.user.id
         ).values_list("id", flat=True)
@@ -182,11 +303,20 @@ class HomeStream(ActivityStream):
     @tracer.start_as_current_span("HomeStream.get_audience")
     def get_audience(self, status):
         trace.get_current_span().set_attribute("stream_id", self.key)
-        audience = super()._get_audience(status)
-        if not audience:
-            return []
-        # if the user is following the author
-        audience = audience.filter(following=status.user).values_list("id", flat=True)
+        if audience_index.enabled:
+            audience = super()._get_indexed_audience(status)
+            if not audience:
+                return []
+            # if the user is following the author
+            audience = audience & audience_index.get_followers(status.user.id)
+        else:
+            audience = super()._get_audience(status)
+            if not audience:
+                return []
+            # if the user is following the author
+            audience = audience.filter(following=status.user).values_list(
+                "id", flat=True
+            )
         # if the user is the post's author
         status_author = models.User.objects.filter(
             is_active=True, local=True, id=status.user.id
@@ -230,19 +360,32 @@ class BooksStream(ActivityStream):
 
     key = "books"
 
-    def _get_audience(self, status):
-        """anyone with the mentioned book on their shelves"""
-        work = (
+    def get_work(self, status):  # pylint: disable=no-self-use
+        """the work a status is about"""
+        return (
             status.book.parent_work
             if hasattr(status, "book")
             else status.mention_books.first().parent_work
         )
 
+    def _get_audience(self, status):
+        """anyone with the mentioned book on their shelves"""
+        work = self.get_work(status)
+
         audience = super()._get_audience(status)
         if not audience:
             return models.User.objects.none()
         return audience.filter(shelfbook__book__parent_work=work).distinct()
 
+    def _get_indexed_audience(self, status):
+        audience = super()._get_indexed_audience(status)
+        if not audience:
+            return audience
+        shelvers = models.ShelfBook.objects.filter(
+            book__parent_work=self.get_work(status)
+        ).values_list("user_id", flat=True)
+        return audience & set(shelvers)
+
     def get_audience(self, status):
         # only show public statuses on the books feed,
         # and only statuses that mention books
@@ -325,6 +468,9 @@ def add_status_on_create(sender, instance, created, *args, **kwargs):
     if not issubclass(sender, models.Status):
         return
 
+    # anything about the status may have changed
+    invalidate_status(instance.id)
+
     if instance.deleted:
         remove_status_task.delay(instance.id)
         return
@@ -358,20 +504,61 @@ def add_status_on_create_command(sender, instance, created):
         # an out of date remote status is a low priority but should be added
         priority = IMPORT_TRIGGERED
 
-    add_status_task.apply_async(
-        args=(instance.id,),
-        kwargs={"increment_unread": created},
-        queue=priority,
-    )
+    if settings.STREAMS_BATCH_DELAY:
+        queue_status_for_batch(instance.id, created, priority)
+    else:
+        add_status_task.apply_async(
+            args=(instance.id,),
+            kwargs={"increment_unread": created},
+            queue=priority,
+        )
 
     if sender == models.Boost:
         handle_boost_task.delay(instance.id)
 
 
+def batch_id(queue):
+    """the redis key for statuses waiting to be added to streams"""
+    return f"add-status-batch-{queue}"
+
+
+def batch_scheduled_id(queue):
+    """the redis key that is set while a batch task is waiting to run"""
+    return f"add-status-batch-{queue}-scheduled"
+
+
+def queue_status_for_batch(status_id, increment_unread, queue):
+    """buffer a status so that it's added to streams along with its neighbors"""
+    r.rpush(
+        batch_id(queue),
+        json.dumps(
+            {
+                "id": status_id,
+                "increment_unread": increment_unread,
+                "queued": time.time(),
+            }
+        ),
+    )
+    schedule_status_batch(queue, settings.STREAMS_BATCH_DELAY)
+
+
+def schedule_status_batch(queue, countdown):
+    """make sure there's a task on its way to process the buffer"""
+    # the expiry means a lost task can't stall the buffer indefinitely
+    expiry = countdown + STREAMS_BATCH_SCHEDULE_TIMEOUT
+    if r.set(batch_scheduled_id(queue), 1, nx=True, ex=expiry):
+        add_status_batch_task.apply_async(
+            args=(queue,),
+            countdown=countdown,
+            queue=queue,
+        )
+
+
 @receiver(signals.post_delete, sender=models.Boost)
 # pylint: disable=unused-argument
 def remove_boost_on_delete(sender, instance, *args, **kwargs):
     """boosts are deleted"""
+    invalidate_status(instance.id)
     # remove the boost
     remove_status_task.delay(instance.id)
     # re-add the original status
@@ -382,6 +569,12 @@ def remove_boost_on_delete(sender, instance, *args, **kwargs):
 # pylint: disable=unused-argument
 def add_statuses_on_follow(sender, instance, created, *args, **kwargs):
     """add a newly followed user's statuses to feeds"""
+    if created and audience_index.enabled:
+        transaction.on_commit(
+            lambda: audience_index.add_follow(
+                instance.user_subject, instance.user_object
+            )
+        )
     if not created or not instance.user_subject.local:
         return
     add_user_statuses_task.delay(
@@ -393,6 +586,12 @@ def add_statuses_on_follow(sender, instance, created, *args, **kwargs):
 # pylint: disable=unused-argument
 def remove_statuses_on_unfollow(sender, instance, *args, **kwargs):
     """remove statuses from a feed on unfollow"""
+    if audience_index.enabled:
+        transaction.on_commit(
+            lambda: audience_index.remove_follow(
+                instance.user_subject, instance.user_object
+            )
+        )
     if not instance.user_subject.local:
         return
     remove_user_statuses_task.delay(
@@ -404,6 +603,13 @@ def remove_statuses_on_unfollow(sender, instance, *args, **kwargs):
 # pylint: disable=unused-argument
 def remove_statuses_on_block(sender, instance, *args, **kwargs):
     """remove statuses from all feeds on block"""
+    if audience_index.enabled:
+        transaction.on_commit(
+            lambda: audience_index.add_block(
+                instance.user_subject, instance.user_object
+            )
+        )
+
     # blocks apply ot all feeds
     if instance.user_subject.local:
         remove_user_statuses_task.delay(
@@ -428,6 +634,13 @@ def add_statuses_on_unblock(sender, instance, *args, **kwargs):
     ).exists():
         return
 
+    if audience_index.enabled:
+        transaction.on_commit(
+            lambda: audience_index.remove_block(
+                instance.user_subject, instance.user_object
+            )
+        )
+
     public_streams = [k for (k, v) in streams.items() if k != "home"]
 
     # add statuses back to streams with statuses from anyone
@@ -451,6 +664,8 @@ def add_statuses_on_unblock(sender, instance, *args, **kwargs):
 # pylint: disable=unused-argument
 def populate_streams_on_account_create(sender, instance, created, *args, **kwargs):
     """build a user's feeds when they join"""
+    if instance.local and audience_index.enabled:
+        transaction.on_commit(lambda: audience_index.add_user(instance))
     if not created or not instance.local:
         return
     transaction.on_commit(
@@ -551,6 +766,49 @@ def add_status_task(status_id, increment_unread=False):
         stream.add_status(status, increment_unread=increment_unread)
 
 
+@app.task(queue=STREAMS)
+def add_status_batch_task(queue=STREAMS):
+    """add all the buffered statuses to any stream they should be in"""
+    with tracer.start_as_current_span("add_status_batch_task") as span:
+        # clear the flag first so anything queued from now on gets its own task
+        r.delete(batch_scheduled_id(queue))
+        pipeline = r.pipeline()
+        pipeline.lrange(batch_id(queue), 0, STREAMS_BATCH_SIZE - 1)
+        pipeline.ltrim(batch_id(queue), STREAMS_BATCH_SIZE, -1)
+        pipeline.llen(batch_id(queue))
+        entries, _, remaining = pipeline.execute()
+        if remaining:
+            schedule_status_batch(queue, 0)
+
+        # a status may have been queued more than once
+        increment_unread = defaultdict(bool)
+        queued = []
+        for entry in entries:
+            entry = json.loads(entry)
+            increment_unread[entry["id"]] |= entry["increment_unread"]
+            queued.append(entry["queued"])
+        if not queued:
+            return
+
+        # a status deleted since it was queued has already been taken out of streams
+        statuses = models.Status.objects.select_subclasses().filter(
+            id__in=list(increment_unread), deleted=False
+        )
+        # don't tick the unread count for csv import statuses, as in add_status_task
+        old_date = timezone.now() - timedelta(days=2)
+        batch = [
+            (s, increment_unread[s.id] and s.created_date >= old_date) for s in statuses
+        ]
+
+        store_count = 0
+        for stream in streams.values():
+            store_count += stream.add_statuses(batch)
+
+        span.set_attribute("batch_size", len(batch))
+        span.set_attribute("store_count", store_count)
+        span.set_attribute("fan_out_latency", time.time() - min(queued))
+
+
 @app.task(queue=STREAMS)
 def remove_user_statuses_task(viewer_id, user_id, stream_list=None):
     """remove all statuses by a user from a viewer's stream"""
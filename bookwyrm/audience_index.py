@@ -0,0 +1,177 @@
+""" precomputed follower and block sets used to resolve status audiences """
+from django.db.models import Q
+
+from bookwyrm import models, settings
+from bookwyrm.redis_store import r
+
+
+class AudienceIndex:
+    """redis sets of local user ids, kept up to date by relationship signals,
+    so that working out who sees a status is set algebra instead of a join"""
+
+    local_users_key = "audience-local-users"
+
+    def followers_id(self, user_id):  # pylint: disable=no-self-use
+        """the redis key for the local users who follow this user"""
+        return f"{user_id}-audience-followers"
+
+    def blocks_id(self, user_id):  # pylint: disable=no-self-use
+        """the redis key for local users on either side of a block with this user"""
+        return f"{user_id}-audience-blocks"
+
+    @property
+    def enabled(self):  # pylint: disable=no-self-use
+        """should streams use the index instead of querying the database"""
+        return settings.ENABLE_AUDIENCE_INDEX
+
+    # ---- incremental maintenance
+
+    def add_user(self, user):
+        """a local user who can have feeds"""
+        if not user.local:
+            return
+        if user.is_active:
+            r.sadd(self.local_users_key, user.id)
+        else:
+            r.srem(self.local_users_key, user.id)
+
+    def add_follow(self, follower, followed):
+        """a user follows another user"""
+        if follower.local:
+            r.sadd(self.followers_id(followed.id), follower.id)
+
+    def remove_follow(self, follower, followed):
+        """a user stops following another user"""
+        r.srem(self.followers_id(followed.id), follower.id)
+
+    def add_block(self, blocker, blocked):
+        """blocks hide statuses in both directions"""
+        pipeline = r.pipeline()
+        if blocker.local:
+            pipeline.sadd(self.blocks_id(blocked.id), blocker.id)
+        if blocked.local:
+            pipeline.sadd(self.blocks_id(blocker.id), blocked.id)
+        pipeline.execute()
+
+    def remove_block(self, blocker, blocked):
+        """an unblock, once there are no blocks left in either direction"""
+        pipeline = r.pipeline()
+        pipeline.srem(self.blocks_id(blocked.id), blocker.id)
+        pipeline.srem(self.blocks_id(blocker.id), blocked.id)
+        pipeline.execute()
+
+    # ---- lookups
+
+    def get_audience(self, status):
+        """given a status, the ids of local users who could see it, excluding the
+        author; mirrors ActivityStream._get_audience"""
+        # direct messages don't appear in feeds, direct comments/reviews/etc do
+        if status.privacy == "direct" and status.status_type == "Note":
+            return set()
+
+        reply_parent = status.reply_parent
+        keys = [self.local_users_key, self.blocks_id(status.user.id)]
+        if status.privacy == "followers" or (
+            reply_parent and reply_parent.privacy == "followers"
+        ):
+            keys.append(self.followers_id(status.user.id))
+        if reply_parent and reply_parent.privacy == "followers":
+            keys.append(self.followers_id(reply_parent.user.id))
+
+        pipeline = r.pipeline()
+        for key in keys:
+            pipeline.smembers(key)
+        local_users, blocks, *followers = [
+            {int(i) for i in members} for members in pipeline.execute()
+        ]
+
+        # everybody who could plausibly see this status
+        audience = local_users - blocks
+
+        # only visible to the poster and mentioned users
+        if status.privacy == "direct":
+            return audience & set(status.mention_users.values_list("id", flat=True))
+
+        # don't show replies to statuses the user can't see
+        if reply_parent and reply_parent.privacy == "followers":
+            return audience & ({reply_parent.user.id} | (followers[0] & followers[1]))
+
+        # only visible to the poster's followers and tagged users
+        if status.privacy == "followers":
+            return audience & followers[0]
+        return audience
+
+    def get_followers(self, user_id):
+        """local followers of a user"""
+        return {int(i) for i in r.smembers(self.followers_id(user_id))}
+
+    # ---- rebuilding
+
+    def get_expected(self, user):  # pylint: disable=no-self-use
+        """what the database says a user's sets should contain"""
+        followers = user.followers.filter(local=True).values_list("id", flat=True)
+        blocks = models.User.objects.filter(
+            Q(blocks=user) | Q(blocked_by=user), local=True
+        ).values_list("id", flat=True)
+        return set(followers), set(blocks)
+
+    def rebuild_user(self, user, pipeline):
+        """re-create the sets for one user"""
+        followers, blocks = self.get_expected(user)
+        pipeline.delete(self.followers_id(user.id), self.blocks_id(user.id))
+        if followers:
+            pipeline.sadd(self.followers_id(user.id), *followers)
+        if blocks:
+            pipeline.sadd(self.blocks_id(user.id), *blocks)
+
+    def get_indexed_users(self):  # pylint: disable=no-self-use
+        """users who have local followers or blocks involving local users"""
+        return (
+            models.User.objects.filter(
+                Q(followers__local=True)
+                | Q(blocks__local=True)
+                | Q(blocked_by__local=True)
+            )
+            .distinct()
+            .order_by("id")
+        )
+
+    def rebuild(self):
+        """re-create the whole index from the database"""
+        pipeline = r.pipeline()
+        for key in r.scan_iter(match="*-audience-*"):
+            pipeline.delete(key)
+        pipeline.delete(self.local_users_key)
+        local_ids = models.User.objects.filter(local=True, is_active=True).values_list(
+            "id", flat=True
+        )
+        if local_ids:
+            pipeline.sadd(self.local_users_key, *local_ids)
+        pipeline.execute()
+
+        for user in self.get_indexed_users().iterator():
+            pipeline = r.pipeline()
+            self.rebuild_user(user, pipeline)
+            pipeline.execute()
+
+    def verify_user(self, user):
+        """names of the sets for this user which disagree with the database"""
+        followers, blocks = self.get_expected(user)
+        errors = []
+        if followers != self.get_followers(user.id):
+            errors.append(self.followers_id(user.id))
+        if blocks != {int(i) for i in r.smembers(self.blocks_id(user.id))}:
+            errors.append(self.blocks_id(user.id))
+        return errors
+
+    def verify_local_users(self):
+        """does the set of local users match the database"""
+        expected = set(
+            models.User.objects.filter(local=True, is_active=True).values_list(
+                "id", flat=True
+            )
+        )
+        return expected == {int(i) for i in r.smembers(self.local_users_key)}
+
+
+audience_index = AudienceIndex()
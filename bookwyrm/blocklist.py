@@ -0,0 +1,151 @@
+""" blocked servers and addresses, held in memory so that checking them is cheap """
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from django.apps import apps
+from django.db import transaction
+import redis
+
+from bookwyrm.redis_store import r
+
+logger = logging.getLogger(__name__)
+
+BLOCKLIST_CHANNEL = "blocklist-changed"
+# block lists are re-loaded at least this often (in seconds), in case a change
+# notification was missed
+BLOCKLIST_MAX_AGE = 60 * 5
+
+
+class Blocklist:
+    """a set of blocked values, loaded from the database once per process and
+    re-loaded when any process changes it"""
+
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+        self.values = None
+        self.loaded_at = 0
+        # counts invalidations, so a load that was running at the time is discarded
+        self.generation = 0
+        blocklists[name] = self
+
+    def can_cache(self):  # pylint: disable=no-self-use
+        """changes inside a transaction might be rolled back, so they can't be kept"""
+        return not transaction.get_connection().in_atomic_block
+
+    def get_values(self):
+        """the blocked values, loading them if need be"""
+        if not self.can_cache():
+            return frozenset(self.load())
+
+        listener.start()
+        values = self.values
+        if values is None or time.monotonic() - self.loaded_at > BLOCKLIST_MAX_AGE:
+            generation = self.generation
+            values = frozenset(self.load())
+            if generation == self.generation:
+                self.values = values
+                self.loaded_at = time.monotonic()
+        return values
+
+    def contains(self, value):
+        """is this exact value blocked"""
+        return value in self.get_values()
+
+    def invalidate(self):
+        """load the values again next time they're needed"""
+        self.generation += 1
+        self.values = None
+
+    def changed(self):
+        """the block list has been edited, which all the other processes need to
+        hear about once it's saved"""
+        self.invalidate()
+        transaction.on_commit(lambda: publish_change(self.name))
+
+
+class DomainBlocklist(Blocklist):
+    """blocked domains, which also block their subdomains"""
+
+    def is_blocked(self, url):
+        """is the domain of this url, or a domain it's part of, blocked"""
+        domain = urlparse(url).netloc
+        if not domain:
+            return False
+        values = self.get_values()
+        parts = domain.split(".")
+        return any(".".join(parts[i:]) in values for i in range(len(parts)))
+
+
+def publish_change(name):
+    """tell every process to re-load a block list"""
+    try:
+        r.publish(BLOCKLIST_CHANNEL, name)
+    except redis.exceptions.RedisError as err:
+        # other processes will catch up when their copy is BLOCKLIST_MAX_AGE old
+        logger.warning("Unable to publish %s block list change: %s", name, err)
+
+
+class BlocklistListener:
+    """a thread that listens for block list changes made by other processes"""
+
+    def __init__(self):
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """start listening, if this process isn't already"""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            # threads don't survive a fork, so each process needs its own
+            self.pid = os.getpid()
+            try:
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{BLOCKLIST_CHANNEL: self.handle_message})
+                pubsub.run_in_thread(
+                    sleep_time=1, daemon=True, exception_handler=self.handle_error
+                )
+            except redis.exceptions.RedisError as err:
+                logger.warning("Unable to listen for block list changes: %s", err)
+
+    def handle_message(self, message):  # pylint: disable=no-self-use
+        """another process changed a block list"""
+        name = message["data"].decode("utf8")
+        if name in blocklists:
+            blocklists[name].invalidate()
+
+    # pylint: disable=unused-argument
+    def handle_error(self, err, pubsub, thread):
+        """the connection was lost, so try again on the next lookup"""
+        logger.warning("Stopped listening for block list changes: %s", err)
+        thread.stop()
+        self.pid = None
+        # changes may have been missed in the meantime
+        for blocklist in blocklists.values():
+            blocklist.invalidate()
+
+
+def load_blocked_servers():
+    """the names of blocked servers"""
+    server_model = apps.get_model("bookwyrm.FederatedServer", require_ready=True)
+    return server_model.objects.filter(status="blocked").values_list(
+        "server_name", flat=True
+    )
+
+
+def load_blocked_addresses():
+    """blocked ip addresses"""
+    address_model = apps.get_model("bookwyrm.IPBlocklist", require_ready=True)
+    return address_model.objects.values_list("address", flat=True)
+
+
+blocklists = {}
+listener = BlocklistListener()
+blocked_servers = DomainBlocklist("servers", load_blocked_servers)
+blocked_addresses = Blocklist("addresses", load_blocked_addresses)
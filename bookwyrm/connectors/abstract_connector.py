@@ -1,23 +1,32 @@
 """ functionality outline for a book data connector """
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import Optional, TypedDict, Any, Callable, Union, Iterator
+from typing import Optional, TypedDict, Any, Callable, Union, Iterator, cast
 from urllib.parse import quote_plus
+from uuid import uuid4
 
 # pylint: disable-next=deprecated-module
 import imghdr  # Deprecated in 3.11 for removal in 3.13; no good alternative yet
 import logging
+import os
 import re
 import asyncio
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 import aiohttp
+from celery.signals import worker_process_shutdown
 
 from django.core.files.base import ContentFile
 from django.db import transaction
+from django.db.models import Model, Q
 
 from bookwyrm import activitypub, models, settings
-from bookwyrm.settings import USER_AGENT
+from bookwyrm.settings import (
+    FETCH_MAX_CONNECTIONS_PER_HOST,
+    FETCH_MAX_HOSTS,
+    USER_AGENT,
+)
 from .connector_manager import load_more_data, ConnectorException, raise_not_valid_url
 from .format_mappings import format_mappings
 from ..book_search import SearchResult
@@ -37,9 +46,10 @@ class ConnectorResults(TypedDict):
 class AbstractMinimalConnector(ABC):
     """just the bare bones, for other bookwyrm instances"""
 
-    def __init__(self, identifier: str):
+    def __init__(self, identifier: str, info: Optional[models.Connector] = None):
         # load connector settings
-        info = models.Connector.objects.get(identifier=identifier)
+        if info is None:
+            info = models.Connector.objects.get(identifier=identifier)
         self.connector = info
 
         # the things in the connector model to copy over
@@ -49,7 +59,7 @@ class AbstractMinimalConnector(ABC):
         self.search_url = info.search_url
         self.isbn_search_url = info.isbn_search_url
         self.name = info.name
-        self.identifier = info.identifier
+        self.identifier: str = info.identifier
 
     def get_search_url(self, query: str) -> str:
         """format the query url"""
@@ -131,8 +141,8 @@ class AbstractConnector(AbstractMinimalConnector):
 
     generated_remote_link_field = ""
 
-    def __init__(self, identifier: str):
-        super().__init__(identifier)
+    def __init__(self, identifier: str, info: Optional[models.Connector] = None):
+        super().__init__(identifier, info=info)
         # fields we want to look for in book data to copy over
         # title we handle separately.
         self.book_mappings: list[Mapping] = []
@@ -230,6 +240,123 @@ class AbstractConnector(AbstractMinimalConnector):
 
         return edition
 
+    # pylint: disable=too-many-locals
+    def create_editions_from_data(
+        self, work: models.Work, editions_data: list[Union[str, JsonDict]]
+    ) -> list[models.Edition]:
+        """add lots of editions of a work at once, looking up existing editions and
+        authors for all of them together instead of one by one"""
+        activities = []
+        for edition_data in editions_data:
+            if isinstance(edition_data, str):
+                # We don't expect a string here
+                continue
+            mapped_data = dict_from_mappings(edition_data, self.book_mappings)
+            # the work is already loaded, so don't look it up again for each edition
+            mapped_data["work"] = ""
+            # covers are downloaded once the editions are saved, so that the
+            # transaction isn't held open while waiting for them
+            cover = mapped_data.pop("cover", None)
+            try:
+                activity = activitypub.Edition(**mapped_data)
+            except activitypub.ActivitySerializerError:
+                continue
+            activities.append((edition_data, activity, activity.serialize(), cover))
+
+        existing = models.Edition.find_existing_many(
+            [serialized for (_, _, serialized, _) in activities]
+        )
+        authors = self.get_authors_for_editions(
+            [edition_data for (edition_data, _, _, _) in activities]
+        )
+
+        editions: list[models.Edition] = []
+        editions_authors: list[list[models.Author]] = []
+        covers: dict[models.Edition, str] = {}
+        created: dict[tuple[str, Any], models.Edition] = {}
+        with transaction.atomic():
+            for ((_, activity, serialized, cover), found, edition_authors) in zip(
+                activities, existing, authors
+            ):
+                dedupe_values = models.Edition.get_deduplication_values(serialized)
+                # two of the new editions may be the same book
+                found = found or next(
+                    (created[value] for value in dedupe_values if value in created),
+                    None,
+                )
+                edition = activity.to_model(
+                    model=models.Edition,
+                    overwrite=False,
+                    instance=found or models.Edition(),
+                    save=bool(found),
+                )
+                if not edition:
+                    continue
+                if not found:
+                    edition.parent_work = work
+                    edition.connector = self.connector
+                    edition.save(broadcast=False)
+                    created.update({value: edition for value in dedupe_values})
+                elif not edition.parent_work_id:
+                    edition.parent_work = work
+                    edition.save(broadcast=False, update_fields=["parent_work"])
+
+                if not edition.connector_id:
+                    edition.connector = self.connector
+                    edition.save(broadcast=False, update_fields=["connector"])
+                editions.append(edition)
+                editions_authors.append(edition_authors)
+                if cover and not edition.cover:
+                    covers.setdefault(edition, cover)
+
+            add_edition_authors(work, editions, editions_authors)
+            # the search vector was calculated before the authors were added
+            models.Book.objects.filter(
+                id__in=[edition.id for edition in created.values()]
+            ).update(search_vector=None)
+
+        for (edition, cover) in covers.items():
+            add_cover(edition, cover)
+        return editions
+
+    def get_authors_for_editions(
+        self, editions_data: list[JsonDict]
+    ) -> list[list[models.Author]]:
+        """the authors of each edition, looking up the ones we already have all
+        together"""
+        remote_ids = [
+            self.get_author_remote_ids(edition_data) for edition_data in editions_data
+        ]
+        all_remote_ids = {
+            remote_id for values in remote_ids if values for remote_id in values
+        }
+        loaded: dict[str, Optional[models.Author]] = {}
+        for author in models.Author.objects.filter(
+            Q(remote_id__in=all_remote_ids) | Q(origin_id__in=all_remote_ids)
+        ):
+            loaded[author.remote_id] = author
+            if author.origin_id:
+                loaded[author.origin_id] = author
+
+        authors: list[list[models.Author]] = []
+        for (edition_data, author_ids) in zip(editions_data, remote_ids):
+            if author_ids is None:
+                # this connector can only load authors one edition at a time
+                authors.append(list(self.get_authors_from_data(edition_data)))
+                continue
+            for remote_id in author_ids:
+                if remote_id not in loaded:
+                    loaded[remote_id] = self.get_or_create_author(remote_id)
+            edition_authors = [loaded[remote_id] for remote_id in author_ids]
+            authors.append([author for author in edition_authors if author])
+        return authors
+
+    # pylint: disable=no-self-use,unused-argument
+    def get_author_remote_ids(self, data: JsonDict) -> Optional[list[str]]:
+        """the remote ids of the authors in book data, if the connector knows them
+        without loading anything"""
+        return None
+
     def get_or_create_author(
         self, remote_id: str, instance: Optional[models.Author] = None
     ) -> Optional[models.Author]:
@@ -306,6 +433,78 @@ def dict_from_mappings(data: JsonDict, mappings: list[Mapping]) -> JsonDict:
     return result
 
 
+def add_edition_authors(
+    work: models.Work,
+    editions: list[models.Edition],
+    authors: list[list[models.Author]],
+) -> None:
+    """link each edition to its authors, all with one query. Editions that no
+    authors were found for get the work's authors"""
+    work_authors = list(work.authors.all())
+    # pylint: disable=protected-access
+    # the field tracker on books hides the through model from Book.authors
+    book_authors = cast(
+        type[Model], models.Book._meta.get_field("authors").remote_field.through
+    )
+    book_authors._default_manager.bulk_create(
+        [
+            book_authors(book_id=edition.id, author_id=author.id)
+            for (edition, edition_authors) in zip(editions, authors)
+            for author in edition_authors or work_authors
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def add_cover(edition: models.Edition, url: str) -> None:
+    """download a cover and save it to an edition"""
+    image, extension = get_image(url)
+    if not image:
+        return
+    edition.cover.save(f"{uuid4()}.{extension}", image, save=False)
+    edition.save(broadcast=False, update_fields=["cover"])
+
+
+class FetchClient:
+    """an http session that lasts as long as the process, so connections to other
+    servers are re-used from one request to the next"""
+
+    def __init__(self) -> None:
+        self.pid: Optional[int] = None
+        self.session: Optional[requests.Session] = None
+
+    def get_session(self) -> requests.Session:
+        """the shared session"""
+        if self.pid != os.getpid() or self.session is None:
+            # connections can't be shared with a forked process
+            self.pid = os.getpid()
+            adapter = HTTPAdapter(
+                pool_connections=FETCH_MAX_HOSTS,
+                pool_maxsize=FETCH_MAX_CONNECTIONS_PER_HOST,
+                pool_block=True,
+            )
+            self.session = requests.Session()
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+        return self.session
+
+    def close(self) -> None:
+        """close any open connections"""
+        if self.pid == os.getpid() and self.session is not None:
+            self.session.close()
+        self.session = None
+        self.pid = None
+
+
+fetch_client = FetchClient()
+
+
+@worker_process_shutdown.connect
+def close_fetch_client(**kwargs: Any) -> None:  # pylint: disable=unused-argument
+    """don't leave connections hanging when the worker stops"""
+    fetch_client.close()
+
+
 def get_data(
     url: str,
     params: Optional[dict[str, str]] = None,
@@ -316,7 +515,7 @@ def get_data(
     raise_not_valid_url(url)
 
     try:
-        resp = requests.get(
+        resp = fetch_client.get_session().get(
             url,
             params=params,
             headers={  # pylint: disable=line-too-long
@@ -355,7 +554,7 @@ def get_image(
     """wrapper for requesting an image"""
     raise_not_valid_url(url)
     try:
-        resp = requests.get(
+        resp = fetch_client.get_session().get(
             url,
             headers={
                 "User-Agent": settings.USER_AGENT,
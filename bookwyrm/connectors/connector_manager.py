@@ -1,45 +1,85 @@
 """ interface with whatever connectors the app has """
 from __future__ import annotations
 import asyncio
+import hashlib
 import importlib
 import ipaddress
 import logging
+import time
 from asyncio import Future
 from typing import Iterator, Any, Optional, Union, overload, Literal
 from urllib.parse import urlparse
 
 import aiohttp
+from django.core.cache import cache
 from django.dispatch import receiver
-from django.db.models import signals
+from django.db.models import Q, QuerySet, signals
+from django.utils import timezone
 
 from requests import HTTPError
 
 from bookwyrm import book_search, models
 from bookwyrm.book_search import SearchResult
 from bookwyrm.connectors import abstract_connector
-from bookwyrm.settings import SEARCH_TIMEOUT
+from bookwyrm.settings import (
+    IMPORT_SEARCH_MAX_CONCURRENCY,
+    SEARCH_CACHE_MAX_AGE,
+    SEARCH_CACHE_NEGATIVE_AGE,
+    SEARCH_CACHE_STALE_AGE,
+    SEARCH_TIMEOUT,
+)
 from bookwyrm.tasks import app, CONNECTORS
 
 logger = logging.getLogger(__name__)
 
+# connectors that have already been set up in this process, by id
+connector_registry: dict[int, abstract_connector.AbstractConnector] = {}
+
 
 class ConnectorException(HTTPError):
     """when the connector can't do what was asked"""
 
 
 async def async_connector_search(
-    query: str,
-    items: list[tuple[str, abstract_connector.AbstractConnector]],
-    min_confidence: float,
-) -> list[Optional[abstract_connector.ConnectorResults]]:
-    """Try a number of requests simultaneously"""
+    items: list[tuple[str, abstract_connector.AbstractConnector, str, float]],
+) -> list[tuple[Optional[abstract_connector.ConnectorResults], float]]:
+    """Try a number of requests simultaneously, without sending any one connector
+    more than a few requests at a time. Each connector only gets as long as it
+    usually takes to respond, so one slow server doesn't hold up every search"""
     timeout = aiohttp.ClientTimeout(total=SEARCH_TIMEOUT)
+    limits = {
+        connector.identifier: asyncio.Semaphore(IMPORT_SEARCH_MAX_CONCURRENCY)
+        for (_, connector, _, _) in items
+    }
+
+    async def get_results(
+        session: aiohttp.ClientSession,
+        url: str,
+        connector: abstract_connector.AbstractConnector,
+        query: str,
+        min_confidence: float,
+    ) -> tuple[Optional[abstract_connector.ConnectorResults], float]:
+        """wait for the connector to be free, then search it"""
+        async with limits[connector.identifier]:
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    connector.get_results(session, url, min_confidence, query),
+                    timeout=connector.connector.search_deadline,
+                )
+            except asyncio.TimeoutError:
+                logger.info("Search deadline passed for url: %s", url)
+                result = None
+            return (result, time.monotonic() - start)
+
     async with aiohttp.ClientSession(timeout=timeout) as session:
-        tasks: list[Future[Optional[abstract_connector.ConnectorResults]]] = []
-        for url, connector in items:
+        tasks: list[
+            Future[tuple[Optional[abstract_connector.ConnectorResults], float]]
+        ] = []
+        for (url, connector, query, min_confidence) in items:
             tasks.append(
                 asyncio.ensure_future(
-                    connector.get_results(session, url, min_confidence, query)
+                    get_results(session, url, connector, query, min_confidence)
                 )
             )
 
@@ -47,56 +87,275 @@ async def async_connector_search(
         return list(results)
 
 
+def run_connector_search(
+    items: list[tuple[str, abstract_connector.AbstractConnector, str, float]],
+) -> list[Optional[abstract_connector.ConnectorResults]]:
+    """send the searches, and keep track of how well each connector responded"""
+    responses = asyncio.run(async_connector_search(items))
+
+    samples: dict[int, list[tuple[bool, float]]] = {}
+    connectors = {}
+    for ((_, connector, _, _), (result, seconds)) in zip(items, responses):
+        connectors[connector.connector.id] = connector.connector
+        samples.setdefault(connector.connector.id, []).append((result is None, seconds))
+    for (connector_id, connector_samples) in samples.items():
+        connectors[connector_id].record_searches(connector_samples)
+
+    return [result for (result, _) in responses]
+
+
 @overload
 def search(
-    query: str, *, min_confidence: float = 0.1, return_first: Literal[False]
+    query: str,
+    *,
+    min_confidence: float = 0.1,
+    return_first: Literal[False],
+    connectors: Optional[list[abstract_connector.AbstractConnector]] = None,
 ) -> list[abstract_connector.ConnectorResults]:
     ...
 
 
 @overload
 def search(
-    query: str, *, min_confidence: float = 0.1, return_first: Literal[True]
+    query: str,
+    *,
+    min_confidence: float = 0.1,
+    return_first: Literal[True],
+    connectors: Optional[list[abstract_connector.AbstractConnector]] = None,
 ) -> Optional[SearchResult]:
     ...
 
 
 def search(
-    query: str, *, min_confidence: float = 0.1, return_first: bool = False
+    query: str,
+    *,
+    min_confidence: float = 0.1,
+    return_first: bool = False,
+    connectors: Optional[list[abstract_connector.AbstractConnector]] = None,
 ) -> Union[list[abstract_connector.ConnectorResults], Optional[SearchResult]]:
     """find books based on arbitrary keywords"""
     if not query:
         return None if return_first else []
+    if connectors is None:
+        connectors = list(get_connectors())
 
-    items = []
-    for connector in get_connectors():
-        # get the search url from the connector before sending
-        url = connector.get_search_url(query)
-        try:
-            raise_not_valid_url(url)
-        except ConnectorException:
-            # if this URL is invalid we should skip it and move on
-            logger.info("Request denied to blocked domain: %s", url)
-            continue
-        items.append((url, connector))
-
-    # load as many results as we can
-    # failed requests will return None, so filter those out
-    results = [
-        r
-        for r in asyncio.run(async_connector_search(query, items, min_confidence))
-        if r
-    ]
+    search_key = (query, min_confidence)
+    results = get_search_results([search_key], connectors)[search_key]
 
     if return_first:
-        # find the best result from all the responses and return that
-        all_results = [r for con in results for r in con["results"]]
-        all_results = sorted(all_results, key=lambda r: r.confidence, reverse=True)
-        return all_results[0] if all_results else None
+        return get_best_result(results)
 
     return results
 
 
+def search_many(
+    queries: list[tuple[str, float]],
+    connectors: Optional[list[abstract_connector.AbstractConnector]] = None,
+) -> dict[tuple[str, float], Optional[SearchResult]]:
+    """the best remote result for each of a list of queries and the confidence they
+    need, searched for all at once"""
+    queries = [q for q in dict.fromkeys(queries) if q[0]]
+    if not queries:
+        return {}
+    if connectors is None:
+        connectors = list(get_connectors())
+    results = get_search_results(queries, connectors)
+    return {query: get_best_result(results[query]) for query in queries}
+
+
+def get_best_result(
+    results: list[abstract_connector.ConnectorResults],
+) -> Optional[SearchResult]:
+    """find the best result from all the responses"""
+    all_results = [r for con in results for r in con["results"]]
+    all_results = sorted(all_results, key=lambda r: r.confidence, reverse=True)
+    return all_results[0] if all_results else None
+
+
+def get_search_results(
+    queries: list[tuple[str, float]],
+    connectors: list[abstract_connector.AbstractConnector],
+) -> dict[tuple[str, float], list[abstract_connector.ConnectorResults]]:
+    """Each connector's results for some queries. Results are cached for each
+    connector, and results that are getting old are still used while they're
+    refreshed in the background"""
+    searches = [
+        (
+            get_search_cache_key(connector, query, min_confidence),
+            connector,
+            query,
+            min_confidence,
+        )
+        for (query, min_confidence) in queries
+        for connector in connectors
+    ]
+    # queries that only differ by case or spacing are only sent once
+    unique_searches = {
+        key: (connector, query, min_confidence)
+        for (key, connector, query, min_confidence) in searches
+    }
+    found, items = get_cached_search_results(unique_searches)
+
+    # load as many results as we can
+    if items:
+        found.update(fetch_search_results(items))
+
+    # keep the results in the order of the connectors' priority
+    results: dict[tuple[str, float], list[abstract_connector.ConnectorResults]] = {
+        query: [] for query in queries
+    }
+    for (key, _, query, min_confidence) in searches:
+        if key in found:
+            results[(query, min_confidence)].append(found[key])
+    return results
+
+
+def get_cached_search_results(
+    searches: dict[str, tuple[abstract_connector.AbstractConnector, str, float]],
+) -> tuple[
+    dict[str, abstract_connector.ConnectorResults],
+    list[tuple[str, abstract_connector.AbstractConnector, str, float]],
+]:
+    """The cached results for searches, by cache key, and the searches that need
+    to be sent. Stale results are refreshed in the background"""
+    cached = cache.get_many(searches.keys())
+
+    found: dict[str, abstract_connector.ConnectorResults] = {}
+    items: list[tuple[str, abstract_connector.AbstractConnector, str, float]] = []
+    outcomes = {"hit": 0, "stale": 0, "miss": 0}
+    for (key, (connector, query, min_confidence)) in searches.items():
+        value = cached.get(key)
+        if value is None:
+            outcomes["miss"] += 1
+            # get the search url from the connector before sending
+            url = connector.get_search_url(query)
+            try:
+                raise_not_valid_url(url)
+            except ConnectorException:
+                # if this URL is invalid we should skip it and move on
+                logger.info("Request denied to blocked domain: %s", url)
+                continue
+            items.append((url, connector, query, min_confidence))
+            continue
+
+        if time.time() - value["updated"] > SEARCH_CACHE_MAX_AGE:
+            outcomes["stale"] += 1
+            if cache.add(f"{key}-refresh", True, timeout=SEARCH_TIMEOUT * 2):
+                refresh_search_task.delay(connector.connector.id, query, min_confidence)
+        else:
+            outcomes["hit"] += 1
+        if not value["failed"]:
+            found[key] = abstract_connector.ConnectorResults(
+                connector=connector,
+                results=[
+                    SearchResult(**result, connector=connector)
+                    for result in value["results"]
+                ],
+            )
+    count_searches(outcomes)
+    return found, items
+
+
+def fetch_search_results(
+    items: list[tuple[str, abstract_connector.AbstractConnector, str, float]],
+) -> dict[str, abstract_connector.ConnectorResults]:
+    """send searches that weren't cached, and cache what comes back"""
+    found: dict[str, abstract_connector.ConnectorResults] = {}
+    responses = run_connector_search(items)
+    for (item, response) in zip(items, responses):
+        (_, connector, query, min_confidence) = item
+        key = get_search_cache_key(connector, query, min_confidence)
+        cache_search_results(key, response)
+        # failed requests will return None, so filter those out
+        if response:
+            found[key] = response
+    return found
+
+
+def normalize_query(query: str) -> str:
+    """searches that will get the same results should share a cache entry"""
+    if abstract_connector.maybe_isbn(query):
+        return query.strip().upper().rjust(10, "0")
+    return " ".join(query.lower().split())
+
+
+def get_search_cache_key(
+    connector: abstract_connector.AbstractConnector, query: str, min_confidence: float
+) -> str:
+    """where a connector's results for a query are cached"""
+    query_hash = hashlib.md5(normalize_query(query).encode("utf-8")).hexdigest()
+    return f"connector-search-{connector.identifier}-{query_hash}-{min_confidence}"
+
+
+def cache_search_results(
+    key: str, response: Optional[abstract_connector.ConnectorResults]
+) -> None:
+    """store a connector's results, remembering failures and empty results for a
+    shorter time"""
+    results = [result.json() for result in response["results"]] if response else []
+    timeout = SEARCH_CACHE_MAX_AGE + SEARCH_CACHE_STALE_AGE
+    if not results:
+        timeout = SEARCH_CACHE_NEGATIVE_AGE
+    cache.set(
+        key,
+        {"results": results, "failed": response is None, "updated": time.time()},
+        timeout=timeout,
+    )
+
+
+def search_cache_count_key(outcome: str) -> str:
+    """the cache key for how many searches had an outcome"""
+    return f"connector-search-{outcome}"
+
+
+def count_searches(outcomes: dict[str, int]) -> None:
+    """keep track of how often searches are answered from the cache"""
+    for (outcome, count) in outcomes.items():
+        if not count:
+            continue
+        key = search_cache_count_key(outcome)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            # the key expired in the meantime, so these don't get counted
+            pass
+
+
+def get_search_cache_counts() -> dict[str, Optional[int]]:
+    """how many connector searches were fresh, stale, or not in the cache"""
+    outcomes = ("hit", "stale", "miss")
+    keys = {search_cache_count_key(outcome): outcome for outcome in outcomes}
+    found = {outcome: 0 for outcome in outcomes}
+    for (key, count) in cache.get_many(keys).items():
+        found[keys[key]] = count
+    total = sum(found.values())
+    counts: dict[str, Optional[int]] = dict(found)
+    counts["hit_rate"] = (
+        round((found["hit"] + found["stale"]) / total * 100) if total else None
+    )
+    return counts
+
+
+@app.task(queue=CONNECTORS)
+def refresh_search_task(connector_id: int, query: str, min_confidence: float) -> None:
+    """search a connector again, because its cached results are getting old"""
+    connector_info = get_search_connectors().filter(id=connector_id).first()
+    if not connector_info:
+        return
+    connector = load_connector(connector_info)
+    key = get_search_cache_key(connector, query, min_confidence)
+    url = connector.get_search_url(query)
+    try:
+        raise_not_valid_url(url)
+    except ConnectorException:
+        cache.delete(key)
+        return
+    response = run_connector_search([(url, connector, query, min_confidence)])[0]
+    cache_search_results(key, response)
+    cache.delete(f"{key}-refresh")
+
+
 def first_search_result(
     query: str, min_confidence: float = 0.1
 ) -> Union[models.Edition, SearchResult, None]:
@@ -109,9 +368,17 @@ def first_search_result(
     return search(query, min_confidence=min_confidence, return_first=True) or None
 
 
+def get_search_connectors() -> QuerySet[models.Connector]:
+    """connectors that are active, and haven't been failing lately"""
+    return models.Connector.objects.filter(
+        Q(disabled_until__isnull=True) | Q(disabled_until__lte=timezone.now()),
+        active=True,
+    ).order_by("priority")
+
+
 def get_connectors() -> Iterator[abstract_connector.AbstractConnector]:
     """load all connectors"""
-    for info in models.Connector.objects.filter(active=True).order_by("priority").all():
+    for info in get_search_connectors():
         yield load_connector(info)
 
 
@@ -141,7 +408,11 @@ def get_or_create_connector(remote_id: str) -> abstract_connector.AbstractConnec
 @app.task(queue=CONNECTORS)
 def load_more_data(connector_id: str, book_id: str) -> None:
     """background the work of getting all 10,000 editions of LoTR"""
-    connector_info = models.Connector.objects.get(id=connector_id)
+    connector_info = models.Connector.objects.filter(
+        id=connector_id, active=True
+    ).first()
+    if not connector_info:
+        return
     connector = load_connector(connector_info)
     book = models.Book.objects.select_subclasses().get(id=book_id)
     connector.expand_book_data(book)
@@ -152,20 +423,62 @@ def create_edition_task(
     connector_id: int, work_id: int, data: Union[str, abstract_connector.JsonDict]
 ) -> None:
     """separate task for each of the 10,000 editions of LoTR"""
-    connector_info = models.Connector.objects.get(id=connector_id)
+    connector_info = models.Connector.objects.filter(
+        id=connector_id, active=True
+    ).first()
+    if not connector_info:
+        return
     connector = load_connector(connector_info)
     work = models.Work.objects.select_subclasses().get(id=work_id)
     connector.create_edition_from_data(work, data)
 
 
+@app.task(queue=CONNECTORS)
+def create_editions_task(
+    connector_id: int,
+    work_id: int,
+    data: list[Union[str, abstract_connector.JsonDict]],
+) -> None:
+    """add a chunk of the 10,000 editions of LoTR"""
+    connector_info = models.Connector.objects.filter(
+        id=connector_id, active=True
+    ).first()
+    if not connector_info:
+        return
+    connector = load_connector(connector_info)
+    work = models.Work.objects.select_subclasses().get(id=work_id)
+    connector.create_editions_from_data(work, data)
+
+
 def load_connector(
     connector_info: models.Connector,
 ) -> abstract_connector.AbstractConnector:
-    """instantiate the connector class"""
-    connector = importlib.import_module(
-        f"bookwyrm.connectors.{connector_info.connector_file}"
-    )
-    return connector.Connector(connector_info.identifier)  # type: ignore[no-any-return]
+    """instantiate the connector class, or re-use the one this process already has
+    if the connector hasn't been changed since"""
+    loaded = connector_registry.get(connector_info.id)
+    if loaded is None or loaded.connector.updated_date != connector_info.updated_date:
+        module = importlib.import_module(
+            f"bookwyrm.connectors.{connector_info.connector_file}"
+        )
+        connector: abstract_connector.AbstractConnector = module.Connector(
+            connector_info.identifier, info=connector_info
+        )
+        connector_registry[connector_info.id] = connector
+    else:
+        connector = loaded
+    # search stats are saved without changing updated_date, so use the newest info
+    connector.connector = connector_info
+    return connector
+
+
+@receiver(signals.post_save, sender="bookwyrm.Connector")
+@receiver(signals.post_delete, sender="bookwyrm.Connector")
+# pylint: disable=unused-argument
+def clear_loaded_connector(
+    sender: Any, instance: models.Connector, *args: Any, **kwargs: Any
+) -> None:
+    """a connector was changed, so it needs to be loaded again"""
+    connector_registry.pop(instance.id, None)
 
 
 @receiver(signals.post_save, sender="bookwyrm.FederatedServer")
@@ -14,8 +14,8 @@ class Connector(AbstractConnector):
 
     generated_remote_link_field = "inventaire_id"
 
-    def __init__(self, identifier: str):
-        super().__init__(identifier)
+    def __init__(self, identifier: str, info: Optional[models.Connector] = None):
+        super().__init__(identifier, info=info)
 
         get_first = lambda a: a[0]
         shared_mappings = [
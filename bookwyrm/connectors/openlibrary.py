@@ -9,17 +9,20 @@ from bookwyrm.book_search import SearchResult
 from bookwyrm.utils.sanitizer import clean
 from .abstract_connector import AbstractConnector, Mapping, JsonDict
 from .abstract_connector import get_data, infer_physical_format, unique_physical_format
-from .connector_manager import ConnectorException, create_edition_task
+from .connector_manager import ConnectorException, create_editions_task
 from .openlibrary_languages import languages
 
+# how many editions of a work each task adds
+EDITIONS_CHUNK_SIZE = 100
+
 
 class Connector(AbstractConnector):
     """instantiate a connector for OL"""
 
     generated_remote_link_field = "openlibrary_link"
 
-    def __init__(self, identifier: str):
-        super().__init__(identifier)
+    def __init__(self, identifier: str, info: Optional[models.Connector] = None):
+        super().__init__(identifier, info=info)
 
         get_first = lambda a, *args: a[0]
         get_remote_id = lambda a, *args: self.base_url + a
@@ -138,16 +141,21 @@ class Connector(AbstractConnector):
 
     def get_authors_from_data(self, data: JsonDict) -> Iterator[models.Author]:
         """parse author json and load or create authors"""
-        for author_blob in data.get("authors", []):
-            author_blob = author_blob.get("author", author_blob)
-            # this id is "/authors/OL1234567A"
-            author_id = author_blob["key"]
-            url = f"{self.base_url}{author_id}"
+        for url in self.get_author_remote_ids(data):
             author = self.get_or_create_author(url)
             if not author:
                 continue
             yield author
 
+    def get_author_remote_ids(self, data: JsonDict) -> list[str]:
+        remote_ids = []
+        for author_blob in data.get("authors", []):
+            author_blob = author_blob.get("author", author_blob)
+            # this id is "/authors/OL1234567A"
+            author_id = author_blob["key"]
+            remote_ids.append(f"{self.base_url}{author_id}")
+        return remote_ids
+
     def get_cover_url(self, cover_blob: list[str], size: str = "L") -> Optional[str]:
         """ask openlibrary for the cover"""
         if not cover_blob:
@@ -212,11 +220,16 @@ class Connector(AbstractConnector):
             # who knows, man
             return
 
-        for edition_data in edition_options.get("entries", []):
-            # does this edition have ANY interesting data?
-            if ignore_edition(edition_data):
-                continue
-            create_edition_task.delay(self.connector.id, work.id, edition_data)
+        # does this edition have ANY interesting data?
+        editions = [
+            edition_data
+            for edition_data in edition_options.get("entries", [])
+            if not ignore_edition(edition_data)
+        ]
+        for i in range(0, len(editions), EDITIONS_CHUNK_SIZE):
+            create_editions_task.delay(
+                self.connector.id, work.id, editions[i : i + EDITIONS_CHUNK_SIZE]
+            )
 
 
 def ignore_edition(edition_data: JsonDict) -> bool:
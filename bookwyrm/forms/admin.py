@@ -174,7 +174,14 @@ class IPBlocklistForm(CustomForm):
 class ServerForm(CustomForm):
     class Meta:
         model = models.FederatedServer
-        exclude = ["remote_id"]
+        exclude = [
+            "remote_id",
+            "delivery_attempts",
+            "delivery_errors",
+            "consecutive_delivery_errors",
+            "last_delivery_error",
+            "unavailable_until",
+        ]
 
 
 class AutoModRuleForm(CustomForm):
@@ -0,0 +1,93 @@
+""" cache the public keys that incoming activities are signed with """
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import signals
+from django.dispatch import receiver
+
+from bookwyrm import activitypub, models
+from bookwyrm.tasks import app, INBOX
+
+PUBLIC_KEY_CACHE_TIMEOUT = 60 * 60 * 24
+# actors that couldn't be found aren't looked up again for a little while
+UNKNOWN_ACTOR_CACHE_TIMEOUT = 60 * 10
+# how often a key that fails to verify may be re-fetched
+PUBLIC_KEY_REFRESH_INTERVAL = 60 * 5
+
+
+def get_cache_key(prefix, url):
+    """urls can be long, so they're hashed to make cache keys"""
+    return f"{prefix}-{hashlib.sha256(url.encode('utf8')).hexdigest()}"
+
+
+def get_legacy_key_id(key_id):
+    """older versions of bookwyrm sign with a slightly different keyId"""
+    return key_id.replace("/#main-key", "#main-key")
+
+
+def get_public_key(key_id, actor):
+    """the public key for a signature, as long as it belongs to the actor. unknown
+    actors are fetched, but only once in a while"""
+    public_key = cache.get(get_cache_key("public-key", key_id))
+    if public_key is None:
+        if cache.get(get_cache_key("unknown-actor", actor)):
+            return None
+
+        remote_user = activitypub.resolve_remote_id(actor, model=models.User)
+        if not remote_user:
+            cache.set(
+                get_cache_key("unknown-actor", actor),
+                True,
+                timeout=UNKNOWN_ACTOR_CACHE_TIMEOUT,
+            )
+            return None
+
+        if key_id not in (
+            remote_user.key_pair.remote_id,
+            get_legacy_key_id(remote_user.key_pair.remote_id),
+        ):
+            raise ValueError("Wrong actor created signature.")
+
+        public_key = (remote_user.remote_id, remote_user.key_pair.public_key)
+        cache.set(
+            get_cache_key("public-key", key_id),
+            public_key,
+            timeout=PUBLIC_KEY_CACHE_TIMEOUT,
+        )
+
+    owner, public_key = public_key
+    if owner != actor:
+        raise ValueError("Wrong actor created signature.")
+    return public_key
+
+
+def refresh_public_key(actor):
+    """the actor's key may have changed, so check in the background"""
+    if cache.add(
+        get_cache_key("public-key-refresh", actor),
+        True,
+        timeout=PUBLIC_KEY_REFRESH_INTERVAL,
+    ):
+        refresh_public_key_task.delay(actor)
+
+
+@app.task(queue=INBOX)
+def refresh_public_key_task(actor):
+    """re-fetch an actor, which updates their key"""
+    remote_user = activitypub.resolve_remote_id(actor, model=models.User, refresh=True)
+    if remote_user:
+        invalidate_public_key(remote_user.key_pair)
+
+
+# pylint: disable=unused-argument
+@receiver(signals.post_save, sender=models.KeyPair)
+def invalidate_public_key(instance, *args, **kwargs):
+    """forget a key that has been saved, it may have changed"""
+    if not instance.remote_id:
+        return
+    cache.delete_many(
+        [
+            get_cache_key("public-key", instance.remote_id),
+            get_cache_key("public-key", get_legacy_key_id(instance.remote_id)),
+        ]
+    )
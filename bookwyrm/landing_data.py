@@ -0,0 +1,109 @@
+""" books featured on the landing and about pages, worked out in the background """
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from bookwyrm import models
+from bookwyrm.tasks import app, LOW
+
+LANDING_DATA_KEY = "landing-data"
+# how old the landing data can get before it is re-calculated
+LANDING_DATA_MAX_AGE = 60 * 60
+# stops more than one refresh being queued at a time
+LANDING_DATA_REFRESH_KEY = "landing-data-refresh"
+LANDING_DATA_REFRESH_TIMEOUT = 60 * 10
+LANDING_BOOKS_COUNT = 6
+
+
+def get_superlatives():
+    """the ids of the top rated, most controversial, and most wanted works"""
+    top_rated = (
+        models.RatingAggregate.objects.filter(local_average__gt=4)
+        .order_by("-local_rating_sum")
+        .values_list("work_id", "local_average")
+        .first()
+    )
+    controversial = (
+        models.RatingAggregate.objects.filter(local_deviation__gt=0)
+        .annotate(weighted=F("local_deviation") * F("local_rating_count"))
+        .order_by("-weighted")
+        .values_list("work_id", flat=True)
+        .first()
+    )
+    wanted = (
+        models.ShelfBook.objects.filter(
+            shelf__identifier="to-read", book__parent_work__isnull=False
+        )
+        .values("book__parent_work")
+        .annotate(shelf_count=Count("id"))
+        .order_by("-shelf_count")
+        .values_list("book__parent_work", flat=True)
+        .first()
+    )
+    return {
+        "top_rated": top_rated,
+        "controversial": controversial,
+        "wanted": wanted,
+    }
+
+
+def get_landing_book_ids():
+    """the books most recently reviewed by local users"""
+    reviewed = (
+        models.Review.objects.filter(
+            published_date__isnull=False,
+            deleted=False,
+            user__local=True,
+            privacy__in=["public", "unlisted"],
+        )
+        .exclude(book__cover__exact="")
+        .order_by("-published_date")
+        .values_list("book_id", flat=True)
+    )
+    book_ids = []
+    # a book may have been reviewed a few times recently
+    for book_id in reviewed[: LANDING_BOOKS_COUNT * 10].iterator():
+        if book_id not in book_ids:
+            book_ids.append(book_id)
+        if len(book_ids) == LANDING_BOOKS_COUNT:
+            break
+    return book_ids
+
+
+def calculate_landing_data():
+    """work out everything the landing and about pages feature"""
+    return {
+        "superlatives": get_superlatives(),
+        "landing_books": get_landing_book_ids(),
+        "updated": time.time(),
+    }
+
+
+def refresh_landing_data():
+    """re-calculate and store the landing data"""
+    data = calculate_landing_data()
+    cache.set(LANDING_DATA_KEY, data, timeout=None)
+    cache.delete(LANDING_DATA_REFRESH_KEY)
+    return data
+
+
+def get_landing_data():
+    """the stored landing data, which is re-calculated in the background once it's
+    out of date"""
+    data = cache.get(LANDING_DATA_KEY)
+    if data is None:
+        # there's nothing to show until it's been worked out once
+        return refresh_landing_data()
+
+    if time.time() - data["updated"] > LANDING_DATA_MAX_AGE and cache.add(
+        LANDING_DATA_REFRESH_KEY, True, timeout=LANDING_DATA_REFRESH_TIMEOUT
+    ):
+        update_landing_data_task.delay()
+    return data
+
+
+@app.task(queue=LOW)
+def update_landing_data_task():
+    """re-calculate the landing data"""
+    refresh_landing_data()
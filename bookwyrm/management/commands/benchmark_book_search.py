@@ -0,0 +1,118 @@
+""" Time how long local book searches take """
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from bookwyrm import book_search, models
+
+# how many books are added to the database at a time when seeding
+SEED_BATCH_SIZE = 10000
+SYLLABLES = "ka lo mi ne ru sa ti vo wen dor el fin gar hul is jor bre cal pen tor"
+# every pair of syllables is a word, and some words are much more common than others
+WORDS = [first + second for first in SYLLABLES.split() for second in SYLLABLES.split()]
+WORD_WEIGHTS = [1 / (i + 1) for i in range(len(WORDS))]
+
+
+def get_synthetic_title(rand):
+    """a few words, more often common ones"""
+    return " ".join(rand.choices(WORDS, weights=WORD_WEIGHTS, k=rand.randint(2, 5)))
+
+
+def seed_catalogue(count):
+    """add synthetic editions, a few to each work. Works and editions can't be bulk
+    created because they're stored in two tables, so the rows that only hold the
+    link to the book are added directly"""
+    rand = random.Random(count)
+    added = 0
+    while added < count:
+        titles = []
+        while len(titles) < SEED_BATCH_SIZE and added < count:
+            copies = min(rand.randint(1, 5), count - added)
+            titles.append((get_synthetic_title(rand), copies))
+            added += copies
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            works = models.Book.objects.bulk_create(
+                [models.Book(title=title) for (title, _) in titles]
+            )
+            cursor.executemany(
+                "INSERT INTO bookwyrm_work (book_ptr_id) VALUES (%s)",
+                [(work.id,) for work in works],
+            )
+            parents = [
+                work.id
+                for (work, (_, copies)) in zip(works, titles)
+                for _ in range(copies)
+            ]
+            editions = models.Book.objects.bulk_create(
+                [
+                    models.Book(title=title)
+                    for (title, copies) in titles
+                    for _ in range(copies)
+                ]
+            )
+            cursor.executemany(
+                "INSERT INTO bookwyrm_edition "
+                "(book_ptr_id, parent_work_id, publishers, edition_rank) "
+                "VALUES (%s, %s, '{}', %s)",
+                [
+                    (edition.id, parent, rand.randint(0, 10))
+                    for (edition, parent) in zip(editions, parents)
+                ],
+            )
+
+
+class Command(BaseCommand):
+    """time local searches against the books in the database"""
+
+    help = "Run local book searches repeatedly and report the p50 and p99 latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("queries", nargs="*", help="What to search for")
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=20,
+            help="How many times to run each search",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="First add this many synthetic editions to the database. They "
+            "aren't removed afterwards, so that they can be searched again",
+        )
+
+    # pylint: disable=unused-argument
+    def handle(self, *args, **options):
+        """benchmark"""
+        if options["seed"]:
+            start = time.perf_counter()
+            seed_catalogue(options["seed"])
+            self.stdout.write(
+                f"Added {options['seed']} editions "
+                f"in {time.perf_counter() - start:.0f}s"
+            )
+        # searches for common words match lots of editions, rarer ones only a few
+        rand = random.Random(0)
+        queries = options["queries"] or [
+            " ".join(rand.sample(WORDS[:50], 2)) for _ in range(10)
+        ] + [" ".join(rand.sample(WORDS[50:], 2)) for _ in range(10)]
+
+        timings = []
+        for query in queries:
+            for _ in range(options["runs"]):
+                start = time.perf_counter()
+                list(book_search.search(query) or [])
+                timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(timings)} searches: p50 {p50:.1f}ms, p99 {p99:.1f}ms"
+            )
+        )
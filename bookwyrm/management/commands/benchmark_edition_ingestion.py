@@ -0,0 +1,86 @@
+""" Time how long it takes to add lots of editions of a work """
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bookwyrm import models
+from bookwyrm.connectors import connector_manager
+from bookwyrm.connectors.openlibrary import EDITIONS_CHUNK_SIZE
+
+
+def get_synthetic_editions(count):
+    """openlibrary-style edition data that doesn't need anything downloaded"""
+    return [
+        {
+            "key": f"/books/OL{900000000 + i}M",
+            "title": f"Benchmark Edition {i}",
+            "isbn_13": [f"979{i:010d}"],
+            "number_of_pages": 100 + i % 500,
+            "publish_date": "2000",
+            "publishers": ["Benchmark Press"],
+            "physical_format": "Paperback",
+            "languages": [{"key": "/languages/eng"}],
+            "authors": [{"key": "/authors/OL900000000A"}],
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    """add a synthetic work's editions, and roll it all back afterwards"""
+
+    help = "Time adding editions of a work in chunks, or one at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--editions",
+            type=int,
+            default=10000,
+            help="How many editions the work has",
+        )
+        parser.add_argument(
+            "--one-by-one",
+            action="store_true",
+            help="Add each edition separately, the way it used to be done",
+        )
+
+    # pylint: disable=unused-argument
+    def handle(self, *args, **options):
+        """benchmark"""
+        connector_info = models.Connector.objects.filter(
+            connector_file="openlibrary"
+        ).first()
+        if not connector_info:
+            raise CommandError("There's no openlibrary connector to use")
+        connector = connector_manager.load_connector(connector_info)
+        editions = get_synthetic_editions(options["editions"])
+
+        with transaction.atomic():
+            author = models.Author.objects.create(
+                name="Benchmark Author",
+                remote_id=f"{connector.base_url}/authors/OL900000000A",
+            )
+            work = models.Work.objects.create(title="Benchmark Work")
+            work.authors.add(author)
+
+            start = time.perf_counter()
+            if options["one_by_one"]:
+                for edition in editions:
+                    connector.create_edition_from_data(work, edition)
+            else:
+                for i in range(0, len(editions), EDITIONS_CHUNK_SIZE):
+                    connector.create_editions_from_data(
+                        work, editions[i : i + EDITIONS_CHUNK_SIZE]
+                    )
+            seconds = time.perf_counter() - start
+            count = work.editions.count()
+            # leave the database the way it was
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{count} editions in {seconds:.1f}s: "
+                f"{count / seconds:.0f} editions per second"
+            )
+        )
@@ -0,0 +1,45 @@
+""" Re-create the follower and block sets used to resolve feed audiences """
+from django.core.management.base import BaseCommand
+
+from bookwyrm.audience_index import audience_index
+
+
+def rebuild_audience_index():
+    """build the index from the database"""
+    print("Rebuilding audience index")
+    audience_index.rebuild()
+
+
+def verify_audience_index():
+    """compare the index to the database, returns the keys that are wrong"""
+    errors = []
+    if not audience_index.verify_local_users():
+        errors.append(audience_index.local_users_key)
+    for user in audience_index.get_indexed_users().iterator():
+        errors += audience_index.verify_user(user)
+    return errors
+
+
+class Command(BaseCommand):
+    """rebuild or check the audience index"""
+
+    help = "Rebuild the redis sets used to work out who sees a status"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Check the index against the database instead of rebuilding it",
+        )
+
+    # pylint: disable=unused-argument
+    def handle(self, *args, **options):
+        """rebuild or verify"""
+        if not options.get("verify"):
+            rebuild_audience_index()
+
+        errors = verify_audience_index()
+        for key in errors:
+            self.stdout.write(self.style.ERROR(f"Out of date: {key}"))
+        if not errors:
+            self.stdout.write(self.style.SUCCESS("Audience index is up to date"))
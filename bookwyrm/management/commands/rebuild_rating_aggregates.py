@@ -0,0 +1,16 @@
+""" Re-count the ratings for every work """
+from django.core.management.base import BaseCommand
+
+from bookwyrm import models
+
+
+class Command(BaseCommand):
+    """rebuild the per-work rating totals"""
+
+    help = "Re-count the ratings of every work from its reviews"
+
+    # pylint: disable=unused-argument
+    def handle(self, *args, **options):
+        """rebuild"""
+        count = models.RatingAggregate.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Counted ratings for {count} works"))
@@ -0,0 +1,25 @@
+""" Add up every user's reading for each year """
+from django.core.management.base import BaseCommand
+
+from bookwyrm import models
+
+
+class Command(BaseCommand):
+    """rebuild the yearly reading stats"""
+
+    help = "Re-calculate the yearly reading stats used by annual summaries and goals"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            help="Only rebuild the stats for the user with this id",
+        )
+
+    # pylint: disable=unused-argument
+    def handle(self, *args, **options):
+        """rebuild"""
+        count = models.ReadingStats.rebuild(user_id=options.get("user"))
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt reading stats for {count} years")
+        )
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-18 05:12
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookwyrm", "0199_delivery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="status",
+            name="thread_path",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.IntegerField(), blank=True, null=True, size=None
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="status",
+            index=models.Index(
+                fields=["thread_id"], name="bookwyrm_st_thread__cf064f_idx"
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+            WITH RECURSIVE thread_paths(id, path) AS (
+                SELECT id, ARRAY[id]
+                FROM bookwyrm_status
+                WHERE reply_parent_id IS NULL
+
+                UNION ALL
+
+                SELECT st.id, tp.path || st.id
+                FROM bookwyrm_status st
+                JOIN thread_paths tp ON st.reply_parent_id = tp.id
+            )
+            UPDATE bookwyrm_status
+            SET thread_path = thread_paths.path
+            FROM thread_paths
+            WHERE bookwyrm_status.id = thread_paths.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
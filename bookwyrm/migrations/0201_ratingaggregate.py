@@ -0,0 +1,105 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from bookwyrm.models.rating_aggregate import get_average, get_deviation
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    """count up the existing ratings"""
+    db_alias = schema_editor.connection.alias
+    rating_aggregate = apps.get_model("bookwyrm", "RatingAggregate")
+    review = apps.get_model("bookwyrm", "Review")
+    local = models.Q(user__local=True)
+    totals = (
+        review.objects.using(db_alias)
+        .filter(book__parent_work__isnull=False, deleted=False, rating__gt=0)
+        .values("book__parent_work_id")
+        .order_by("book__parent_work_id")
+        .annotate(
+            rating_count=models.Count("id"),
+            rating_sum=models.Sum("rating"),
+            rating_sum_squares=models.Sum(models.F("rating") * models.F("rating")),
+            local_rating_count=models.Count("id", filter=local),
+            local_rating_sum=models.Sum("rating", filter=local),
+            local_rating_sum_squares=models.Sum(
+                models.F("rating") * models.F("rating"), filter=local
+            ),
+        )
+    )
+    aggregates = []
+    for row in totals.iterator():
+        row = {field: value or 0 for field, value in row.items()}
+        aggregates.append(
+            rating_aggregate(
+                work_id=row.pop("book__parent_work_id"),
+                average=get_average(row["rating_count"], row["rating_sum"]),
+                local_average=get_average(
+                    row["local_rating_count"], row["local_rating_sum"]
+                ),
+                local_deviation=get_deviation(
+                    row["local_rating_count"],
+                    row["local_rating_sum"],
+                    row["local_rating_sum_squares"],
+                ),
+                **row,
+            )
+        )
+    rating_aggregate.objects.using(db_alias).bulk_create(aggregates, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookwyrm", "0200_status_thread_path"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RatingAggregate",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rating_count", models.IntegerField(default=0)),
+                (
+                    "rating_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "rating_sum_squares",
+                    models.DecimalField(decimal_places=4, default=0, max_digits=14),
+                ),
+                ("local_rating_count", models.IntegerField(default=0)),
+                (
+                    "local_rating_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "local_rating_sum_squares",
+                    models.DecimalField(decimal_places=4, default=0, max_digits=14),
+                ),
+                ("average", models.FloatField(db_index=True, null=True)),
+                ("local_average", models.FloatField(db_index=True, null=True)),
+                ("local_deviation", models.FloatField(null=True)),
+                (
+                    "work",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rating_aggregate",
+                        to="bookwyrm.work",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(
+            populate_rating_aggregates, reverse_code=migrations.RunPython.noop
+        ),
+    ]
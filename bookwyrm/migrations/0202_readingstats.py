@@ -0,0 +1,89 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:25
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookwyrm", "0201_ratingaggregate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReadingStats",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("year", models.IntegerField()),
+                ("finished_count", models.IntegerField(default=0)),
+                (
+                    "book_ids",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(), default=list, size=None
+                    ),
+                ),
+                ("pages_total", models.IntegerField(default=0)),
+                ("pages_average", models.IntegerField(default=0)),
+                ("no_page_count", models.IntegerField(default=0)),
+                ("ratings_count", models.IntegerField(default=0)),
+                (
+                    "rating_average",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=3),
+                ),
+                (
+                    "five_star_book_ids",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(), default=list, size=None
+                    ),
+                ),
+                (
+                    "book_pages_highest",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="bookwyrm.edition",
+                    ),
+                ),
+                (
+                    "book_pages_lowest",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="bookwyrm.edition",
+                    ),
+                ),
+                (
+                    "review_rating_highest",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="bookwyrm.review",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "year")},
+            },
+        ),
+    ]
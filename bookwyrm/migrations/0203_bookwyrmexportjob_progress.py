@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookwyrm", "0202_readingstats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bookwyrmexportjob",
+            name="books_exported",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="bookwyrmexportjob",
+            name="books_total",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
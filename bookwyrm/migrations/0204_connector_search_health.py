@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bookwyrm", "0203_bookwyrmexportjob_progress"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="connector",
+            name="disabled_until",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="connector",
+            name="search_error_rate",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="connector",
+            name="search_failures",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="connector",
+            name="search_latency",
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
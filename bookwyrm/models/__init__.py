@@ -13,15 +13,18 @@ from .list import List, ListItem
 from .status import Status, GeneratedNote, Comment, Quotation
 from .status import Review, ReviewRating
 from .status import Boost
+from .rating_aggregate import RatingAggregate
 from .attachment import Image
 from .favorite import Favorite
 from .readthrough import ReadThrough, ProgressUpdate, ProgressMode
 
 from .user import User, KeyPair
 from .annual_goal import AnnualGoal
+from .reading_stats import ReadingStats
 from .relationship import UserFollows, UserFollowRequest, UserBlocks
 from .report import Report, ReportAction
 from .federated_server import FederatedServer
+from .delivery import Delivery, retry_deliveries_task, prune_deliveries_task
 
 from .group import Group, GroupMember, GroupMemberInvitation
 
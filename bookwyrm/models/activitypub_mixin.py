@@ -6,26 +6,34 @@ from functools import reduce
 import json
 import operator
 import logging
+import os
 from typing import Any, Optional
 from uuid import uuid4
 from typing_extensions import Self
 
 import aiohttp
-from Crypto.PublicKey import RSA
-from Crypto.Signature import pkcs1_15
-from Crypto.Hash import SHA256
+from celery.signals import worker_process_shutdown
 from django.apps import apps
 from django.core.paginator import Paginator
 from django.db.models import Q
 from django.utils.http import http_date
 
 from bookwyrm import activitypub
-from bookwyrm.settings import USER_AGENT, PAGE_LENGTH
-from bookwyrm.signatures import make_signature, make_digest
+from bookwyrm.settings import (
+    BROADCAST_MAX_CONNECTIONS,
+    BROADCAST_MAX_CONNECTIONS_PER_HOST,
+    USER_AGENT,
+    PAGE_LENGTH,
+)
+from bookwyrm.signatures import make_signature, make_digest, sign_message
 from bookwyrm.tasks import app, BROADCAST
 from bookwyrm.models.fields import ImageField, ManyToManyField
 
 logger = logging.getLogger(__name__)
+# how long a server gets to accept a connection, and then to send each part of
+# its response. waiting for a free connection in the pool isn't counted, since
+# that depends on how many recipients a broadcast has, not on the server
+BROADCAST_SOCKET_TIMEOUT = 10
 # I tried to separate these classes into multiple files but I kept getting
 # circular import errors so I gave up. I'm sure it could be done though!
 
@@ -43,7 +51,7 @@ class ActivitypubMixin:
     activity_serializer = lambda: {}
     reverse_unfurl = False
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
         """collect some info on model fields for later use"""
         self.image_fields = []
         self.many_to_many_fields = []
@@ -127,6 +135,54 @@ class ActivitypubMixin:
         # there OUGHT to be only one match
         return match.first()
 
+    @classmethod
+    def get_deduplication_values(cls, data: dict[str, Any]) -> list[tuple[str, Any]]:
+        """the field names and values that find_existing would match data on"""
+        values = []
+        for field in cls._meta.get_fields():
+            if not getattr(field, "deduplication_field", False):
+                continue
+            value = data.get(field.get_activitypub_field())
+            if value:
+                values.append((field.name, value))
+        if hasattr(cls, "origin_id") and data.get("id"):
+            values.append(("origin_id", data["id"]))
+        return values
+
+    @classmethod
+    def find_existing_many(
+        cls, data_list: list[dict[str, Any]]
+    ) -> list[Optional[Self]]:
+        """find_existing for a list of activities, with one query for all of them"""
+        lookups = [cls.get_deduplication_values(data) for data in data_list]
+        values_by_field: dict[str, set[Any]] = {}
+        for (name, value) in (pair for pairs in lookups for pair in pairs):
+            values_by_field.setdefault(name, set()).add(value)
+        if not values_by_field:
+            return [None] * len(data_list)
+
+        objects = cls.objects
+        if hasattr(objects, "select_subclasses"):
+            objects = objects.select_subclasses()
+        matches = objects.filter(
+            reduce(
+                operator.or_,
+                (
+                    Q(**{f"{name}__in": values})
+                    for name, values in values_by_field.items()
+                ),
+            )
+        )
+
+        found: dict[tuple[str, Any], Self] = {}
+        for match in matches:
+            for name in values_by_field:
+                found.setdefault((name, getattr(match, name)), match)
+        return [
+            next((found[pair] for pair in pairs if pair in found), None)
+            for pairs in lookups
+        ]
+
     def broadcast(self, activity, sender, software=None, queue=BROADCAST):
         """send out an activity"""
         broadcast_task.apply_async(
@@ -274,9 +330,9 @@ class ObjectMixin(ActivitypubMixin):
         signature = None
         create_id = self.remote_id + "/activity"
         if hasattr(activity_object, "content") and activity_object.content:
-            signer = pkcs1_15.new(RSA.import_key(user.key_pair.private_key))
-            content = activity_object.content
-            signed_message = signer.sign(SHA256.new(content.encode("utf8")))
+            signed_message = sign_message(
+                user.key_pair.private_key, activity_object.content
+            )
 
             signature = activitypub.Signature(
                 creator=f"{user.remote_id}#main-key",
@@ -520,21 +576,64 @@ def broadcast_task(sender_id: int, activity: str, recipients: list[str]):
     """the celery task for broadcast"""
     user_model = apps.get_model("bookwyrm.User", require_ready=True)
     sender = user_model.objects.select_related("key_pair").get(id=sender_id)
-    asyncio.run(async_broadcast(recipients, sender, activity))
+    delivery_model = apps.get_model("bookwyrm.Delivery", require_ready=True)
+    delivery_model.deliver(sender, activity, recipients)
+
+
+class BroadcastClient:
+    """an event loop and http session that last as long as the worker process,
+    so connections to other servers are re-used from one broadcast to the next"""
+
+    def __init__(self):
+        self.pid = None
+        self.loop = None
+        self.session = None
+
+    def run(self, coroutine):
+        """run a coroutine on this process's event loop"""
+        if self.pid != os.getpid():
+            # the loop and connections can't be shared with a forked process
+            self.pid = os.getpid()
+            self.loop = asyncio.new_event_loop()
+            self.session = None
+        return self.loop.run_until_complete(coroutine)
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """the shared session, which has to be created inside the running loop"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=BROADCAST_MAX_CONNECTIONS,
+                limit_per_host=BROADCAST_MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=BROADCAST_SOCKET_TIMEOUT,
+                sock_read=BROADCAST_SOCKET_TIMEOUT,
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.session
 
+    def close(self):
+        """close any open connections"""
+        if self.pid != os.getpid() or self.loop is None:
+            return
+        if self.session is not None:
+            self.loop.run_until_complete(self.session.close())
+            self.session = None
+        self.loop.close()
+        self.loop = None
+        self.pid = None
 
-async def async_broadcast(recipients: list[str], sender, data: str):
-    """Send all the broadcasts simultaneously"""
-    timeout = aiohttp.ClientTimeout(total=10)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        tasks = []
-        for recipient in recipients:
-            tasks.append(
-                asyncio.ensure_future(sign_and_send(session, sender, data, recipient))
-            )
 
-        results = await asyncio.gather(*tasks)
-        return results
+broadcast_client = BroadcastClient()
+
+
+@worker_process_shutdown.connect
+def close_broadcast_client(**kwargs):  # pylint: disable=unused-argument
+    """don't leave connections hanging when the worker stops"""
+    broadcast_client.close()
 
 
 async def sign_and_send(
@@ -567,23 +666,26 @@ async def sign_and_send(
 
     try:
         async with session.post(destination, data=data, headers=headers) as response:
-            if not response.ok:
-                logger.exception(
-                    "Failed to send broadcast to %s: %s", destination, response.reason
-                )
-                if kwargs.get("use_legacy_key") is not True:
-                    logger.info("Trying again with legacy keyId header value")
-                    asyncio.ensure_future(
-                        sign_and_send(
-                            session, sender, data, destination, use_legacy_key=True
-                        )
-                    )
-
-            return response
+            if response.ok:
+                return response
+            logger.exception(
+                "Failed to send broadcast to %s: %s", destination, response.reason
+            )
     except asyncio.TimeoutError:
         logger.info("Connection timed out for url: %s", destination)
+        return None
     except aiohttp.ClientError as err:
         logger.exception(err)
+        return None
+
+    if kwargs.get("use_legacy_key") is not True:
+        logger.info("Trying again with legacy keyId header value")
+        # the loop outlives this broadcast, so finish the retry now rather than
+        # leaving it pending until the next one
+        return await sign_and_send(
+            session, sender, data, destination, use_legacy_key=True
+        )
+    return response
 
 
 # pylint: disable=unused-argument
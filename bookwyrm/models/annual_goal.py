@@ -6,6 +6,7 @@ from django.utils import timezone
 from bookwyrm.models.status import Review
 from .base_model import BookWyrmModel
 from . import fields, Review
+from .reading_stats import ReadingStats
 
 
 def get_current_year():
@@ -41,7 +42,7 @@ class AnnualGoal(BookWyrmModel):
                 finish_date__year__lt=self.year + 1,
             )
             .order_by("-finish_date")
-            .all()
+            .select_related("book")
         )
 
     @property
@@ -57,10 +58,7 @@ class AnnualGoal(BookWyrmModel):
     @property
     def progress(self):
         """how many books you've read this year"""
-        count = self.user.readthrough_set.filter(
-            finish_date__year__gte=self.year,
-            finish_date__year__lt=self.year + 1,
-        ).count()
+        count = ReadingStats.get_for_year(self.user, self.year).finished_count
         return {
             "count": count,
             "percent": int(float(count / self.goal) * 100),
@@ -6,8 +6,10 @@ from django.apps import apps
 from django.core.exceptions import PermissionDenied
 from django.db import models, transaction
 from django.db.models import Q
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from bookwyrm.blocklist import blocked_addresses
 from bookwyrm.tasks import app, MISC
 from .base_model import BookWyrmModel
 from .notification import NotificationType
@@ -57,6 +59,14 @@ class IPBlocklist(AdminModel):
         ordering = ("-created_date",)
 
 
+# pylint: disable=unused-argument
+@receiver(models.signals.post_save, sender=IPBlocklist)
+@receiver(models.signals.post_delete, sender=IPBlocklist)
+def update_blocked_addresses(sender, instance, *args, **kwargs):
+    """an address has been blocked or unblocked"""
+    blocked_addresses.changed()
+
+
 class AutoMod(AdminModel):
     """rules to automatically flag suspicious activity"""
 
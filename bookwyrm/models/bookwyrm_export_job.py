@@ -1,13 +1,18 @@
 """Export user account to tar.gz file for import into another Bookwyrm instance"""
 
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 import dataclasses
 import logging
+import math
+import tempfile
 from uuid import uuid4
 
-from django.db.models import FileField
-from django.db.models import Q
+from django.db.models import FileField, IntegerField
+from django.db.models import Exists, OuterRef
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.files.base import ContentFile
+from django.utils import timezone
 
 from bookwyrm.models import AnnualGoal, ReadThrough, ShelfBook, List, ListItem
 from bookwyrm.models import Review, Comment, Quotation
@@ -19,11 +24,20 @@ from bookwyrm.utils.tar import BookwyrmTarFile
 
 logger = logging.getLogger(__name__)
 
+# how many books are loaded from the database at a time
+EXPORT_CHUNK_SIZE = 100
+# how many cover images are read at the same time
+COVER_READ_WORKERS = 4
+# how much of the json is kept in memory before it's written to a temporary file
+JSON_SPOOL_SIZE = 1024 * 1024 * 10
+
 
 class BookwyrmExportJob(ParentJob):
     """entry for a specific request to export a bookwyrm user"""
 
     export_data = FileField(null=True)
+    books_total = IntegerField(null=True, blank=True)
+    books_exported = IntegerField(default=0)
 
     def start_job(self):
         """Start the job"""
@@ -31,6 +45,19 @@ class BookwyrmExportJob(ParentJob):
 
         return self
 
+    @property
+    def percent_complete(self):
+        """How far along?"""
+        if not self.books_total:
+            return 0
+        return math.floor(self.books_exported / self.books_total * 100)
+
+    def update_progress(self, books_exported):
+        """keep track of how many books have been exported"""
+        self.books_exported = books_exported
+        self.updated_date = timezone.now()
+        self.save(update_fields=["books_exported", "updated_date"])
+
 
 @app.task(queue=IMPORTS, base=ParentTask)
 def start_export_task(**kwargs):
@@ -43,8 +70,7 @@ def start_export_task(**kwargs):
     try:
         # This is where ChildJobs get made
         job.export_data = ContentFile(b"", str(uuid4()))
-        json_data = json_export(job.user)
-        tar_export(json_data, job.user, job.export_data)
+        tar_export(job.user, job.export_data, job=job)
         job.save(update_fields=["export_data"])
     except Exception as err:  # pylint: disable=broad-except
         logger.exception("User Export Job %s Failed with error: %s", job.id, err)
@@ -53,28 +79,93 @@ def start_export_task(**kwargs):
     job.set_status("complete")
 
 
-def tar_export(json_data: str, user, file):
-    """wrap the export information in a tar file"""
+def tar_export(user, file, job=None):
+    """wrap the export information in a tar file, adding covers as the books are
+    exported and the json once it's all been written"""
     file.open("wb")
-    with BookwyrmTarFile.open(mode="w:gz", fileobj=file) as tar:
-        tar.write_bytes(json_data.encode("utf-8"))
+    with BookwyrmTarFile.open(
+        mode="w:gz", fileobj=file
+    ) as tar, tempfile.SpooledTemporaryFile(max_size=JSON_SPOOL_SIZE) as json_file:
+        covers = []
+        for data in json_export_chunks(user, job=job, covers=covers):
+            json_file.write(data.encode("utf-8"))
+            if len(covers) >= EXPORT_CHUNK_SIZE:
+                add_images(tar, covers)
+                covers.clear()
+        add_images(tar, covers)
+
+        tar.write_file(json_file)
 
         # Add avatar image if present
         if getattr(user, "avatar", False):
             tar.add_image(user.avatar, filename="avatar")
 
-        editions = get_books_for_user(user)
-        for book in editions:
-            if getattr(book, "cover", False):
-                tar.add_image(book.cover)
-
     file.close()
 
 
-def json_export(
-    user,
-):  # pylint: disable=too-many-locals, too-many-statements, too-many-branches
+def add_images(tar, images):
+    """read images a few at a time, and add them to the tar in order. only a few
+    reads are queued ahead, so no more than that are held in memory"""
+    if not images:
+        return
+    with ThreadPoolExecutor(max_workers=COVER_READ_WORKERS) as executor:
+        reading = deque()
+        for image in images:
+            if len(reading) >= COVER_READ_WORKERS:
+                done, future = reading.popleft()
+                tar.add_image(done, data=future.result())
+            reading.append((image, executor.submit(read_image, image)))
+        for done, future in reading:
+            tar.add_image(done, data=future.result())
+
+
+def read_image(image):
+    """the contents of an image file"""
+    with image.open("rb"):
+        return image.read()
+
+
+def json_export(user):
     """Generate an export for a user"""
+    return "".join(json_export_chunks(user))
+
+
+def json_export_chunks(user, job=None, covers=None):
+    """Generate an export for a user, a piece at a time, so that large libraries
+    don't need to be held in memory. Covers of the exported books are added to the
+    covers list as they're found."""
+    exported_user = get_user_data(user)
+    encoder = DjangoJSONEncoder()
+
+    # the books are written out last, one at a time
+    yield encoder.encode(exported_user)[:-1]
+    yield ', "books": ['
+
+    editions = get_books_for_user(user)
+    if job:
+        job.books_total = editions.count()
+        job.save(update_fields=["books_total"])
+
+    exported = 0
+    last_id = 0
+    while True:
+        chunk = list(editions.filter(id__gt=last_id)[:EXPORT_CHUNK_SIZE])
+        if not chunk:
+            break
+        for book in get_books_data(user, chunk):
+            yield (", " if exported else "") + encoder.encode(book)
+            exported += 1
+        if covers is not None:
+            covers.extend(e.cover for e in chunk if getattr(e, "cover", False))
+        if job:
+            job.update_progress(exported)
+        last_id = chunk[-1].id
+
+    yield "]}"
+
+
+def get_user_data(user):
+    """Everything about the user that isn't about a particular book"""
 
     # User as AP object
     exported_user = user.to_activity()
@@ -107,91 +198,6 @@ def json_export(
             {"goal": goal.goal, "year": goal.year, "privacy": goal.privacy}
         )
 
-    # Reading history - can't be serialized as AP
-    readthroughs = ReadThrough.objects.filter(user=user).distinct().values()
-    readthroughs = list(readthroughs)
-
-    # Books
-    editions = get_books_for_user(user)
-    exported_user["books"] = []
-
-    for edition in editions:
-        book = {}
-        book["work"] = edition.parent_work.to_activity()
-        book["edition"] = edition.to_activity()
-
-        if book["edition"].get("cover"):
-            # change the URL to be relative to the JSON file
-            filename = book["edition"]["cover"]["url"].rsplit("/", maxsplit=1)[-1]
-            book["edition"]["cover"]["url"] = f"covers/{filename}"
-
-        # authors
-        book["authors"] = []
-        for author in edition.authors.all():
-            book["authors"].append(author.to_activity())
-
-        # Shelves this book is on
-        # Every ShelfItem is this book so we don't other serializing
-        book["shelves"] = []
-        shelf_books = (
-            ShelfBook.objects.select_related("shelf")
-            .filter(user=user, book=edition)
-            .distinct()
-        )
-
-        for shelfbook in shelf_books:
-            book["shelves"].append(shelfbook.shelf.to_activity())
-
-        # Lists and ListItems
-        # ListItems include "notes" and "approved" so we need them
-        # even though we know it's this book
-        book["lists"] = []
-        list_items = ListItem.objects.filter(book=edition, user=user).distinct()
-
-        for item in list_items:
-            list_info = item.book_list.to_activity()
-            list_info[
-                "privacy"
-            ] = item.book_list.privacy  # this isn't serialized so we add it
-            list_info["list_item"] = item.to_activity()
-            book["lists"].append(list_info)
-
-        # Statuses
-        # Can't use select_subclasses here because
-        # we need to filter on the "book" value,
-        # which is not available on an ordinary Status
-        for status in ["comments", "quotations", "reviews"]:
-            book[status] = []
-
-        comments = Comment.objects.filter(user=user, book=edition).all()
-        for status in comments:
-            obj = status.to_activity()
-            obj["progress"] = status.progress
-            obj["progress_mode"] = status.progress_mode
-            book["comments"].append(obj)
-
-        quotes = Quotation.objects.filter(user=user, book=edition).all()
-        for status in quotes:
-            obj = status.to_activity()
-            obj["position"] = status.position
-            obj["endposition"] = status.endposition
-            obj["position_mode"] = status.position_mode
-            book["quotations"].append(obj)
-
-        reviews = Review.objects.filter(user=user, book=edition).all()
-        for status in reviews:
-            obj = status.to_activity()
-            book["reviews"].append(obj)
-
-        # readthroughs can't be serialized to activity
-        book_readthroughs = (
-            ReadThrough.objects.filter(user=user, book=edition).distinct().values()
-        )
-        book["readthroughs"] = list(book_readthroughs)
-
-        # append everything
-        exported_user["books"].append(book)
-
     # saved book lists - just the remote id
     saved_lists = List.objects.filter(id__in=user.saved_lists.all()).distinct()
     exported_user["saved_lists"] = [l.remote_id for l in saved_lists]
@@ -207,23 +213,120 @@ def json_export(
 
     exported_user["blocks"] = [b.remote_id for b in blocking]
 
-    return DjangoJSONEncoder().encode(exported_user)
+    return exported_user
+
+
+def get_books_data(user, editions):
+    """The user's data for a chunk of books, loaded with a few queries for the
+    whole chunk rather than for each book"""
+    book_ids = [edition.id for edition in editions]
+
+    # Every ShelfItem is this book so we don't other serializing
+    shelf_books = group_by_book(
+        ShelfBook.objects.select_related("shelf", "shelf__user").filter(
+            user=user, book_id__in=book_ids
+        )
+    )
+    # ListItems include "notes" and "approved" so we need them
+    # even though we know it's this book
+    list_items = group_by_book(
+        ListItem.objects.select_related("book", "user", "book_list__user").filter(
+            user=user, book_id__in=book_ids
+        )
+    )
+    # Can't use select_subclasses here because
+    # we need to filter on the "book" value,
+    # which is not available on an ordinary Status
+    statuses = {}
+    for model in [Comment, Quotation, Review]:
+        statuses[model] = group_by_book(
+            model.objects.select_related("user", "book")
+            .prefetch_related("mention_users", "mention_books", "attachments")
+            .filter(user=user, book_id__in=book_ids)
+        )
+    # readthroughs can't be serialized to activity
+    readthroughs = defaultdict(list)
+    for readthrough in ReadThrough.objects.filter(
+        user=user, book_id__in=book_ids
+    ).values():
+        readthroughs[readthrough["book_id"]].append(readthrough)
+
+    for edition in editions:
+        yield get_book_data(edition, shelf_books, list_items, statuses, readthroughs)
+
+
+def get_book_data(edition, shelf_books, list_items, statuses, readthroughs):
+    """The user's data for one book, from what get_books_data loaded"""
+    book = {}
+    book["work"] = edition.parent_work.to_activity()
+    book["edition"] = edition.to_activity()
+
+    if book["edition"].get("cover"):
+        # change the URL to be relative to the JSON file
+        filename = book["edition"]["cover"]["url"].rsplit("/", maxsplit=1)[-1]
+        book["edition"]["cover"]["url"] = f"covers/{filename}"
+
+    book["authors"] = [author.to_activity() for author in edition.authors.all()]
+
+    # Shelves this book is on
+    book["shelves"] = [
+        shelfbook.shelf.to_activity() for shelfbook in shelf_books[edition.id]
+    ]
+
+    # Lists and ListItems
+    book["lists"] = []
+    for item in list_items[edition.id]:
+        list_info = item.book_list.to_activity()
+        list_info[
+            "privacy"
+        ] = item.book_list.privacy  # this isn't serialized so we add it
+        list_info["list_item"] = item.to_activity()
+        book["lists"].append(list_info)
+
+    # Statuses
+    book["comments"] = []
+    for status in statuses[Comment][edition.id]:
+        obj = status.to_activity()
+        obj["progress"] = status.progress
+        obj["progress_mode"] = status.progress_mode
+        book["comments"].append(obj)
+
+    book["quotations"] = []
+    for status in statuses[Quotation][edition.id]:
+        obj = status.to_activity()
+        obj["position"] = status.position
+        obj["endposition"] = status.endposition
+        obj["position_mode"] = status.position_mode
+        book["quotations"].append(obj)
+
+    book["reviews"] = [status.to_activity() for status in statuses[Review][edition.id]]
+
+    book["readthroughs"] = readthroughs[edition.id]
+
+    return book
+
+
+def group_by_book(queryset):
+    """a dict of a queryset's rows by book id"""
+    grouped = defaultdict(list)
+    for item in queryset:
+        grouped[item.book_id].append(item)
+    return grouped
 
 
 def get_books_for_user(user):
     """Get all the books and editions related to a user"""
-
-    editions = (
+    book = OuterRef("pk")
+    return (
         Edition.objects.select_related("parent_work")
+        .prefetch_related("authors")
         .filter(
-            Q(shelves__user=user)
-            | Q(readthrough__user=user)
-            | Q(review__user=user)
-            | Q(list__user=user)
-            | Q(comment__user=user)
-            | Q(quotation__user=user)
+            Exists(ShelfBook.objects.filter(user=user, book=book))
+            | Exists(ReadThrough.objects.filter(user=user, book=book))
+            | Exists(Review.objects.filter(user=user, book=book))
+            | Exists(ListItem.objects.filter(user=user, book=book))
+            | Exists(Comment.objects.filter(user=user, book=book))
+            | Exists(Quotation.objects.filter(user=user, book=book))
         )
-        .distinct()
+        .order_by("id")
     )
-
-    return editions
@@ -1,22 +1,41 @@
 """Import a user from another Bookwyrm instance"""
 
+import hashlib
 import json
 import logging
 
-from django.db.models import FileField, JSONField, CharField
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import FileField, JSONField, CharField, F, Func, Max, Q, Value
+from django.db.models.functions import MD5
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.html import strip_tags
 from django.contrib.postgres.fields import ArrayField as DjangoArrayField
 
 from bookwyrm import activitypub
 from bookwyrm import models
 from bookwyrm.tasks import app, IMPORTS
-from bookwyrm.models.job import ParentJob, ParentTask, SubTask
+from bookwyrm.models.job import ChildJob, ParentJob, ParentTask, SubTask
+from bookwyrm.models.job import create_child_job
+from bookwyrm.models.reading_stats import get_timezone, get_year
 from bookwyrm.utils.tar import BookwyrmTarFile
 
 logger = logging.getLogger(__name__)
 
 
+# how many books each child job imports
+IMPORT_CHUNK_SIZE = 100
+
+READTHROUGH_FIELDS = [
+    "progress_mode",
+    "start_date",
+    "finish_date",
+    "stopped_date",
+    "is_active",
+]
+
+
 class BookwyrmImportJob(ParentJob):
     """entry for a specific request for importing a bookwyrm user backup"""
 
@@ -26,7 +45,7 @@ class BookwyrmImportJob(ParentJob):
 
     def start_job(self):
         """Start the job"""
-        start_import_task.delay(job_id=self.id, no_children=True)
+        start_import_task.delay(job_id=self.id, no_children=False)
 
 
 @app.task(queue=IMPORTS, base=ParentTask)
@@ -43,6 +62,8 @@ def start_import_task(**kwargs):
         archive_file.open("rb")
         with BookwyrmTarFile.open(mode="r:gz", fileobj=archive_file) as tar:
             job.import_data = json.loads(tar.read("archive.json").decode("utf-8"))
+            job.save(update_fields=["import_data"])
+            job.set_status("active")
 
             if "include_user_profile" in job.required:
                 update_user_profile(job.user, tar, job.import_data)
@@ -56,51 +77,321 @@ def start_import_task(**kwargs):
                 upsert_follows(job.user, job.import_data.get("follows"))
             if "include_blocks" in job.required:
                 upsert_user_blocks(job.user, job.import_data.get("blocks"))
+        archive_file.close()
 
-            process_books(job, tar)
-
+        # the child jobs complete the job once they've all finished
+        if not process_books(job):
             job.set_status("complete")
-        archive_file.close()
 
     except Exception as err:  # pylint: disable=broad-except
         logger.exception("User Import Job %s Failed with error: %s", job.id, err)
         job.set_status("failed")
 
 
-def process_books(job, tar):
+def process_books(job):
     """
-    Process user import data related to books
+    Split the books into chunks that are imported by child jobs
     We always import the books even if not assigning
     them to shelves, lists etc
     """
+    books = job.import_data.get("books") or []
+    book_count = len(books)
+
+    # the child jobs run at the same time, so anything that they share is created
+    # here first, instead of by whichever of them gets to it first
+    create_authors_and_works(books)
+    if "include_shelves" in job.required:
+        create_shelves(job.user, books)
+    if "include_lists" in job.required:
+        create_lists(job.user, books)
+
+    # none of the child jobs start until they've all been created, so that the
+    # job isn't completed by the first one to finish
+    with transaction.atomic():
+        for start in range(0, book_count, IMPORT_CHUNK_SIZE):
+            create_child_job(job, import_books_task, start=start)
+
+    return book_count
+
+
+@app.task(queue=IMPORTS, base=SubTask)
+def import_books_task(**kwargs):
+    """import a chunk of the books"""
+    job = BookwyrmImportJob.objects.defer("import_data").get(id=kwargs["job_id"])
+
+    # don't start the job if it was stopped from the UI
+    if job.complete:
+        return
+
+    try:
+        books = get_books_chunk(job.id, kwargs["start"])
+        job.archive_file.open("rb")
+        with BookwyrmTarFile.open(mode="r:gz", fileobj=job.archive_file) as tar:
+            import_books(job, books, tar)
+        job.archive_file.close()
+
+    except Exception as err:  # pylint: disable=broad-except
+        logger.exception(
+            "User Import Job %s failed to import books from %s with error: %s",
+            job.id,
+            kwargs["start"],
+            err,
+        )
+        ChildJob.objects.get(id=kwargs["child_id"]).fail_job()
+
+
+def create_authors_and_works(books):
+    """create the authors and works of the books that aren't in the database yet,
+    once each, so that books that share them don't each create their own"""
+    editions = models.Edition.find_existing_many([book["edition"] for book in books])
+    new_books = [book for (book, edition) in zip(books, editions) if not edition]
+
+    authors = {
+        author["id"]: author for book in new_books for author in book.get("authors")
+    }
+    for author in authors.values():
+        activitypub.parse(author).to_model(
+            model=models.Author, save=True, overwrite=True
+        )
 
-    books = job.import_data.get("books")
+    works = {book["work"]["id"]: book["work"] for book in new_books}
+    for work in works.values():
+        activitypub.parse({**work, "editions": []}).to_model(
+            model=models.Work, save=True, overwrite=True
+        )
 
-    for data in books:
-        book = get_or_create_edition(data, tar)
 
+def create_shelves(user, books):
+    """create any of the shelves in the import data that the user doesn't have"""
+    existing = set(
+        models.Shelf.objects.filter(user=user).values_list("name", flat=True)
+    )
+    for book in books:
+        for shelf in book.get("shelves") or []:
+            if shelf["name"] not in existing:
+                models.Shelf.objects.create(name=shelf["name"], user=user)
+                existing.add(shelf["name"])
+
+
+def create_lists(user, books):
+    """create any of the lists in the import data that the user doesn't have"""
+    existing = set(models.List.objects.filter(user=user).values_list("name", flat=True))
+    for book in books:
+        for blist in book.get("lists") or []:
+            if blist["name"] not in existing:
+                create_list(user, blist)
+                existing.add(blist["name"])
+
+
+def get_books_chunk(job_id, start):
+    """one chunk of the books in the import data, without loading all the rest"""
+    path = f"$.books[{start} to {start + IMPORT_CHUNK_SIZE - 1}]"
+    return (
+        BookwyrmImportJob.objects.filter(id=job_id)
+        .annotate(
+            books=Func(
+                F("import_data"),
+                Value(path),
+                function="jsonb_path_query_array",
+                output_field=JSONField(),
+            )
+        )
+        .values_list("books", flat=True)
+        .get()
+    )
+
+
+def import_books(job, books, tar):
+    """import some books and the user's shelves, statuses, and so on for them"""
+    editions = [(get_or_create_edition(data, tar), data) for data in books]
+    index = ImportIndex(job.user, [book.id for (book, _) in editions])
+
+    for (book, data) in editions:
         if "include_shelves" in job.required:
-            upsert_shelves(book, job.user, data)
+            upsert_shelves(book, job.user, data, index=index)
 
         if "include_readthroughs" in job.required:
-            upsert_readthroughs(data.get("readthroughs"), job.user, book.id)
+            upsert_readthroughs(
+                data.get("readthroughs"), job.user, book.id, index=index
+            )
 
         if "include_comments" in job.required:
             upsert_statuses(
-                job.user, models.Comment, data.get("comments"), book.remote_id
+                job.user,
+                models.Comment,
+                data.get("comments"),
+                book.remote_id,
+                index=index,
             )
         if "include_quotations" in job.required:
             upsert_statuses(
-                job.user, models.Quotation, data.get("quotations"), book.remote_id
+                job.user,
+                models.Quotation,
+                data.get("quotations"),
+                book.remote_id,
+                index=index,
             )
 
         if "include_reviews" in job.required:
             upsert_statuses(
-                job.user, models.Review, data.get("reviews"), book.remote_id
+                job.user,
+                models.Review,
+                data.get("reviews"),
+                book.remote_id,
+                index=index,
             )
 
         if "include_lists" in job.required:
-            upsert_lists(job.user, data.get("lists"), book.id)
+            upsert_lists(job.user, data.get("lists"), book.id, index=index)
+
+    index.save()
+
+
+class ImportIndex:
+    """What the user already has for some books, loaded up front so that each row
+    being imported doesn't need its own queries to check whether it's a duplicate.
+    New shelf books and readthroughs are collected and then created all at once"""
+
+    def __init__(self, user, book_ids):
+        self.user = user
+
+        self.shelves = {}
+        for shelf in models.Shelf.objects.filter(user=user):
+            self.shelves.setdefault(shelf.name, shelf)
+        self.shelf_books = set(
+            models.ShelfBook.objects.filter(
+                user=user, book_id__in=book_ids
+            ).values_list("book_id", "shelf_id")
+        )
+        self.shelved_works = set(
+            models.ShelfBook.objects.filter(
+                user=user, book__parent_work__editions__in=book_ids
+            ).values_list("book__parent_work_id", flat=True)
+        )
+        self.new_shelf_books = []
+
+        self.readthroughs = set(
+            models.ReadThrough.objects.filter(
+                user=user, book_id__in=book_ids
+            ).values_list("book_id", *READTHROUGH_FIELDS)
+        )
+        self.new_readthroughs = []
+
+        # statuses are only imported along with the book they're about
+        self.statuses = set(
+            models.Status.objects.filter(user=user)
+            .filter(
+                Q(comment__book_id__in=book_ids)
+                | Q(quotation__book_id__in=book_ids)
+                | Q(review__book_id__in=book_ids)
+            )
+            .annotate(content_hash=MD5("content"))
+            .values_list("published_date", "content_hash")
+        )
+        self.aliases = {}
+
+        self.lists = {}
+        for book_list in models.List.objects.filter(user=user):
+            self.lists.setdefault(book_list.name, book_list)
+        self.list_items = set(
+            models.ListItem.objects.filter(
+                book_list__user=user, book_id__in=book_ids
+            ).values_list("book_list_id", "book_id")
+        )
+
+    def add_shelf_book(self, book, shelf):
+        """shelve a book, unless it's already on the shelf"""
+        if (book.id, shelf.id) in self.shelf_books:
+            return
+        self.shelf_books.add((book.id, shelf.id))
+        self.new_shelf_books.append(
+            models.ShelfBook(
+                book=book, shelf=shelf, user=self.user, shelved_date=timezone.now()
+            )
+        )
+
+    def add_readthrough(self, readthrough):
+        """add a readthrough, unless there's already one just like it"""
+        # an active readthrough must have an unset finish date
+        if readthrough.finish_date or readthrough.stopped_date:
+            readthrough.is_active = False
+        key = (
+            readthrough.book_id,
+            *(getattr(readthrough, field) for field in READTHROUGH_FIELDS),
+        )
+        if key in self.readthroughs:
+            return
+        self.readthroughs.add(key)
+        self.new_readthroughs.append(readthrough)
+
+    def is_alias(self, remote_id):
+        """is the user allowed to import statuses by this remote user"""
+        if remote_id not in self.aliases:
+            self.aliases[remote_id] = is_alias(self.user, remote_id)
+        return self.aliases[remote_id]
+
+    def status_exists(self, status):
+        """has the user already published this status"""
+        return get_status_key(status) in self.statuses
+
+    def add_status(self, status):
+        """note that a status has been published"""
+        self.statuses.add(get_status_key(status))
+
+    def save(self):
+        """create the new shelf books and readthroughs"""
+        # pylint: disable-next=import-outside-toplevel
+        from bookwyrm.activitystreams import add_book_statuses_task  # circular
+
+        if self.new_shelf_books:
+            models.ShelfBook.objects.bulk_create(
+                self.new_shelf_books, ignore_conflicts=True
+            )
+            set_remote_ids(models.ShelfBook.objects.filter(user=self.user))
+            # this is usually done as each book is shelved
+            for shelf_book in self.new_shelf_books:
+                work_id = shelf_book.book.parent_work_id
+                if self.user.local and work_id not in self.shelved_works:
+                    self.shelved_works.add(work_id)
+                    add_book_statuses_task.delay(self.user.id, shelf_book.book_id)
+            self.new_shelf_books = []
+
+        if self.new_readthroughs:
+            models.ReadThrough.objects.bulk_create(self.new_readthroughs)
+            set_remote_ids(models.ReadThrough.objects.filter(user=self.user))
+            # and this is usually done as each readthrough is saved
+            cache.delete_many(
+                [
+                    f"latest_read_through-{self.user.id}-{readthrough.book_id}"
+                    for readthrough in self.new_readthroughs
+                ]
+            )
+            self.user.update_active_date()
+            user_timezone = get_timezone(self.user.preferred_timezone)
+            years = {
+                get_year(readthrough.finish_date, user_timezone)
+                for readthrough in self.new_readthroughs
+                if readthrough.finish_date
+            }
+            for year in years:
+                models.ReadingStats.update_for_year(self.user.id, year)
+            self.new_readthroughs = []
+
+
+def get_status_key(status):
+    """what's used to tell whether a status has already been imported"""
+    content = status.content
+    if content is not None:
+        content = hashlib.md5(content.encode("utf-8")).hexdigest()
+    return (parse_datetime(status.published), content)
+
+
+def set_remote_ids(queryset):
+    """rows that were bulk created don't get a remote id like they do when saved"""
+    rows = list(queryset.filter(remote_id__isnull=True).select_related("user"))
+    for row in rows:
+        row.remote_id = row.get_remote_id()
+    queryset.model.objects.bulk_update(rows, ["remote_id"])
 
 
 def get_or_create_edition(book_data, tar):
@@ -115,12 +406,16 @@ def get_or_create_edition(book_data, tar):
 
     # make sure we have the authors in the local DB
     # replace the old author ids in the edition JSON
+    # (they're usually created before the import is split up, by
+    # create_authors_and_works)
     edition["authors"] = []
     for author in book_data.get("authors"):
-        parsed_author = activitypub.parse(author)
-        instance = parsed_author.to_model(
-            model=models.Author, save=True, overwrite=True
-        )
+        instance = models.Author.find_existing(author)
+        if not instance:
+            parsed_author = activitypub.parse(author)
+            instance = parsed_author.to_model(
+                model=models.Author, save=True, overwrite=True
+            )
 
         edition["authors"].append(instance.remote_id)
 
@@ -132,9 +427,13 @@ def get_or_create_edition(book_data, tar):
 
     # first we need the parent work to exist
     work = book_data.get("work")
-    work["editions"] = []
-    parsed_work = activitypub.parse(work)
-    work_instance = parsed_work.to_model(model=models.Work, save=True, overwrite=True)
+    work_instance = models.Work.find_existing(work)
+    if not work_instance:
+        work["editions"] = []
+        parsed_work = activitypub.parse(work)
+        work_instance = parsed_work.to_model(
+            model=models.Work, save=True, overwrite=True
+        )
 
     # now we have a work we can add it to the edition
     # and create the edition model instance
@@ -149,37 +448,42 @@ def get_or_create_edition(book_data, tar):
     return book
 
 
-def upsert_readthroughs(data, user, book_id):
+def upsert_readthroughs(data, user, book_id, index=None):
     """Take a JSON string of readthroughs and
     find or create the instances in the database"""
+    chunk = index or ImportIndex(user, [book_id])
 
     for read_through in data:
 
         obj = {}
-        keys = [
-            "progress_mode",
-            "start_date",
-            "finish_date",
-            "stopped_date",
-            "is_active",
-        ]
-        for key in keys:
+        for key in READTHROUGH_FIELDS:
             obj[key] = read_through[key]
-        obj["user_id"] = user.id
+            if isinstance(obj[key], str) and key.endswith("_date"):
+                obj[key] = parse_datetime(obj[key])
+        obj["user"] = user
         obj["book_id"] = book_id
 
-        existing = models.ReadThrough.objects.filter(**obj).first()
-        if not existing:
-            models.ReadThrough.objects.create(**obj)
+        chunk.add_readthrough(models.ReadThrough(**obj))
+
+    if not index:
+        chunk.save()
 
 
-def upsert_statuses(user, cls, data, book_remote_id):
+def upsert_statuses(user, cls, data, book_remote_id, index=None):
     """Take a JSON string of a status and
     find or create the instances in the database"""
+    index = index or ImportIndex(
+        user,
+        list(
+            models.Edition.objects.filter(remote_id=book_remote_id).values_list(
+                "id", flat=True
+            )
+        ),
+    )
 
     for status in data:
-        if is_alias(
-            user, status["attributedTo"]
+        if index.is_alias(
+            status["attributedTo"]
         ):  # don't let l33t hax0rs steal other people's posts
             # update ids and remove replies
             status["attributedTo"] = user.remote_id
@@ -192,8 +496,8 @@ def upsert_statuses(user, cls, data, book_remote_id):
             )  # this parses incorrectly but we can't set it without knowing the new id
             status["inReplyToBook"] = book_remote_id
             parsed = activitypub.parse(status)
-            if not status_already_exists(
-                user, parsed
+            if not index.status_exists(
+                parsed
             ):  # don't duplicate posts on multiple import
 
                 instance = parsed.to_model(model=cls, save=True, overwrite=True)
@@ -210,12 +514,13 @@ def upsert_statuses(user, cls, data, book_remote_id):
 
                 instance.remote_id = instance.get_remote_id()  # update the remote_id
                 instance.save()  # save and broadcast
+                index.add_status(parsed)
 
         else:
             logger.info("User does not have permission to import statuses")
 
 
-def upsert_lists(user, lists, book_id):
+def upsert_lists(user, lists, book_id, index=None):
     """Take a list of objects each containing
     a list and list item as AP objects
 
@@ -224,52 +529,67 @@ def upsert_lists(user, lists, book_id):
     adding new items after checking whether they exist  .
 
     """
-
-    book = models.Edition.objects.get(id=book_id)
+    index = index or ImportIndex(user, [book_id])
 
     for blist in lists:
-        booklist = models.List.objects.filter(name=blist["name"], user=user).first()
+        booklist = index.lists.get(blist["name"])
         if not booklist:
+            booklist = create_list(user, blist)
+            index.lists[booklist.name] = booklist
 
-            blist["owner"] = user.remote_id
-            parsed = activitypub.parse(blist)
-            booklist = parsed.to_model(model=models.List, save=True, overwrite=True)
-
-            booklist.privacy = blist["privacy"]
-            booklist.save()
-
-        item = models.ListItem.objects.filter(book=book, book_list=booklist).exists()
-        if not item:
-            count = booklist.books.count()
-            models.ListItem.objects.create(
-                book=book,
-                book_list=booklist,
-                user=user,
-                notes=blist["list_item"]["notes"],
-                approved=blist["list_item"]["approved"],
-                order=count + 1,
-            )
+        if (booklist.id, book_id) not in index.list_items:
+            add_list_item(booklist, book_id, user, blist["list_item"])
+            index.list_items.add((booklist.id, book_id))
+
+
+def create_list(user, blist):
+    """a new list from its import data"""
+    blist["owner"] = user.remote_id
+    parsed = activitypub.parse(blist)
+    booklist = parsed.to_model(model=models.List, save=True, overwrite=True)
+
+    booklist.privacy = blist["privacy"]
+    booklist.save()
+    return booklist
 
 
-def upsert_shelves(book, user, book_data):
+@transaction.atomic
+def add_list_item(booklist, book_id, user, list_item):
+    """put a book at the end of a list"""
+    # other chunks of the import may be adding to the same list, so wait for them
+    list(models.List.objects.select_for_update().filter(id=booklist.id))
+    order = models.ListItem.objects.filter(book_list=booklist).aggregate(Max("order"))[
+        "order__max"
+    ]
+    models.ListItem.objects.create(
+        book_id=book_id,
+        book_list=booklist,
+        user=user,
+        notes=list_item["notes"],
+        approved=list_item["approved"],
+        order=(order or 0) + 1,
+    )
+
+
+def upsert_shelves(book, user, book_data, index=None):
     """Take shelf JSON objects and create
     DB entries if they don't already exist"""
+    chunk = index or ImportIndex(user, [book.id])
 
     shelves = book_data["shelves"]
     for shelf in shelves:
 
-        book_shelf = models.Shelf.objects.filter(name=shelf["name"], user=user).first()
+        book_shelf = chunk.shelves.get(shelf["name"])
 
         if not book_shelf:
             book_shelf = models.Shelf.objects.create(name=shelf["name"], user=user)
+            chunk.shelves[book_shelf.name] = book_shelf
 
         # add the book as a ShelfBook if needed
-        if not models.ShelfBook.objects.filter(
-            book=book, shelf=book_shelf, user=user
-        ).exists():
-            models.ShelfBook.objects.create(
-                book=book, shelf=book_shelf, user=user, shelved_date=timezone.now()
-            )
+        chunk.add_shelf_book(book, book_shelf)
+
+    if not index:
+        chunk.save()
 
 
 def update_user_profile(user, tar, data):
@@ -446,14 +766,3 @@ def is_alias(user, remote_id):
             return user in remote_user.also_known_as.all()
 
     return False
-
-
-def status_already_exists(user, status):
-    """check whether this status has already been published
-    by this user. We can't rely on to_model() because it
-    only matches on remote_id, which we have to change
-    *after* saving because it needs the primary key (id)"""
-
-    return models.Status.objects.filter(
-        user=user, content=status.content, published_date=status.published
-    ).exists()
@@ -1,12 +1,26 @@
 """ manages interfaces with external sources of book data """
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.utils import timezone
+
 from bookwyrm.connectors.settings import CONNECTORS
+from bookwyrm.settings import SEARCH_TIMEOUT
 
 from .base_model import BookWyrmModel, DeactivationReason
 
 
 ConnectorFiles = models.TextChoices("ConnectorFiles", CONNECTORS)
 
+# how much each search counts towards the running averages
+SEARCH_HEALTH_WEIGHT = 0.2
+# a connector gets this many times its usual response time to answer a search
+SEARCH_DEADLINE_FACTOR = 3
+SEARCH_DEADLINE_MIN = 2
+# searches that can fail in a row before a connector is skipped for a while
+SEARCH_FAILURE_LIMIT = 5
+SEARCH_DISABLE_TIME = timedelta(minutes=10)
+
 
 class Connector(BookWyrmModel):
     """book data source connectors"""
@@ -27,5 +41,64 @@ class Connector(BookWyrmModel):
     search_url = models.CharField(max_length=255, null=True, blank=True)
     isbn_search_url = models.CharField(max_length=255, null=True, blank=True)
 
+    # running averages of how the connector has been answering searches
+    search_latency = models.FloatField(null=True, blank=True)
+    search_error_rate = models.FloatField(default=0)
+    search_failures = models.IntegerField(default=0)
+    # connectors that keep failing aren't searched until this time
+    disabled_until = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         return f"{self.identifier} ({self.id})"
+
+    @property
+    def search_deadline(self) -> float:
+        """how long to wait for search results, based on how fast it usually is"""
+        if self.search_latency is None:
+            return SEARCH_TIMEOUT
+        deadline = max(
+            self.search_latency * SEARCH_DEADLINE_FACTOR, SEARCH_DEADLINE_MIN
+        )
+        return min(deadline, SEARCH_TIMEOUT)
+
+    def record_searches(self, samples: list[tuple[bool, float]]) -> None:
+        """update the running averages with how some searches went, as a list of
+        whether each one failed and how many seconds it took"""
+        fields = [
+            "search_latency",
+            "search_error_rate",
+            "search_failures",
+            "disabled_until",
+        ]
+        # lock the row so searches finishing at the same time don't lose samples
+        with transaction.atomic():
+            connector = Connector.objects.select_for_update().get(id=self.id)
+            for (failed, seconds) in samples:
+                connector.search_error_rate = (
+                    connector.search_error_rate * (1 - SEARCH_HEALTH_WEIGHT)
+                    + failed * SEARCH_HEALTH_WEIGHT
+                )
+                connector.search_failures = (
+                    connector.search_failures + 1 if failed else 0
+                )
+                if connector.search_latency is None:
+                    if not failed:
+                        connector.search_latency = seconds
+                # a search that timed out would have taken at least this long, so
+                # a connector that slows down past its deadline is given more time
+                elif not failed or seconds > connector.search_latency:
+                    connector.search_latency = (
+                        connector.search_latency * (1 - SEARCH_HEALTH_WEIGHT)
+                        + seconds * SEARCH_HEALTH_WEIGHT
+                    )
+
+            connector.disabled_until = None
+            if connector.search_failures >= SEARCH_FAILURE_LIMIT:
+                connector.disabled_until = timezone.now() + SEARCH_DISABLE_TIME
+
+            # saving the whole model could overwrite changes made elsewhere
+            Connector.objects.filter(id=self.id).update(
+                **{field: getattr(connector, field) for field in fields}
+            )
+        for field in fields:
+            setattr(self, field, getattr(connector, field))
@@ -0,0 +1,225 @@
+""" keep trying to send activities that didn't arrive """
+import asyncio
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from bookwyrm.settings import (
+    BROADCAST_MAX_CONNECTIONS,
+    BROADCAST_MAX_CONNECTIONS_PER_HOST,
+)
+from bookwyrm.tasks import app, BROADCAST
+from .activitypub_mixin import broadcast_client, sign_and_send
+from .base_model import BookWyrmModel
+from .federated_server import FederatedServer
+
+# the wait before the first retry, which doubles with each failed attempt
+DELIVERY_BACKOFF = timedelta(minutes=5)
+DELIVERY_MAX_BACKOFF = timedelta(days=1)
+DELIVERY_MAX_ATTEMPTS = 10
+DELIVERY_BATCH_SIZE = 500
+# deliveries being retried are set aside for this long, so they aren't sent twice
+DELIVERY_CLAIM_TIMEOUT = timedelta(minutes=10)
+# after this many failed broadcasts in a row, a server is skipped for a while
+SERVER_FAILURE_THRESHOLD = 5
+# deliveries that were given up on are kept this long, for the admin page
+DELIVERY_FAILED_RETENTION = timedelta(days=30)
+
+DeliveryStatus = [
+    ("pending", _("Pending")),
+    ("failed", _("Failed")),
+]
+
+
+class Delivery(BookWyrmModel):
+    """an activity that hasn't reached an inbox yet"""
+
+    sender = models.ForeignKey("User", on_delete=models.CASCADE)
+    destination = models.CharField(max_length=255)
+    server = models.ForeignKey(
+        "FederatedServer", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    activity = models.TextField()
+    status = models.CharField(max_length=255, choices=DeliveryStatus, default="pending")
+    attempts = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        """look up what's due"""
+
+        indexes = [
+            models.Index(fields=["status", "next_attempt"]),
+        ]
+
+    @classmethod
+    def deliver(cls, sender, activity, recipients):
+        """send an activity, and save the inboxes it didn't reach for later"""
+        servers = {
+            server.server_name: server
+            for server in FederatedServer.objects.filter(
+                server_name__in={get_host(recipient) for recipient in recipients}
+            )
+        }
+        deliveries = [
+            cls(
+                sender=sender,
+                destination=recipient,
+                server=servers.get(get_host(recipient)),
+                activity=activity,
+            )
+            for recipient in recipients
+        ]
+        cls.objects.bulk_create(send_deliveries(deliveries))
+
+
+def get_host(url):
+    """the server name for an inbox"""
+    return urlparse(url).netloc
+
+
+def get_backoff(attempts):
+    """how long to wait after this many failures"""
+    return min(DELIVERY_BACKOFF * 2 ** (attempts - 1), DELIVERY_MAX_BACKOFF)
+
+
+def is_retryable(response):
+    """no response or a server error might work next time, but other errors won't"""
+    return response is None or response.status >= 500 or response.status == 429
+
+
+def send_deliveries(deliveries):
+    """try to send activities, returning the deliveries that didn't succeed with
+    their next attempt (or failure) filled in. servers that are failing are skipped
+    without counting it as an attempt, and deliveries that were turned down by
+    the receiving server are dropped, since sending them again won't help"""
+    now = timezone.now()
+    to_send = []
+    unsent = []
+    for delivery in deliveries:
+        if delivery.server and delivery.server.status == "blocked":
+            continue
+        if delivery.server and not delivery.server.is_available:
+            delivery.next_attempt = delivery.server.unavailable_until
+            unsent.append(delivery)
+            continue
+        to_send.append(delivery)
+
+    responses = broadcast_client.run(async_deliver(to_send)) if to_send else []
+
+    reachable = set()
+    unreachable = set()
+    for delivery, response in zip(to_send, responses):
+        if response is not None and response.ok:
+            reachable.add(delivery.server_id)
+            continue
+
+        delivery.attempts += 1
+        delivery.last_error = (
+            f"HTTP {response.status}" if response is not None else "No response"
+        )
+        if not is_retryable(response):
+            # the server is up, it just doesn't want this activity
+            reachable.add(delivery.server_id)
+            continue
+
+        unreachable.add(delivery.server_id)
+        if delivery.attempts >= DELIVERY_MAX_ATTEMPTS:
+            delivery.status = "failed"
+            # it won't be sent again, so there's no need to keep the activity
+            delivery.activity = ""
+        else:
+            delivery.next_attempt = now + get_backoff(delivery.attempts)
+        unsent.append(delivery)
+
+    reachable.discard(None)
+    unreachable.discard(None)
+    record_server_health(reachable, unreachable - reachable)
+    return unsent
+
+
+async def async_deliver(deliveries):
+    """Send the deliveries, with no more in flight at once than the session has
+    connections for. A delivery that is still waiting for its turn hasn't been
+    sent, so it can't time out and be blamed on the receiving server"""
+    session = broadcast_client.get_session()
+    slots = asyncio.Semaphore(BROADCAST_MAX_CONNECTIONS)
+    host_slots = defaultdict(
+        lambda: asyncio.Semaphore(BROADCAST_MAX_CONNECTIONS_PER_HOST)
+    )
+
+    async def send(delivery):
+        # wait for the host first, so a busy server doesn't hold up the others
+        async with host_slots[get_host(delivery.destination)], slots:
+            return await sign_and_send(
+                session, delivery.sender, delivery.activity, delivery.destination
+            )
+
+    return await asyncio.gather(*[send(delivery) for delivery in deliveries])
+
+
+def record_server_health(reachable, unreachable):
+    """keep count of which servers are failing, and pause ones that keep failing"""
+    now = timezone.now()
+    FederatedServer.objects.filter(id__in=reachable).update(
+        delivery_attempts=F("delivery_attempts") + 1,
+        consecutive_delivery_errors=0,
+        unavailable_until=None,
+    )
+    FederatedServer.objects.filter(id__in=unreachable).update(
+        delivery_attempts=F("delivery_attempts") + 1,
+        delivery_errors=F("delivery_errors") + 1,
+        consecutive_delivery_errors=F("consecutive_delivery_errors") + 1,
+        last_delivery_error=now,
+    )
+    failing = FederatedServer.objects.filter(
+        id__in=unreachable, consecutive_delivery_errors__gte=SERVER_FAILURE_THRESHOLD
+    ).values_list("id", "consecutive_delivery_errors")
+    for (server_id, errors) in failing:
+        FederatedServer.objects.filter(id=server_id).update(
+            unavailable_until=now + get_backoff(errors - SERVER_FAILURE_THRESHOLD + 1)
+        )
+
+
+@app.task(queue=BROADCAST)
+def retry_deliveries_task():
+    """try again to send activities that are due"""
+    now = timezone.now()
+    with transaction.atomic():
+        deliveries = list(
+            Delivery.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("sender__key_pair", "server")
+            .filter(status="pending", next_attempt__lte=now)
+            .order_by("next_attempt")[:DELIVERY_BATCH_SIZE]
+        )
+        Delivery.objects.filter(id__in=[d.id for d in deliveries]).update(
+            next_attempt=now + DELIVERY_CLAIM_TIMEOUT
+        )
+    if not deliveries:
+        return
+
+    unsent = send_deliveries(deliveries)
+    unsent_ids = {delivery.id for delivery in unsent}
+    Delivery.objects.filter(
+        id__in=[d.id for d in deliveries if d.id not in unsent_ids]
+    ).delete()
+    Delivery.objects.bulk_update(
+        unsent, ["status", "attempts", "next_attempt", "last_error", "activity"]
+    )
+
+    if len(deliveries) == DELIVERY_BATCH_SIZE:
+        # there may be more that are due
+        retry_deliveries_task.delay()
+
+
+@app.task(queue=BROADCAST)
+def prune_deliveries_task():
+    """remove deliveries that were given up on a while ago"""
+    Delivery.objects.filter(
+        status="failed", created_date__lt=timezone.now() - DELIVERY_FAILED_RETENTION
+    ).delete()
@@ -1,10 +1,12 @@
 """ connections to external ActivityPub servers """
-from urllib.parse import urlparse
 
 from django.apps import apps
 from django.db import models
+from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from bookwyrm.blocklist import blocked_servers
 from .base_model import BookWyrmModel
 
 FederationStatus = [
@@ -25,6 +27,26 @@ class FederatedServer(BookWyrmModel):
     application_version = models.CharField(max_length=255, null=True, blank=True)
     notes = models.TextField(null=True, blank=True)
 
+    # delivery health, see models/delivery.py
+    delivery_attempts = models.IntegerField(default=0)
+    delivery_errors = models.IntegerField(default=0)
+    consecutive_delivery_errors = models.IntegerField(default=0)
+    last_delivery_error = models.DateTimeField(null=True, blank=True)
+    # stop sending to servers that keep failing until this time
+    unavailable_until = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_available(self):
+        """whether activities should be sent to this server right now"""
+        return not self.unavailable_until or self.unavailable_until <= timezone.now()
+
+    @property
+    def delivery_error_rate(self):
+        """the share of broadcasts to this server that failed"""
+        if not self.delivery_attempts:
+            return None
+        return self.delivery_errors / self.delivery_attempts
+
     def block(self):
         """block a server"""
         self.status = "blocked"
@@ -62,7 +84,16 @@ class FederatedServer(BookWyrmModel):
 
     @classmethod
     def is_blocked(cls, url: str) -> bool:
-        """look up if a domain is blocked"""
-        url = urlparse(url)
-        domain = url.netloc
-        return cls.objects.filter(server_name=domain, status="blocked").exists()
+        """look up if a domain, or a domain it's a subdomain of, is blocked"""
+        return blocked_servers.is_blocked(url)
+
+
+# pylint: disable=unused-argument
+@receiver(models.signals.post_save, sender=FederatedServer)
+@receiver(models.signals.post_delete, sender=FederatedServer)
+def update_blocked_servers(sender, instance, *args, **kwargs):
+    """a server may have been blocked or unblocked"""
+    update_fields = kwargs.get("update_fields")
+    if update_fields and not {"status", "server_name"} & set(update_fields):
+        return
+    blocked_servers.changed()
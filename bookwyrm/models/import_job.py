@@ -1,14 +1,17 @@
 """ track progress of goodreads imports """
 from datetime import datetime
+import logging
 import math
 import re
 import dateutil.parser
 
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from bookwyrm.connectors import connector_manager
+from bookwyrm import book_search
+from bookwyrm.connectors import connector_manager, maybe_isbn
 from bookwyrm.models import (
     User,
     Book,
@@ -23,6 +26,11 @@ from bookwyrm.models import (
 from bookwyrm.tasks import app, IMPORT_TRIGGERED, IMPORTS
 from .fields import PrivacyLevels
 
+logger = logging.getLogger(__name__)
+
+# how many rows each import task works through
+IMPORT_BATCH_SIZE = 50
+
 
 def unquote_string(text):
     """resolve csv quote weirdness"""
@@ -184,9 +192,18 @@ class ImportItem(models.Model):
             else:
                 self.book_guess = book
 
+    def first_search_result(self, query, min_confidence):
+        """search for a book, unless it was already looked up with a batch of rows"""
+        search_results = getattr(self, "search_results", {})
+        if query in search_results:
+            return search_results[query]
+        return connector_manager.first_search_result(
+            query, min_confidence=min_confidence
+        )
+
     def get_book_from_identifier(self, field="isbn"):
         """search by isbn or other unique identifier"""
-        search_result = connector_manager.first_search_result(
+        search_result = self.first_search_result(
             getattr(self, field), min_confidence=0.999
         )
         if search_result:
@@ -203,9 +220,7 @@ class ImportItem(models.Model):
         if not self.title:
             return None, 0
         search_term = construct_search_term(self.title, self.author)
-        search_result = connector_manager.first_search_result(
-            search_term, min_confidence=0.1
-        )
+        search_result = self.first_search_result(search_term, min_confidence=0.1)
         if search_result:
             if isinstance(search_result, Edition):
                 return (search_result, 1)
@@ -325,7 +340,7 @@ class ImportItem(models.Model):
 
 @app.task(queue=IMPORTS)
 def start_import_task(job_id):
-    """trigger the child tasks for each row"""
+    """trigger the child tasks for each batch of rows"""
     job = ImportJob.objects.get(id=job_id)
     job.status = "active"
     job.save(update_fields=["status"])
@@ -334,18 +349,48 @@ def start_import_task(job_id):
         return
 
     # these are sub-tasks so that one big task doesn't use up all the memory in celery
-    for item in job.items.all():
-        task = import_item_task.delay(item.id)
-        item.task_id = task.id
-        item.save()
+    item_ids = list(job.items.order_by("index").values_list("id", flat=True))
+    for start in range(0, len(item_ids), IMPORT_BATCH_SIZE):
+        batch = item_ids[start : start + IMPORT_BATCH_SIZE]
+        task = import_batch_task.delay(job.id, batch)
+        ImportItem.objects.filter(id__in=batch).update(task_id=task.id)
     job.status = "active"
     job.save()
 
 
+@app.task(queue=IMPORTS)
+def import_batch_task(job_id, item_ids):
+    """resolve a batch of rows into books"""
+    job = ImportJob.objects.get(id=job_id)
+    # make sure the job has not been stopped
+    if job.complete:
+        return
+
+    items = list(ImportItem.objects.filter(id__in=item_ids).order_by("index"))
+    try:
+        resolve_items(items)
+    except Exception:  # pylint: disable=broad-except
+        # the rows will each be searched for on their own instead
+        logger.exception("Unable to look up books for import job %s", job_id)
+        for item in items:
+            item.search_results = {}
+
+    for item in items:
+        try:
+            import_item(item)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Unable to import item %s", item.id)
+
+
 @app.task(queue=IMPORTS)
 def import_item_task(item_id):
     """resolve a row into a book"""
     item = ImportItem.objects.get(id=item_id)
+    import_item(item)
+
+
+def import_item(item):
+    """resolve a row into a book, and shelve it"""
     # make sure the job has not been stopped
     if item.job.complete:
         return
@@ -368,6 +413,75 @@ def import_item_task(item_id):
     item.update_job()
 
 
+def resolve_items(items):
+    """Look up the books for a batch of rows together. ISBNs are all found in the
+    local database with one query, and whatever isn't found locally is searched for
+    remotely all at once. What's found is stored on the items for resolve()"""
+    searches, isbns = get_item_searches(items)
+    results, remote = find_local_books(set(searches.values()), isbns)
+
+    # remote results are cached by the connector manager, so imports running at
+    # the same time don't send the same searches
+    if remote:
+        results.update(connector_manager.search_many(remote))
+
+    for (item, search) in searches.items():
+        if search in results:
+            item.search_results = {search[0]: results[search]}
+
+
+def get_item_searches(items):
+    """the search each unresolved row needs, and its normalized isbns"""
+    searches = {}
+    for item in items:
+        if item.book:
+            continue
+        if item.isbn:
+            searches[item] = (item.isbn, 0.999)
+        elif item.openlibrary_key:
+            searches[item] = (item.openlibrary_key, 0.999)
+        elif item.title:
+            searches[item] = (construct_search_term(item.title, item.author), 0.1)
+
+    isbns = {
+        item.isbn: item.isbn.strip().upper().rjust(10, "0")
+        for item in searches
+        if item.isbn and maybe_isbn(item.isbn)
+    }
+    return searches, isbns
+
+
+def find_local_books(searches, isbns):
+    """the searches that can be answered from the local database, and the rest"""
+    results = {}
+    editions = Edition.objects.filter(
+        Q(isbn_10__in=isbns.values()) | Q(isbn_13__in=isbns.values())
+    ).order_by("id")
+    editions_by_isbn = {}
+    for edition in editions:
+        for isbn in (edition.isbn_10, edition.isbn_13):
+            if isbn:
+                editions_by_isbn.setdefault(isbn, edition)
+    for (query, isbn) in isbns.items():
+        if isbn in editions_by_isbn:
+            results[(query, 0.999)] = editions_by_isbn[isbn]
+
+    remote = []
+    for search in searches:
+        if search in results:
+            continue
+        # isbns that weren't found have already been looked for locally
+        if search[0] not in isbns:
+            local = book_search.search(
+                search[0], min_confidence=search[1], return_first=True
+            )
+            if local:
+                results[search] = local
+                continue
+        remote.append(search)
+    return results, remote
+
+
 def handle_imported_book(item):
     """process a csv and then post about it"""
     job = item.job
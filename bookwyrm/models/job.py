@@ -176,6 +176,20 @@ class ChildJob(Job):
         super().complete_job()
         self.parent_job.notify_child_job_complete()
 
+    def fail_job(self):
+        """Report to parent_job that the job has finished, but failed. Unlike
+        stop_job, this is called from the job's own task, so the task isn't
+        revoked"""
+        if self.complete:
+            return
+
+        self.status = self.Status.FAILED
+        self.complete = True
+        self.updated_date = timezone.now()
+
+        self.save(update_fields=["status", "complete", "updated_date"])
+        self.parent_job.notify_child_job_complete()
+
 
 class ParentTask(app.Task):
     """Used with ParentJob, Abstract Tasks execute code at specific points in
@@ -296,13 +310,15 @@ class SubTask(app.Task):
 
 
 @transaction.atomic
-def create_child_job(parent_job, task_callback):
+def create_child_job(parent_job, task_callback, **kwargs):
     """Utility method for creating a ChildJob
     and running a task to avoid DB race conditions
     """
     child_job = ChildJob.objects.create(parent_job=parent_job)
     transaction.on_commit(
-        lambda: task_callback.delay(job_id=parent_job.id, child_id=child_job.id)
+        lambda: task_callback.delay(
+            job_id=parent_job.id, child_id=child_job.id, **kwargs
+        )
     )
 
     return child_job
@@ -1,7 +1,18 @@
 """ alert a user to activity """
+from collections import defaultdict
+import json
+import logging
+
 from django.db import models, transaction
+from django.db.models import Count, Q
 from django.dispatch import receiver
+from model_utils import FieldTracker
+import redis
+
+from bookwyrm import settings
 from bookwyrm.models.bookwyrm_export_job import BookwyrmExportJob
+from bookwyrm.redis_store import r
+from bookwyrm.tasks import app, MEDIUM
 from .base_model import BookWyrmModel
 from . import (
     Boost,
@@ -14,6 +25,31 @@ from . import (
 from . import ListItem, Report, Status, User, UserFollowRequest
 from .site import InviteRequest
 
+logger = logging.getLogger(__name__)
+
+# notifications that make the notification count stand out
+MENTION_TYPES = ["REPLY", "MENTION", "TAG", "REPORT"]
+# unread counts are re-counted from the database at least this often
+UNREAD_COUNTS_TIMEOUT = 60 * 60
+NOTIFICATIONS_BATCH_ID = "notification-batch"
+NOTIFICATIONS_BATCH_SCHEDULED_ID = "notification-batch-scheduled"
+NOTIFICATIONS_BATCH_SIZE = 1000
+# how long to wait for a scheduled batch task before allowing another to be queued
+NOTIFICATIONS_BATCH_SCHEDULE_TIMEOUT = 300
+# how many of the users involved in a notification are shown
+RELATED_USERS_PREVIEW_LENGTH = 10
+
+# changes the counts only if they're stored, otherwise they'll be counted when
+# they're next needed and that count will include this change
+increment_unread_counts = r.register_script(
+    """
+    if redis.call("exists", KEYS[1]) == 1 then
+        redis.call("hincrby", KEYS[1], "unread", ARGV[1])
+        redis.call("hincrby", KEYS[1], "mentions", ARGV[2])
+    end
+    """
+)
+
 
 class NotificationType(models.TextChoices):
     """you've been tagged, liked, followed, etc"""
@@ -83,19 +119,51 @@ class Notification(BookWyrmModel):
     related_link_domains = models.ManyToManyField("LinkDomain")
     related_invite_requests = models.ManyToManyField("InviteRequest")
 
+    field_tracker = FieldTracker(fields=["read"])
+
     @classmethod
     @transaction.atomic
     def notify(cls, user, related_user, **kwargs):
         """Create a notification"""
         if related_user and (not user.local or user == related_user):
             return
-        notification = cls.objects.filter(user=user, **kwargs).first()
+        cls.notify_many(user.id, [related_user.id] if related_user else [], **kwargs)
+
+    @classmethod
+    @transaction.atomic
+    def notify_many(cls, user_id, related_user_ids, **kwargs):
+        """Add any number of users to a notification at once"""
+        notification = cls.objects.filter(user_id=user_id, **kwargs).first()
         if not notification:
-            notification = cls.objects.create(user=user, **kwargs)
-        if related_user:
-            notification.related_users.add(related_user)
+            notification = cls.objects.create(user_id=user_id, **kwargs)
+        if related_user_ids:
+            notification.related_users.add(*related_user_ids)
         notification.read = False
-        notification.save()
+        notification.save(update_fields=["read", "updated_date"])
+
+    @classmethod
+    def notify_later(cls, user, related_user, related_status, notification_type):
+        """Notify about a like or boost, which may be batched with others"""
+        if not user.local or user == related_user:
+            return
+        if not settings.NOTIFICATIONS_BATCH_DELAY:
+            cls.notify(
+                user,
+                related_user,
+                related_status=related_status,
+                notification_type=notification_type,
+            )
+            return
+
+        entry = json.dumps(
+            {
+                "user": user.id,
+                "related_user": related_user.id,
+                "related_status": related_status.id,
+                "notification_type": notification_type,
+            }
+        )
+        transaction.on_commit(lambda: queue_notification_for_batch(entry))
 
     @classmethod
     @transaction.atomic
@@ -128,16 +196,166 @@ class Notification(BookWyrmModel):
         if not notification.related_users.count():
             notification.delete()
 
+    @classmethod
+    def get_unread_counts(cls, user):
+        """how many unread notifications and mentions the user has"""
+        if transaction.get_connection().in_atomic_block:
+            # changes in the transaction aren't in the stored counts yet
+            return cls.count_unread(user)
+
+        key = unread_counts_id(user.id)
+        try:
+            counts = r.hmget(key, "unread", "mentions")
+            if None not in counts:
+                return {
+                    "unread": max(int(counts[0]), 0),
+                    "mentions": max(int(counts[1]), 0),
+                }
+        except redis.exceptions.RedisError as err:
+            logger.warning("Unable to get notification counts: %s", err)
+            return cls.count_unread(user)
+
+        counts = cls.count_unread(user)
+        try:
+            pipeline = r.pipeline()
+            pipeline.hset(key, mapping=counts)
+            pipeline.expire(key, UNREAD_COUNTS_TIMEOUT)
+            pipeline.execute()
+        except redis.exceptions.RedisError as err:
+            logger.warning("Unable to store notification counts: %s", err)
+        return counts
+
+    @classmethod
+    def count_unread(cls, user):
+        """count unread notifications in the database"""
+        return user.notification_set.filter(read=False).aggregate(
+            unread=Count("id"),
+            mentions=Count("id", filter=Q(notification_type__in=MENTION_TYPES)),
+        )
+
+    @classmethod
+    def mark_read(cls, user, notifications):
+        """mark some of a user's notifications as read"""
+        notifications.update(read=True)
+        # update() doesn't send signals, so the counts have to be redone
+        transaction.on_commit(lambda: forget_unread_counts(user.id))
+
+
+def unread_counts_id(user_id):
+    """the redis key for a user's unread notification counts"""
+    return f"{user_id}-notification-counts"
+
+
+def change_unread_counts(user_id, unread, mentions):
+    """add to or subtract from a user's unread counts"""
+    try:
+        increment_unread_counts(
+            keys=[unread_counts_id(user_id)], args=[unread, mentions]
+        )
+    except redis.exceptions.RedisError as err:
+        logger.warning("Unable to update notification counts: %s", err)
+        forget_unread_counts(user_id)
+
+
+def forget_unread_counts(user_id):
+    """the counts will be re-counted next time they're needed"""
+    try:
+        r.delete(unread_counts_id(user_id))
+    except redis.exceptions.RedisError as err:
+        logger.warning("Unable to clear notification counts: %s", err)
+
+
+@receiver(models.signals.post_save, sender=Notification)
+# pylint: disable=unused-argument
+def update_unread_counts(sender, instance, created, *args, **kwargs):
+    """a notification was added, or read or unread"""
+    previous = instance.field_tracker.previous("read")
+    if created:
+        change = 0 if instance.read else 1
+    # the save that sets a new notification's remote id doesn't change anything
+    elif previous is not None and previous != instance.read:
+        change = -1 if instance.read else 1
+    else:
+        return
+    mentions = change if instance.notification_type in MENTION_TYPES else 0
+    transaction.on_commit(
+        lambda: change_unread_counts(instance.user_id, change, mentions)
+    )
+
+
+@receiver(models.signals.post_delete, sender=Notification)
+# pylint: disable=unused-argument
+def update_unread_counts_on_delete(sender, instance, *args, **kwargs):
+    """an unread notification was removed"""
+    if instance.read:
+        return
+    mentions = -1 if instance.notification_type in MENTION_TYPES else 0
+    transaction.on_commit(lambda: change_unread_counts(instance.user_id, -1, mentions))
+
+
+def queue_notification_for_batch(entry):
+    """buffer a like or boost to be notified about along with its neighbors"""
+    r.rpush(NOTIFICATIONS_BATCH_ID, entry)
+    schedule_notification_batch(settings.NOTIFICATIONS_BATCH_DELAY)
+
+
+def schedule_notification_batch(countdown):
+    """make sure there's a task on its way to process the buffer"""
+    # the expiry means a lost task can't stall the buffer indefinitely
+    expiry = countdown + NOTIFICATIONS_BATCH_SCHEDULE_TIMEOUT
+    if r.set(NOTIFICATIONS_BATCH_SCHEDULED_ID, 1, nx=True, ex=expiry):
+        notification_batch_task.apply_async(countdown=countdown)
+
+
+@app.task(queue=MEDIUM)
+def notification_batch_task():
+    """create or update one notification for each status that was liked or boosted"""
+    # clear the flag first so anything queued from now on gets its own task
+    r.delete(NOTIFICATIONS_BATCH_SCHEDULED_ID)
+    pipeline = r.pipeline()
+    pipeline.lrange(NOTIFICATIONS_BATCH_ID, 0, NOTIFICATIONS_BATCH_SIZE - 1)
+    pipeline.ltrim(NOTIFICATIONS_BATCH_ID, NOTIFICATIONS_BATCH_SIZE, -1)
+    pipeline.llen(NOTIFICATIONS_BATCH_ID)
+    entries, _, remaining = pipeline.execute()
+    if remaining:
+        schedule_notification_batch(0)
+
+    related_users = defaultdict(set)
+    for entry in entries:
+        entry = json.loads(entry)
+        group = (entry["user"], entry["related_status"], entry["notification_type"])
+        related_users[group].add(entry["related_user"])
+
+    for (user_id, status_id, notification_type), user_ids in related_users.items():
+        # the like or boost may have been undone while it was waiting
+        model = Favorite if notification_type == NotificationType.FAVORITE else Boost
+        status_field = (
+            "status_id"
+            if notification_type == NotificationType.FAVORITE
+            else "boosted_status_id"
+        )
+        user_ids = model.objects.filter(
+            user_id__in=user_ids, **{status_field: status_id}
+        ).values_list("user_id", flat=True)
+        if not user_ids:
+            continue
+        Notification.notify_many(
+            user_id,
+            list(user_ids),
+            related_status_id=status_id,
+            notification_type=notification_type,
+        )
+
 
 @receiver(models.signals.post_save, sender=Favorite)
 # pylint: disable=unused-argument
 def notify_on_fav(sender, instance, *args, **kwargs):
     """someone liked your content, you ARE loved"""
-    Notification.notify(
+    Notification.notify_later(
         instance.status.user,
         instance.user,
-        related_status=instance.status,
-        notification_type=NotificationType.FAVORITE,
+        instance.status,
+        NotificationType.FAVORITE,
     )
 
 
@@ -197,17 +415,11 @@ def notify_user_on_mention(sender, instance, *args, **kwargs):
 # pylint: disable=unused-argument
 def notify_user_on_boost(sender, instance, *args, **kwargs):
     """boosting a status"""
-    if (
-        not instance.boosted_status.user.local
-        or instance.boosted_status.user == instance.user
-    ):
-        return
-
-    Notification.notify(
+    Notification.notify_later(
         instance.boosted_status.user,
         instance.user,
-        related_status=instance.boosted_status,
-        notification_type=NotificationType.BOOST,
+        instance.boosted_status,
+        NotificationType.BOOST,
     )
 
 
@@ -0,0 +1,144 @@
+""" running totals of the ratings for each work """
+import math
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.dispatch import receiver
+
+from .book import Edition
+from .status import Review, ReviewRating
+
+
+class RatingAggregate(models.Model):
+    """how a work has been rated, so averages don't need to be worked out from
+    every review each time they're shown"""
+
+    work = models.OneToOneField(
+        "Work", on_delete=models.CASCADE, related_name="rating_aggregate"
+    )
+
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.DecimalField(default=0, max_digits=12, decimal_places=2)
+    rating_sum_squares = models.DecimalField(default=0, max_digits=14, decimal_places=4)
+    local_rating_count = models.IntegerField(default=0)
+    local_rating_sum = models.DecimalField(default=0, max_digits=12, decimal_places=2)
+    local_rating_sum_squares = models.DecimalField(
+        default=0, max_digits=14, decimal_places=4
+    )
+
+    # worked out from the totals, and stored so that they can be sorted by
+    average = models.FloatField(null=True, db_index=True)
+    local_average = models.FloatField(null=True, db_index=True)
+    local_deviation = models.FloatField(null=True)
+
+    def save(self, *args, **kwargs):
+        """keep the averages in line with the totals"""
+        self.average = get_average(self.rating_count, self.rating_sum)
+        self.local_average = get_average(self.local_rating_count, self.local_rating_sum)
+        self.local_deviation = get_deviation(
+            self.local_rating_count,
+            self.local_rating_sum,
+            self.local_rating_sum_squares,
+        )
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def update_for_work(cls, work_id):
+        """re-count the ratings for one work"""
+        with transaction.atomic():
+            # waits for anyone else updating this work, so their rating is counted
+            list(cls.objects.select_for_update().filter(work_id=work_id))
+            totals = get_rating_totals(
+                Review.objects.filter(book__parent_work_id=work_id)
+            )
+            if totals["rating_count"]:
+                aggregate = cls.objects.filter(work_id=work_id).first() or cls(
+                    work_id=work_id
+                )
+                for field, value in totals.items():
+                    setattr(aggregate, field, value or 0)
+                aggregate.save()
+            else:
+                cls.objects.filter(work_id=work_id).delete()
+        cache.delete(f"book-rating-{work_id}")
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls):
+        """re-count the ratings for every work"""
+        work_ids = set(cls.objects.values_list("work_id", flat=True))
+        cls.objects.all().delete()
+        totals = (
+            Review.objects.filter(book__parent_work__isnull=False)
+            .values("book__parent_work_id")
+            .order_by("book__parent_work_id")
+        )
+        count = 0
+        for row in get_rating_totals(totals, aggregate=False).filter(
+            rating_count__gt=0
+        ):
+            aggregate = cls(work_id=row.pop("book__parent_work_id"))
+            for field, value in row.items():
+                setattr(aggregate, field, value or 0)
+            aggregate.save()
+            work_ids.add(aggregate.work_id)
+            count += 1
+        cache.delete_many([f"book-rating-{work_id}" for work_id in work_ids])
+        return count
+
+
+def get_rating_totals(reviews, aggregate=True):
+    """count, sum, and sum of squares of the ratings, overall and for local users"""
+    reviews = reviews.filter(deleted=False, rating__gt=0)
+    local = Q(user__local=True)
+    totals = {
+        "rating_count": Count("id"),
+        "rating_sum": Sum("rating"),
+        "rating_sum_squares": Sum(F("rating") * F("rating")),
+        "local_rating_count": Count("id", filter=local),
+        "local_rating_sum": Sum("rating", filter=local),
+        "local_rating_sum_squares": Sum(F("rating") * F("rating"), filter=local),
+    }
+    if aggregate:
+        return reviews.aggregate(**totals)
+    return reviews.annotate(**totals)
+
+
+def get_average(count, total):
+    """the mean of some ratings"""
+    if not count:
+        return None
+    return float(total) / count
+
+
+def get_deviation(count, total, sum_squares):
+    """the (population) standard deviation of some ratings"""
+    if not count:
+        return None
+    mean = float(total) / count
+    # rounding can leave a tiny negative number when every rating is the same
+    return math.sqrt(max(float(sum_squares) / count - mean**2, 0))
+
+
+# pylint: disable=unused-argument
+@receiver(models.signals.post_save, sender=Review)
+@receiver(models.signals.post_save, sender=ReviewRating)
+@receiver(models.signals.post_delete, sender=Review)
+@receiver(models.signals.post_delete, sender=ReviewRating)
+def update_rating_aggregate(sender, instance, *args, **kwargs):
+    """a rating was added, changed, or deleted"""
+    update_fields = kwargs.get("update_fields")
+    if update_fields and not {"rating", "deleted", "book"} & set(update_fields):
+        return
+    work_ids = {instance.book.parent_work_id}
+    if not kwargs.get("created") and instance.field_tracker.has_changed("book"):
+        # the review was moved, so it doesn't count for its old work anymore
+        previous_book_id = instance.field_tracker.previous("book")
+        work_ids.add(
+            Edition.objects.filter(id=previous_book_id)
+            .values_list("parent_work_id", flat=True)
+            .first()
+        )
+    for work_id in work_ids - {None}:
+        RatingAggregate.update_for_work(work_id)
@@ -0,0 +1,206 @@
+""" a user's reading for a year, added up ahead of time """
+from datetime import datetime
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+from django.db.models import Avg, Count, Sum
+from django.db.models.functions import ExtractYear
+from django.dispatch import receiver
+from django.utils import timezone
+import pytz
+
+from .book import Edition
+from .readthrough import ReadThrough
+from .status import Review, ReviewRating
+from .user import User
+
+
+class ReadingStats(models.Model):
+    """what a user finished reading in a year, for the annual summary and goals"""
+
+    user = models.ForeignKey("User", on_delete=models.CASCADE)
+    year = models.IntegerField()
+
+    # read throughs finished, which counts re-reads
+    finished_count = models.IntegerField(default=0)
+    # the books finished, in the order they were finished
+    book_ids = ArrayField(models.IntegerField(), default=list)
+
+    pages_total = models.IntegerField(default=0)
+    pages_average = models.IntegerField(default=0)
+    no_page_count = models.IntegerField(default=0)
+    book_pages_lowest = models.ForeignKey(
+        "Edition", on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    book_pages_highest = models.ForeignKey(
+        "Edition", on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+
+    ratings_count = models.IntegerField(default=0)
+    rating_average = models.DecimalField(default=0, max_digits=3, decimal_places=2)
+    review_rating_highest = models.ForeignKey(
+        "Review", on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    five_star_book_ids = ArrayField(models.IntegerField(), default=list)
+
+    class Meta:
+        """one set of stats per year"""
+
+        unique_together = ("user", "year")
+
+    @classmethod
+    def get_for_year(cls, user, year):
+        """the user's stats, which are added up the first time they're needed"""
+        stats = cls.objects.filter(user=user, year=year).first()
+        if stats:
+            return stats
+        return cls.update_for_year(user.id, year)
+
+    @classmethod
+    def update_for_year(cls, user_id, year):
+        """add up what the user read in a year"""
+        # the year is the user's, whoever happens to be making the change
+        user_timezone = get_user_timezone(user_id)
+        readthroughs = ReadThrough.objects.filter(
+            user_id=user_id,
+            finish_date__gte=user_timezone.localize(datetime(year, 1, 1)),
+            finish_date__lt=user_timezone.localize(datetime(year + 1, 1, 1)),
+        ).order_by("finish_date")
+        book_ids = list(dict.fromkeys(readthroughs.values_list("book_id", flat=True)))
+
+        books = Edition.objects.filter(id__in=book_ids)
+        page_stats = books.aggregate(Sum("pages"), Avg("pages"))
+        books_by_pages = books.filter(pages__gte=0).order_by("pages")
+
+        ratings = Review.objects.filter(
+            user_id=user_id,
+            deleted=False,
+            rating__isnull=False,
+            book_id__in=book_ids,
+        )
+        rating_stats = ratings.aggregate(Avg("rating"), Count("id"))
+
+        stats, _ = cls.objects.update_or_create(
+            user_id=user_id,
+            year=year,
+            defaults={
+                "finished_count": readthroughs.count(),
+                "book_ids": book_ids,
+                "pages_total": page_stats["pages__sum"] or 0,
+                "pages_average": round(page_stats["pages__avg"] or 0),
+                "no_page_count": books.filter(pages__isnull=True).count(),
+                "book_pages_lowest": books_by_pages.first(),
+                "book_pages_highest": books_by_pages.last(),
+                "ratings_count": rating_stats["id__count"],
+                "rating_average": round(rating_stats["rating__avg"] or 0, 2),
+                "review_rating_highest": ratings.order_by("-rating").first(),
+                "five_star_book_ids": list(
+                    ratings.filter(rating=5).values_list("book_id", flat=True)
+                ),
+            },
+        )
+        return stats
+
+    @classmethod
+    def rebuild(cls, user_id=None):
+        """add up every year anyone has finished a book in"""
+        readers = User.objects.filter(readthrough__finish_date__isnull=False)
+        if user_id:
+            readers = readers.filter(id=user_id)
+        readers = readers.values_list("id", "preferred_timezone").distinct()
+
+        existing = cls.objects.all()
+        if user_id:
+            existing = existing.filter(user_id=user_id)
+        existing.delete()
+
+        count = 0
+        for (reader_id, preferred_timezone) in readers.iterator():
+            years = get_finished_years(
+                ReadThrough.objects.filter(user_id=reader_id),
+                get_timezone(preferred_timezone),
+            )
+            for year in years:
+                cls.update_for_year(reader_id, year)
+                count += 1
+        return count
+
+
+def get_user_timezone(user_id):
+    """the timezone a user's years start and end in"""
+    preferred_timezone = (
+        User.objects.filter(id=user_id)
+        .values_list("preferred_timezone", flat=True)
+        .first()
+    )
+    return get_timezone(preferred_timezone)
+
+
+def get_timezone(timezone_name):
+    """a user's timezone setting, or UTC if it isn't a timezone pytz knows"""
+    try:
+        return pytz.timezone(timezone_name or "UTC")
+    except pytz.exceptions.UnknownTimeZoneError:
+        return pytz.utc
+
+
+def get_year(value, user_timezone):
+    """the year of a date, in the user's timezone"""
+    if timezone.is_aware(value):
+        value = timezone.localtime(value, user_timezone)
+    return value.year
+
+
+def get_finished_years(readthroughs, user_timezone):
+    """the years, in the user's timezone, that some readthroughs finished in"""
+    return (
+        readthroughs.filter(finish_date__isnull=False)
+        .annotate(finish_year=ExtractYear("finish_date", tzinfo=user_timezone))
+        .values_list("finish_year", flat=True)
+        .order_by()
+        .distinct()
+    )
+
+
+# pylint: disable=unused-argument
+@receiver(models.signals.post_save, sender=ReadThrough)
+def update_reading_stats_on_readthrough(sender, instance, created, *args, **kwargs):
+    """a book was finished, or its finish date changed"""
+    if not created and not instance.field_tracker.has_changed("finish_date"):
+        return
+    user_timezone = get_user_timezone(instance.user_id)
+    years = set()
+    if instance.finish_date:
+        years.add(get_year(instance.finish_date, user_timezone))
+    previous = None if created else instance.field_tracker.previous("finish_date")
+    if previous:
+        years.add(get_year(previous, user_timezone))
+    for year in years:
+        ReadingStats.update_for_year(instance.user_id, year)
+
+
+# pylint: disable=unused-argument
+@receiver(models.signals.post_delete, sender=ReadThrough)
+def update_reading_stats_on_readthrough_delete(sender, instance, *args, **kwargs):
+    """a finished book was removed"""
+    if instance.finish_date:
+        year = get_year(instance.finish_date, get_user_timezone(instance.user_id))
+        ReadingStats.update_for_year(instance.user_id, year)
+
+
+# pylint: disable=unused-argument
+@receiver(models.signals.post_save, sender=Review)
+@receiver(models.signals.post_save, sender=ReviewRating)
+@receiver(models.signals.post_delete, sender=Review)
+@receiver(models.signals.post_delete, sender=ReviewRating)
+def update_reading_stats_on_review(sender, instance, *args, **kwargs):
+    """a book that was finished may have been rated"""
+    update_fields = kwargs.get("update_fields")
+    if update_fields and not {"rating", "deleted"} & set(update_fields):
+        return
+    years = get_finished_years(
+        ReadThrough.objects.filter(user_id=instance.user_id, book_id=instance.book_id),
+        get_user_timezone(instance.user_id),
+    )
+    for year in years:
+        ReadingStats.update_for_year(instance.user_id, year)
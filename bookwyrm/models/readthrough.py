@@ -3,6 +3,7 @@ from django.core import validators
 from django.core.cache import cache
 from django.db import models
 from django.db.models import F, Q
+from model_utils import FieldTracker
 
 from .base_model import BookWyrmModel
 
@@ -30,6 +31,8 @@ class ReadThrough(BookWyrmModel):
     stopped_date = models.DateTimeField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
 
+    field_tracker = FieldTracker(fields=["finish_date"])
+
     def save(self, *args, **kwargs):
         """update user active time"""
         cache.delete(f"latest_read_through-{self.user_id}-{self.book_id}")
@@ -4,8 +4,9 @@ from typing import Optional
 import re
 
 from django.apps import apps
-from django.core.cache import cache
+from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import Q
@@ -19,7 +20,7 @@ from model_utils.managers import InheritanceManager
 
 from bookwyrm import activitypub
 from bookwyrm.preview_images import generate_edition_preview_image_task
-from bookwyrm.settings import ENABLE_PREVIEW_IMAGES
+from bookwyrm.settings import ENABLE_PREVIEW_IMAGES, PAGE_LENGTH
 from .activitypub_mixin import ActivitypubMixin, ActivityMixin
 from .activitypub_mixin import OrderedCollectionPageMixin
 from .base_model import BookWyrmModel
@@ -27,6 +28,10 @@ from .readthrough import ProgressMode
 from . import fields
 
 
+# how many replies up or down from a status are shown with it
+THREAD_DEPTH = 5
+
+
 class Status(OrderedCollectionPageMixin, BookWyrmModel):
     """any post, like a reply to a review, etc"""
 
@@ -67,6 +72,8 @@ class Status(OrderedCollectionPageMixin, BookWyrmModel):
         activitypub_field="inReplyTo",
     )
     thread_id = models.IntegerField(blank=True, null=True)
+    # the ids of the statuses from the start of the thread down to this one
+    thread_path = ArrayField(models.IntegerField(), blank=True, null=True)
     # statuses get saved a few times, this indicates if they're set
     ready = models.BooleanField(default=True)
 
@@ -80,6 +87,9 @@ class Status(OrderedCollectionPageMixin, BookWyrmModel):
         """default sorting"""
 
         ordering = ("-published_date",)
+        indexes = [
+            models.Index(fields=["thread_id"]),
+        ]
 
     def save(self, *args, **kwargs):
         """save and notify"""
@@ -88,9 +98,84 @@ class Status(OrderedCollectionPageMixin, BookWyrmModel):
 
         super().save(*args, **kwargs)
 
+        # these include the status's own id, so it has to be saved first
+        update_fields = []
         if not self.reply_parent:
             self.thread_id = self.id
-            super().save(broadcast=False, update_fields=["thread_id"])
+            update_fields.append("thread_id")
+        thread_path = self.get_thread_path()
+        if self.thread_path != thread_path:
+            self.thread_path = thread_path
+            update_fields.append("thread_path")
+        if update_fields:
+            super().save(broadcast=False, update_fields=update_fields)
+
+    def get_thread_path(self):
+        """the ids from the start of the thread to this status"""
+        if not self.reply_parent:
+            return [self.id]
+        parent_path = self.reply_parent.thread_path or [self.reply_parent_id]
+        return [*parent_path, self.id]
+
+    def get_ancestors(self, viewer, depth=THREAD_DEPTH):
+        """the statuses this is a reply to, starting from the furthest up. the
+        chain stops at the first status the viewer can't see"""
+        # pylint: disable-next=import-outside-toplevel
+        from bookwyrm.status_cache import (  # circular
+            get_hydrated_statuses,
+            get_status_versions,
+        )
+
+        if not self.thread_path:
+            return []
+        ancestor_ids = self.thread_path[-depth - 1 : -1]
+        visible = get_hydrated_statuses(
+            get_status_versions(
+                # not self.privacy_filter, which would only find this status's subclass
+                Status.privacy_filter(viewer).filter(id__in=ancestor_ids)
+            )
+        )
+        ancestors = []
+        for ancestor_id in reversed(ancestor_ids):
+            if ancestor_id not in visible:
+                break
+            ancestors.append(visible[ancestor_id])
+        return ancestors[::-1]
+
+    def get_replies_page(self, viewer, page=1, depth=THREAD_DEPTH):
+        """a page of direct replies, and the replies to those replies down to a
+        given depth, in thread order. replies below a status the viewer can't see
+        are left out"""
+        # pylint: disable-next=import-outside-toplevel
+        from bookwyrm.status_cache import get_hydrated_statuses  # circular
+
+        if not self.thread_path:
+            return Paginator([], PAGE_LENGTH).get_page(page), []
+        position = len(self.thread_path)
+        thread = Status.privacy_filter(viewer).filter(thread_id=self.thread_id)
+        replies = Paginator(
+            thread.filter(reply_parent=self)
+            .order_by("id")
+            .values_list("id", flat=True),
+            PAGE_LENGTH,
+        ).get_page(page)
+
+        descendants = (
+            thread.filter(
+                **{f"thread_path__{position}__in": list(replies)},
+                thread_path__len__lte=position + depth,
+            )
+            .order_by("thread_path")
+            .values_list("id", "updated_date", "reply_parent_id")
+        )
+        visible = {self.id}
+        versions = []
+        for (status_id, updated_date, reply_parent_id) in descendants:
+            if reply_parent_id in visible:
+                visible.add(status_id)
+                versions.append((status_id, updated_date))
+        statuses = get_hydrated_statuses(versions)
+        return replies, [statuses[i] for (i, _) in versions if i in statuses]
 
     def delete(self, *args, **kwargs):  # pylint: disable=unused-argument
         """ "delete" a status"""
@@ -428,7 +513,7 @@ class Review(BookStatus):
         max_digits=3,
     )
 
-    field_tracker = FieldTracker(fields=["rating"])
+    field_tracker = FieldTracker(fields=["rating", "book"])
 
     @property
     def pure_name(self):
@@ -453,12 +538,6 @@ class Review(BookStatus):
     activity_serializer = activitypub.Review
     pure_type = "Article"
 
-    def save(self, *args, **kwargs):
-        """clear rating caches"""
-        if self.book.parent_work:
-            cache.delete(f"book-rating-{self.book.parent_work.id}")
-        super().save(*args, **kwargs)
-
 
 class ReviewRating(Review):
     """a subtype of review that only contains a rating"""
@@ -20,7 +20,7 @@ from bookwyrm.models.shelf import Shelf
 from bookwyrm.models.status import Status
 from bookwyrm.preview_images import generate_user_preview_image_task
 from bookwyrm.settings import DOMAIN, ENABLE_PREVIEW_IMAGES, USE_HTTPS, LANGUAGES
-from bookwyrm.signatures import create_key_pair
+from bookwyrm.signatures import create_key_pair, signer_cache
 from bookwyrm.tasks import app, MISC
 from bookwyrm.utils import regex
 from .activitypub_mixin import OrderedCollectionPageMixin, ActivitypubMixin
@@ -235,15 +235,17 @@ class User(OrderedCollectionPageMixin, AbstractUser):
     @property
     def unread_notification_count(self):
         """count of notifications, for the templates"""
-        return self.notification_set.filter(read=False).count()
+        return self.get_unread_notification_counts()["unread"]
 
     @property
     def has_unread_mentions(self):
         """whether any of the unread notifications are conversations"""
-        return self.notification_set.filter(
-            read=False,
-            notification_type__in=["REPLY", "MENTION", "TAG", "REPORT"],
-        ).exists()
+        return self.get_unread_notification_counts()["mentions"] > 0
+
+    def get_unread_notification_counts(self):
+        """unread notifications and mentions, which are kept in redis"""
+        notification_model = apps.get_model("bookwyrm.Notification", require_ready=True)
+        return notification_model.get_unread_counts(self)
 
     activity_serializer = activitypub.Person
 
@@ -509,6 +511,8 @@ class KeyPair(ActivitypubMixin, BookWyrmModel):
     activity_serializer = activitypub.PublicKey
     serialize_reverse_fields = [("owner", "owner", "id")]
 
+    field_tracker = FieldTracker(fields=["private_key"])
+
     def get_remote_id(self):
         # self.owner is set by the OneToOneField on User
         return f"{self.owner.remote_id}/#main-key"
@@ -520,6 +524,9 @@ class KeyPair(ActivitypubMixin, BookWyrmModel):
             del kwargs["broadcast"]
         if not self.public_key:
             self.private_key, self.public_key = create_key_pair()
+        replaced_key = self.field_tracker.changed().get("private_key")
+        if replaced_key:
+            signer_cache.forget(replaced_key)
         return super().save(*args, **kwargs)
 
 
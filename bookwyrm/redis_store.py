@@ -32,6 +32,18 @@ class RedisStore(ABC):
         # and go!
         return pipeline.execute()
 
+    def add_objects_to_stores(self, values_by_store, execute=True):
+        """add many objects to many stores, trimming each store only once.
+        takes a dict of store: {object id: rank}"""
+        pipeline = r.pipeline()
+        for store, values in values_by_store.items():
+            pipeline.zadd(store, values)
+            if self.max_length:
+                pipeline.zremrangebyrank(store, 0, -1 * self.max_length)
+        if not execute:
+            return pipeline
+        return pipeline.execute()
+
     # pylint: disable=no-self-use
     def remove_object_from_stores(self, obj, stores):
         """remove an object from all stores"""
@@ -65,6 +77,34 @@ class RedisStore(ABC):
         """load the values in a store"""
         return r.zrevrange(store, 0, -1, **kwargs)
 
+    # pylint: disable=no-self-use
+    def get_store_page(self, store, count, before=None, after=None):
+        """load up to count (value, rank) pairs from a store, starting from a
+        (rank, value) cursor. values are ordered from the cursor outwards: highest
+        rank first when reading back from "before", lowest rank first when reading
+        on from "after". values with the same rank are ordered by value, the way
+        redis sorts them, so ties that fall across a page boundary aren't skipped
+        """
+        if before is None and after is None:
+            return r.zrevrangebyscore(
+                store, "+inf", "-inf", start=0, num=count, withscores=True
+            )
+        rank, value = after if after is not None else before
+        value = str(value).encode()
+        # the cursor's rank is included, so read far enough to get past its ties
+        num = count + r.zcount(store, rank, rank)
+        if after is not None:
+            values = r.zrangebyscore(
+                store, rank, "+inf", start=0, num=num, withscores=True
+            )
+            values = [(v, s) for (v, s) in values if s != rank or v > value]
+        else:
+            values = r.zrevrangebyscore(
+                store, rank, "-inf", start=0, num=num, withscores=True
+            )
+            values = [(v, s) for (v, s) in values if s != rank or v < value]
+        return values[:count]
+
     def populate_store(self, store):
         """go from zero to a store"""
         pipeline = r.pipeline()
@@ -231,6 +231,15 @@ REDIS_ACTIVITY_URL = env(
     f"redis://:{REDIS_ACTIVITY_PASSWORD}@{REDIS_ACTIVITY_HOST}:{REDIS_ACTIVITY_PORT}/{REDIS_ACTIVITY_DB_INDEX}",
 )
 MAX_STREAM_LENGTH = env.int("MAX_STREAM_LENGTH", 200)
+# resolve stream audiences from follower/block sets in redis instead of the database
+# run `./bw-dev rebuild_audience_index` before turning this on
+ENABLE_AUDIENCE_INDEX = env.bool("ENABLE_AUDIENCE_INDEX", False)
+# seconds to collect new statuses for before adding them to streams as a batch,
+# 0 adds each status as soon as it's saved
+STREAMS_BATCH_DELAY = env.int("STREAMS_BATCH_DELAY", 0)
+# seconds to collect likes and boosts for before notifying about them as a batch,
+# 0 creates each notification straight away
+NOTIFICATIONS_BATCH_DELAY = env.int("NOTIFICATIONS_BATCH_DELAY", 0)
 
 STREAMS = [
     {"key": "home", "name": _("Home Timeline"), "shortname": _("Home")},
@@ -242,6 +251,27 @@ STREAMS = [
 SEARCH_TIMEOUT = env.int("SEARCH_TIMEOUT", 8)
 # timeout for a query to an individual connector
 QUERY_TIMEOUT = env.int("INTERACTIVE_QUERY_TIMEOUT", env.int("QUERY_TIMEOUT", 5))
+# seconds that remote search results are used for before they're refreshed
+SEARCH_CACHE_MAX_AGE = env.int("SEARCH_CACHE_MAX_AGE", 60 * 60)
+# seconds that older results are still shown for while they're being refreshed
+SEARCH_CACHE_STALE_AGE = env.int("SEARCH_CACHE_STALE_AGE", 60 * 60 * 24)
+# seconds to remember that a connector had no results or didn't respond
+SEARCH_CACHE_NEGATIVE_AGE = env.int("SEARCH_CACHE_NEGATIVE_AGE", 60 * 5)
+# most searches an import will send to any one connector at the same time
+IMPORT_SEARCH_MAX_CONCURRENCY = env.int("IMPORT_SEARCH_MAX_CONCURRENCY", 4)
+
+# Federation
+# most connections a worker will keep open when broadcasting activities, in total
+# and to any one server
+BROADCAST_MAX_CONNECTIONS = env.int("BROADCAST_MAX_CONNECTIONS", 100)
+BROADCAST_MAX_CONNECTIONS_PER_HOST = env.int("BROADCAST_MAX_CONNECTIONS_PER_HOST", 8)
+# servers a process keeps connections open to when loading book and activity
+# data, and how many connections to each one
+FETCH_MAX_HOSTS = env.int("FETCH_MAX_HOSTS", 20)
+FETCH_MAX_CONNECTIONS_PER_HOST = env.int("FETCH_MAX_CONNECTIONS_PER_HOST", 4)
+# seconds to collect incoming activities for before handling them as a batch,
+# 0 handles each activity as it arrives
+INBOX_BATCH_DELAY = env.int("INBOX_BATCH_DELAY", 0)
 
 # Redis cache backend
 if env.bool("USE_DUMMY_CACHE", False):
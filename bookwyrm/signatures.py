@@ -1,5 +1,7 @@
 """ signs activitypub activities """
+from collections import OrderedDict
 import hashlib
+from threading import Lock
 from urllib.parse import urlparse
 import datetime
 from base64 import b64encode, b64decode
@@ -10,6 +12,8 @@ from Crypto.Signature import pkcs1_15  # pylint: disable=no-name-in-module
 from Crypto.Hash import SHA256
 
 MAX_SIGNATURE_AGE = 300
+# how many parsed private keys each process holds on to
+SIGNER_CACHE_SIZE = 256
 
 
 def create_key_pair():
@@ -22,6 +26,59 @@ def create_key_pair():
     return private_key, public_key
 
 
+def get_key_fingerprint(key):
+    """identifies a key by its contents, so a changed key is never mistaken for
+    the one it replaced"""
+    return hashlib.sha256(key.encode("utf8")).digest()
+
+
+class SignerCache:
+    """parsing a PEM key is much slower than signing with it, so keep the signers
+    for recently used private keys instead of parsing them for every inbox"""
+
+    def __init__(self, maxsize=SIGNER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.signers = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, private_key):
+        """a signer for this private key"""
+        fingerprint = get_key_fingerprint(private_key)
+        with self.lock:
+            signer = self.signers.get(fingerprint)
+            if signer is not None:
+                self.signers.move_to_end(fingerprint)
+                return signer
+
+        signer = pkcs1_15.new(RSA.import_key(private_key))
+        with self.lock:
+            self.signers[fingerprint] = signer
+            while len(self.signers) > self.maxsize:
+                self.signers.popitem(last=False)
+        return signer
+
+    def forget(self, private_key):
+        """drop a key that has been replaced"""
+        with self.lock:
+            self.signers.pop(get_key_fingerprint(private_key), None)
+
+    def clear(self):
+        """drop every key"""
+        with self.lock:
+            self.signers.clear()
+
+
+signer_cache = SignerCache()
+# the same goes for the public keys of other servers' users
+verifier_cache = SignerCache()
+
+
+def sign_message(private_key, message):
+    """sign a string with a private key"""
+    signer = signer_cache.get(private_key)
+    return signer.sign(SHA256.new(message.encode("utf8")))
+
+
 def make_signature(method, sender, destination, date, **kwargs):
     """uses a private key to sign an outgoing message"""
     inbox_parts = urlparse(destination)
@@ -37,8 +94,7 @@ def make_signature(method, sender, destination, date, **kwargs):
         headers = "(request-target) host date digest"
 
     message_to_sign = "\n".join(signature_headers)
-    signer = pkcs1_15.new(RSA.import_key(sender.key_pair.private_key))
-    signed_message = signer.sign(SHA256.new(message_to_sign.encode("utf8")))
+    signed_message = sign_message(sender.key_pair.private_key, message_to_sign)
     # For legacy reasons we need to use an incorrect keyId for older Bookwyrm versions
     key_id = (
         f"{sender.remote_id}#main-key"
@@ -107,7 +163,6 @@ class Signature:
         """verify rsa signature"""
         if http_date_age(request.headers["date"]) > MAX_SIGNATURE_AGE:
             raise ValueError(f"Request too old: {request.headers['date']}")
-        public_key = RSA.import_key(public_key)
 
         comparison_string = []
         for signed_header_name in self.headers.split(" "):
@@ -121,7 +176,7 @@ class Signature:
                 )
         comparison_string = "\n".join(comparison_string)
 
-        signer = pkcs1_15.new(public_key)
+        signer = verifier_cache.get(public_key)
         digest = SHA256.new()
         digest.update(comparison_string.encode())
 
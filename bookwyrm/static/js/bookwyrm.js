@@ -77,6 +77,9 @@ let BookWyrm = new (class {
             document
                 .querySelectorAll(".modal.is-active")
                 .forEach(bookwyrm.handleActiveModal.bind(bookwyrm));
+            document
+                .querySelectorAll("[data-remote-search]")
+                .forEach(bookwyrm.loadRemoteSearch.bind(bookwyrm));
         });
     }
 
@@ -128,6 +131,30 @@ let BookWyrm = new (class {
         );
     }
 
+    /**
+     * Replace a placeholder with search results from another catalogue, so that
+     * slow catalogues don't hold up the rest of the page.
+     *
+     * @param  {Object} placeholder - DOM node
+     * @return {undefined}
+     */
+    loadRemoteSearch(placeholder) {
+        fetch(placeholder.dataset.remoteSearch)
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(response.statusText);
+                }
+
+                return response.text();
+            })
+            .then((html) => {
+                placeholder.innerHTML = html;
+            })
+            .catch(() => {
+                placeholder.remove();
+            });
+    }
+
     /**
      * Update a counter.
      *
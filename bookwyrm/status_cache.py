@@ -0,0 +1,170 @@
+""" cache statuses that are ready to display """
+from django.apps import apps
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.fields.files import FieldFile
+
+from bookwyrm import models
+
+# statuses are invalidated when they're saved, but the users and books they
+# include are not, so don't let them get too out of date
+STATUS_CACHE_TIMEOUT = 60 * 15
+# the parts of a user that statuses are displayed with. the rest of the user,
+# like their email and password, stays out of the cache
+USER_CACHE_FIELDS = [
+    "id",
+    "username",
+    "localname",
+    "name",
+    "avatar",
+    "local",
+    "remote_id",
+    "is_active",
+]
+
+
+def hydrate_statuses(status_ids):
+    """statuses with everything needed to display them"""
+    return (
+        models.Status.objects.select_subclasses()
+        .filter(id__in=status_ids)
+        .select_related(
+            "user",
+            "reply_parent",
+            "comment__book",
+            "review__book",
+            "quotation__book",
+        )
+        .prefetch_related("mention_books", "mention_users")
+    )
+
+
+def status_cache_key(status_id):
+    """the cache key for a status that's ready to display"""
+    return f"hydrated-status-{status_id}"
+
+
+def invalidate_status(status_id):
+    """something about this status has changed"""
+    cache.delete(status_cache_key(status_id))
+
+
+def get_status_versions(queryset):
+    """the (id, updated_date) pairs that get_hydrated_statuses loads statuses by"""
+    return queryset.values_list("id", "updated_date")
+
+
+def get_hydrated_statuses(versions):
+    """statuses that are ready to display, keyed by id, from (id, updated_date)
+    pairs. the edit dates come from the query that found the statuses, so cached
+    statuses are loaded in one go, and only the rest are queried"""
+    updated_dates = dict(versions)
+    keys = {status_cache_key(status_id): status_id for status_id in updated_dates}
+    statuses = {
+        keys[key]: deserialize_status(data)
+        for (key, data) in cache.get_many(keys).items()
+        # statuses can change without being invalidated, for example with update()
+        if data["updated_date"] == updated_dates[keys[key]]
+    }
+
+    missing = [status_id for status_id in keys.values() if status_id not in statuses]
+    if missing:
+        hydrated = {status.id: status for status in hydrate_statuses(missing)}
+        cache.set_many(
+            {
+                status_cache_key(status_id): serialize_status(status)
+                for (status_id, status) in hydrated.items()
+            },
+            timeout=STATUS_CACHE_TIMEOUT,
+        )
+        statuses.update(hydrated)
+    return statuses
+
+
+def hydrate_page(page):
+    """swap a paginated page of (id, updated_date) pairs for the statuses"""
+    statuses = get_hydrated_statuses(page.object_list)
+    page.object_list = [
+        statuses[status_id]
+        for (status_id, _) in page.object_list
+        if status_id in statuses
+    ]
+    return page
+
+
+def serialize_status(status):
+    """the plain values that hydrate_statuses loads for a status. model instances
+    carry around things that can't be pickled, so they aren't cached directly"""
+    book = getattr(status, "book", None)
+    return {
+        "updated_date": status.updated_date,
+        "status": get_values(status),
+        "user": get_values(status.user, USER_CACHE_FIELDS),
+        "reply_parent": get_values(status.reply_parent)
+        if status.reply_parent
+        else None,
+        "book": get_values(book) if book else None,
+        "mention_books": [get_values(b) for b in status.mention_books.all()],
+        "mention_users": [
+            get_values(u, USER_CACHE_FIELDS) for u in status.mention_users.all()
+        ],
+    }
+
+
+def deserialize_status(data):
+    """re-build a status, and the objects that were loaded with it"""
+    status = from_values(data["status"])
+    status.user = from_values(data["user"])
+    if data["reply_parent"]:
+        status.reply_parent = from_values(data["reply_parent"])
+    if data["book"]:
+        status.book = from_values(data["book"])
+    set_prefetched(
+        status, "mention_books", [from_values(b) for b in data["mention_books"]]
+    )
+    set_prefetched(
+        status, "mention_users", [from_values(u) for u in data["mention_users"]]
+    )
+    return status
+
+
+def get_values(obj, field_names=None):
+    """the model and database values of an object, or of just some of its fields.
+    any field that's left out is deferred when the object is re-built"""
+    # pylint: disable=protected-access
+    fields = [
+        field
+        for field in obj._meta.concrete_fields
+        if field_names is None or field.attname in field_names
+    ]
+    return (
+        obj._meta.label,
+        tuple(field.attname for field in fields),
+        tuple(get_value(getattr(obj, field.attname)) for field in fields),
+    )
+
+
+def get_value(value):
+    """files hold a reference to their object, so just keep the file name"""
+    if isinstance(value, FieldFile):
+        return value.name
+    return value
+
+
+def from_values(values):
+    """an object, as though it had just been loaded from the database"""
+    label, field_names, field_values = values
+    model = apps.get_model(label)
+    return model.from_db(DEFAULT_DB_ALIAS, field_names, field_values)
+
+
+def set_prefetched(obj, name, related):
+    """fill in a many to many field as though it had been prefetched"""
+    # this mirrors what django's prefetch_related_objects does
+    # pylint: disable=protected-access
+    queryset = getattr(obj, name).all()
+    queryset._result_cache = related
+    queryset._prefetch_done = True
+    if not hasattr(obj, "_prefetched_objects_cache"):
+        obj._prefetched_objects_cache = {}
+    obj._prefetched_objects_cache[name] = queryset
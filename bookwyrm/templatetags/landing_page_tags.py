@@ -1,8 +1,8 @@
 """ template filters """
 from django import template
-from django.db.models import Avg, StdDev, Count, F, Q
 
 from bookwyrm import models
+from bookwyrm.landing_data import get_landing_data
 
 register = template.Library()
 
@@ -10,75 +10,35 @@ register = template.Library()
 @register.simple_tag(takes_context=False)
 def get_book_superlatives():
     """get book stats for the about page"""
-    total_ratings = models.Review.objects.filter(local=True, deleted=False).count()
-    data = {}
-    data["top_rated"] = (
-        models.Work.objects.annotate(
-            rating=Avg(
-                "editions__review__rating",
-                filter=Q(
-                    editions__review__user__local=True, editions__review__deleted=False
-                ),
-            ),
-            rating_count=Count(
-                "editions__review",
-                filter=Q(
-                    editions__review__user__local=True, editions__review__deleted=False
-                ),
-            ),
-        )
-        .annotate(weighted=F("rating") * F("rating_count") / total_ratings)
-        .filter(rating__gt=4, weighted__gt=0)
-        .order_by("-weighted")
-        .first()
-    )
-
-    data["controversial"] = (
-        models.Work.objects.annotate(
-            deviation=StdDev(
-                "editions__review__rating",
-                filter=Q(
-                    editions__review__user__local=True, editions__review__deleted=False
-                ),
-            ),
-            rating_count=Count(
-                "editions__review",
-                filter=Q(
-                    editions__review__user__local=True, editions__review__deleted=False
-                ),
-            ),
-        )
-        .annotate(weighted=F("deviation") * F("rating_count") / total_ratings)
-        .filter(weighted__gt=0)
-        .order_by("-weighted")
-        .first()
+    superlatives = get_landing_data()["superlatives"]
+    works = models.Work.objects.in_bulk(
+        [work_id for work_id in get_superlative_work_ids(superlatives) if work_id]
     )
 
-    data["wanted"] = (
-        models.Work.objects.annotate(
-            shelf_count=Count(
-                "editions__shelves", filter=Q(editions__shelves__identifier="to-read")
-            )
-        )
-        .order_by("-shelf_count")
-        .first()
-    )
+    data = {}
+    if superlatives["top_rated"]:
+        work_id, rating = superlatives["top_rated"]
+        data["top_rated"] = works.get(work_id)
+        if data["top_rated"]:
+            data["top_rated"].rating = rating
+    data["controversial"] = works.get(superlatives["controversial"])
+    data["wanted"] = works.get(superlatives["wanted"])
     return data
 
 
+def get_superlative_work_ids(superlatives):
+    """all the works that feature on the about page"""
+    top_rated = superlatives["top_rated"]
+    return [
+        top_rated[0] if top_rated else None,
+        superlatives["controversial"],
+        superlatives["wanted"],
+    ]
+
+
 @register.simple_tag(takes_context=False)
 def get_landing_books():
     """list of books for the landing page"""
-    return list(
-        set(
-            models.Edition.objects.filter(
-                review__published_date__isnull=False,
-                review__deleted=False,
-                review__user__local=True,
-                review__privacy__in=["public", "unlisted"],
-            )
-            .exclude(cover__exact="")
-            .distinct()
-            .order_by("-review__published_date")[:6]
-        )
-    )
+    book_ids = get_landing_data()["landing_books"]
+    books = models.Edition.objects.in_bulk(book_ids)
+    return [books[book_id] for book_id in book_ids if book_id in books]
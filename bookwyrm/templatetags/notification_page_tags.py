@@ -1,5 +1,6 @@
 """ tags used on the feed pages """
 from django import template
+from bookwyrm.models.notification import RELATED_USERS_PREVIEW_LENGTH
 from bookwyrm.templatetags.feed_page_tags import load_subclass
 
 
@@ -16,5 +17,15 @@ def related_status(notification):
 
 @register.simple_tag(takes_context=False)
 def get_related_users(notification):
-    """Who actually was it who liked your post"""
-    return list(reversed(list(notification.related_users.distinct())))[:10]
+    """Who actually was it who liked your post, most recent first"""
+    if hasattr(notification, "related_users_preview"):
+        # the notifications page loads these for every notification at once
+        return notification.related_users_preview
+    return [
+        related.user
+        for related in notification.related_users.through.objects.filter(
+            notification=notification
+        )
+        .select_related("user")
+        .order_by("-id")[:RELATED_USERS_PREVIEW_LENGTH]
+    ]
@@ -1,6 +1,5 @@
 """ template filters """
 from django import template
-from django.db.models import Avg
 
 from bookwyrm import models
 from bookwyrm.utils import cache
@@ -10,20 +9,19 @@ register = template.Library()
 
 
 @register.filter(name="rating")
-def get_rating(book, user):
+def get_rating(book, user):  # pylint: disable=unused-argument
     """get the overall rating of a book"""
     # this shouldn't happen, but it CAN
     if not book.parent_work:
         return None
 
     return cache.get_or_set(
-        f"book-rating-{book.parent_work.id}",
-        lambda u, b: models.Review.objects.filter(
-            book__parent_work__editions=b, rating__gt=0
-        ).aggregate(Avg("rating"))["rating__avg"]
+        f"book-rating-{book.parent_work_id}",
+        lambda w: models.RatingAggregate.objects.filter(work_id=w)
+        .values_list("average", flat=True)
+        .first()
         or 0,
-        user,
-        book,
+        book.parent_work_id,
         timeout=15552000,
     )
 
@@ -115,6 +115,118 @@ class Activitystreams(TestCase):
         self.assertEqual(result.last(), status)
         self.assertIsInstance(result.first(), models.Comment)
 
+    def test_get_activity_stream_page(self, *_):
+        """load just the statuses for one page"""
+        statuses = [
+            models.Status.objects.create(
+                user=self.remote_user, content="hi", privacy="public"
+            )
+            for _ in range(3)
+        ]
+        with patch("bookwyrm.activitystreams.r.set"), patch(
+            "bookwyrm.activitystreams.r.delete"
+        ), patch(
+            "bookwyrm.activitystreams.ActivityStream.get_store_page"
+        ) as redis_mock:
+            redis_mock.return_value = [
+                (str(statuses[2].id).encode(), 3.0),
+                (str(statuses[1].id).encode(), 2.0),
+                (str(statuses[0].id).encode(), 1.0),
+            ]
+            page = self.test_stream.get_activity_stream_page(
+                self.local_user, page_length=2
+            )
+        self.assertEqual(redis_mock.call_args[0][1], 3)
+        self.assertEqual(page.object_list, [statuses[2], statuses[1]])
+        self.assertIsInstance(page[0], models.Status)
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+        self.assertEqual(page.next_cursor, f"2.0_{statuses[1].id}")
+        self.assertEqual(page.previous_cursor, f"3.0_{statuses[2].id}")
+
+    def test_get_activity_stream_page_filtered(self, *_):
+        """keep reading when statuses are filtered out of a page"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        hidden = models.Status.objects.create(
+            user=self.remote_user, content="hello", privacy="public"
+        )
+        with patch("bookwyrm.activitystreams.r.set"), patch(
+            "bookwyrm.activitystreams.r.delete"
+        ), patch(
+            "bookwyrm.activitystreams.ActivityStream.get_store_page"
+        ) as redis_mock:
+            redis_mock.side_effect = [
+                [(str(hidden.id).encode(), 5.0), (str(hidden.id).encode(), 4.0)],
+                [(str(status.id).encode(), 3.0)],
+            ]
+            page = self.test_stream.get_activity_stream_page(
+                self.local_user,
+                after=(1.0, status.id),
+                page_length=1,
+                queryset_filter=lambda q: q.exclude(id=hidden.id),
+            )
+        self.assertEqual(redis_mock.call_args[1]["after"], (4.0, hidden.id))
+        self.assertEqual(page.object_list, [status])
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+
+    def test_get_store_page_ties(self, *_):
+        """statuses with the same rank as the cursor aren't skipped"""
+        with patch("bookwyrm.redis_store.r") as redis_mock:
+            redis_mock.zcount.return_value = 3
+            redis_mock.zrevrangebyscore.return_value = [
+                (b"7", 5.0),
+                (b"6", 5.0),
+                (b"5", 5.0),
+                (b"4", 4.0),
+                (b"3", 3.0),
+            ]
+            values = self.test_stream.get_store_page("store", 2, before=(5.0, 6))
+        self.assertEqual(values, [(b"5", 5.0), (b"4", 4.0)])
+        args = redis_mock.zrevrangebyscore.call_args
+        self.assertEqual(args[0][1], 5.0)
+        self.assertEqual(args[1]["num"], 5)
+
+        with patch("bookwyrm.redis_store.r") as redis_mock:
+            redis_mock.zcount.return_value = 3
+            redis_mock.zrangebyscore.return_value = [
+                (b"5", 5.0),
+                (b"6", 5.0),
+                (b"7", 5.0),
+                (b"8", 6.0),
+            ]
+            values = self.test_stream.get_store_page("store", 2, after=(5.0, 6))
+        self.assertEqual(values, [(b"7", 5.0), (b"8", 6.0)])
+
+    def test_add_statuses(self, *_):
+        """each feed is written and trimmed once per batch"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        status2 = models.Comment.objects.create(
+            user=self.remote_user, content="hi", privacy="public", book=self.book
+        )
+        with patch(
+            "bookwyrm.activitystreams.ActivityStream.get_audience"
+        ) as audience_mock, patch("bookwyrm.redis_store.r") as redis_mock:
+            audience_mock.return_value = [self.local_user.id]
+            count = self.test_stream.add_statuses([(status, True), (status2, False)])
+        self.assertEqual(count, 1)
+        pipeline = redis_mock.pipeline.return_value
+        self.assertEqual(pipeline.zadd.call_count, 1)
+        self.assertEqual(pipeline.zadd.call_args[0][0], f"{self.local_user.id}-test")
+        self.assertEqual(
+            set(pipeline.zadd.call_args[0][1].keys()), {status.id, status2.id}
+        )
+        self.assertEqual(pipeline.zremrangebyrank.call_count, 1)
+        pipeline.incrby.assert_called_once_with(f"{self.local_user.id}-test-unread", 1)
+        pipeline.hincrby.assert_called_once_with(
+            f"{self.local_user.id}-test-unread-by-type", "note", 1
+        )
+        self.assertTrue(pipeline.execute.called)
+
     def test_abstractstream_get_audience(self, *_):
         """get a list of users that should see a status"""
         status = models.Status.objects.create(
@@ -66,3 +66,14 @@ class Activitystreams(TestCase):
         users = activitystreams.HomeStream().get_audience(status)
         self.assertTrue(self.local_user.id in users)
         self.assertFalse(self.another_user.id in users)
+
+    def test_homestream_get_audience_direct_message(self, *_):
+        """the author's own direct messages aren't in their feed, indexed or not"""
+        status = models.Status.objects.create(
+            user=self.local_user, content="hi", privacy="direct"
+        )
+        status.mention_users.add(self.another_user)
+        for enabled in (False, True):
+            with patch("bookwyrm.settings.ENABLE_AUDIENCE_INDEX", enabled):
+                users = activitystreams.HomeStream().get_audience(status)
+            self.assertEqual(users, [])
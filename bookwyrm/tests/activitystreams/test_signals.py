@@ -1,5 +1,6 @@
 """ testing activitystreams """
 from datetime import datetime, timedelta
+import json
 from unittest.mock import patch
 
 from django.test import TestCase
@@ -62,6 +63,36 @@ class ActivitystreamsSignals(TestCase):
         self.assertEqual(args["args"][0], status.id)
         self.assertEqual(args["queue"], "streams")
 
+    def test_add_status_on_create_created_batch(self, *_):
+        """new statuses are buffered when batching is enabled"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        with patch("bookwyrm.activitystreams.settings.STREAMS_BATCH_DELAY", 5), patch(
+            "bookwyrm.activitystreams.r"
+        ) as redis_mock, patch(
+            "bookwyrm.activitystreams.add_status_batch_task.apply_async"
+        ) as mock:
+            redis_mock.set.return_value = True
+            activitystreams.add_status_on_create_command(models.Status, status, True)
+        self.assertEqual(redis_mock.rpush.call_args[0][0], "add-status-batch-streams")
+        entry = json.loads(redis_mock.rpush.call_args[0][1])
+        self.assertEqual(entry["id"], status.id)
+        self.assertTrue(entry["increment_unread"])
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(mock.call_args[1]["countdown"], 5)
+
+        # a batch task is already on its way
+        with patch("bookwyrm.activitystreams.settings.STREAMS_BATCH_DELAY", 5), patch(
+            "bookwyrm.activitystreams.r"
+        ) as redis_mock, patch(
+            "bookwyrm.activitystreams.add_status_batch_task.apply_async"
+        ) as mock:
+            redis_mock.set.return_value = False
+            activitystreams.add_status_on_create_command(models.Status, status, True)
+        self.assertEqual(redis_mock.rpush.call_count, 1)
+        self.assertFalse(mock.called)
+
     def test_add_status_on_create_created_low_priority(self, *_):
         """a new statuses has entered"""
         # created later than publication
@@ -1,4 +1,5 @@
 """ testing activitystreams """
+import json
 from unittest.mock import patch
 from django.test import TestCase
 from bookwyrm import activitystreams, models
@@ -90,6 +91,57 @@ class Activitystreams(TestCase):
         args = mock.call_args[0]
         self.assertEqual(args[0], self.status)
 
+    def test_add_status_batch_task(self):
+        """add buffered statuses to all streams in one go"""
+        entries = [
+            json.dumps({"id": self.status.id, "increment_unread": False, "queued": 1}),
+            json.dumps({"id": self.status.id, "increment_unread": True, "queued": 2}),
+        ]
+        with patch("bookwyrm.activitystreams.r") as redis_mock, patch(
+            "bookwyrm.activitystreams.ActivityStream.add_statuses"
+        ) as mock:
+            redis_mock.pipeline.return_value.execute.return_value = [entries, True, 0]
+            activitystreams.add_status_batch_task("streams")
+        self.assertEqual(mock.call_count, 3)
+        # the duplicate is collapsed
+        self.assertEqual(mock.call_args[0][0], [(self.status, True)])
+        redis_mock.delete.assert_called_with("add-status-batch-streams-scheduled")
+        # nothing left to do, so no follow-up task
+        self.assertFalse(redis_mock.set.called)
+
+    def test_add_status_batch_task_deleted(self):
+        """a status deleted while it was queued isn't added back to streams"""
+        with patch(
+            "bookwyrm.models.activitypub_mixin.broadcast_task.apply_async"
+        ), patch("bookwyrm.activitystreams.remove_status_task.delay"):
+            deleted_status = models.Status.objects.create(
+                content="oops", user=self.local_user, deleted=True
+            )
+        entries = [
+            json.dumps({"id": self.status.id, "increment_unread": True, "queued": 1}),
+            json.dumps(
+                {"id": deleted_status.id, "increment_unread": True, "queued": 2}
+            ),
+        ]
+        with patch("bookwyrm.activitystreams.r") as redis_mock, patch(
+            "bookwyrm.activitystreams.ActivityStream.add_statuses"
+        ) as mock:
+            redis_mock.pipeline.return_value.execute.return_value = [entries, True, 0]
+            activitystreams.add_status_batch_task("streams")
+        self.assertEqual(mock.call_args[0][0], [(self.status, True)])
+
+    def test_add_status_batch_task_remaining(self):
+        """a full buffer schedules another batch right away"""
+        with patch("bookwyrm.activitystreams.r") as redis_mock, patch(
+            "bookwyrm.activitystreams.add_status_batch_task.apply_async"
+        ) as mock:
+            redis_mock.pipeline.return_value.execute.return_value = [[], True, 10]
+            redis_mock.set.return_value = True
+            activitystreams.add_status_batch_task("streams")
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(mock.call_args[1]["countdown"], 0)
+        self.assertEqual(mock.call_args[1]["queue"], "streams")
+
     def test_remove_user_statuses_task(self):
         """remove all statuses by a user from another users' feeds"""
         with patch(
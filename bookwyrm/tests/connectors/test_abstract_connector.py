@@ -169,3 +169,15 @@ class AbstractConnector(TestCase):
 
         with self.assertRaises(ConnectorException):
             get_data("http://127.0.0.1/image/jpg")
+
+    @responses.activate
+    def test_get_data_shared_session(self):
+        """requests re-use one session, and its connections"""
+        responses.add(
+            responses.GET, "https://example.com/book/1", json={"title": "Test"}
+        )
+        session = abstract_connector.fetch_client.get_session()
+        with patch.object(session, "get", wraps=session.get) as get_mock:
+            self.assertEqual(get_data("https://example.com/book/1")["title"], "Test")
+        self.assertEqual(get_mock.call_count, 1)
+        self.assertIs(abstract_connector.fetch_client.get_session(), session)
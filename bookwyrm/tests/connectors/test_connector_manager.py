@@ -1,8 +1,13 @@
 """ interface between the app and various connectors """
+import time
+from unittest.mock import patch
+
+from django.core.cache.backends.locmem import LocMemCache
 from django.test import TestCase
 import responses
 
 from bookwyrm import models
+from bookwyrm.book_search import SearchResult
 from bookwyrm.connectors import connector_manager
 from bookwyrm.connectors.bookwyrm_connector import Connector as BookWyrmConnector
 
@@ -80,3 +85,145 @@ class ConnectorManager(TestCase):
         """load a connector object from the database entry"""
         connector = connector_manager.load_connector(self.remote_connector)
         self.assertEqual(connector.identifier, "test_connector_remote")
+
+    def test_load_connector_reused(self):
+        """connectors are only set up once, until they're changed"""
+        connector = connector_manager.load_connector(self.remote_connector)
+        with self.assertNumQueries(0):
+            same_connector = connector_manager.load_connector(self.remote_connector)
+        self.assertIs(connector, same_connector)
+
+        self.remote_connector.search_url = "http://fake.ciom/new-search/"
+        self.remote_connector.save()
+        new_connector = connector_manager.load_connector(self.remote_connector)
+        self.assertIsNot(connector, new_connector)
+        self.assertEqual(new_connector.search_url, "http://fake.ciom/new-search/")
+
+    @patch("bookwyrm.connectors.connector_manager.async_connector_search")
+    def test_search_many_cached(self, search_mock):
+        """the same search isn't sent twice"""
+        connector = connector_manager.load_connector(self.remote_connector)
+
+        async def fake_search(items):
+            return [
+                (
+                    {
+                        "connector": connector,
+                        "results": [
+                            SearchResult(
+                                title="Remote Book",
+                                key="http://fake.ciom/book/1",
+                                connector=connector,
+                                confidence=0.9,
+                            )
+                        ],
+                    },
+                    0.5,
+                )
+                for _ in items
+            ]
+
+        search_mock.side_effect = fake_search
+        with patch(
+            "bookwyrm.connectors.connector_manager.cache",
+            LocMemCache("connector-search", {}),
+        ):
+            result = connector_manager.search_many([("Remote Book", 0.1)])
+            self.assertEqual(search_mock.call_count, 1)
+            self.assertEqual(result[("Remote Book", 0.1)].title, "Remote Book")
+
+            # differences in case and spacing don't matter
+            result = connector_manager.search_many([("remote  book", 0.1)])
+            self.assertEqual(search_mock.call_count, 1)
+            self.assertEqual(result[("remote  book", 0.1)].title, "Remote Book")
+            self.assertEqual(
+                result[("remote  book", 0.1)].connector.identifier,
+                "test_connector_remote",
+            )
+
+            counts = connector_manager.get_search_cache_counts()
+            self.assertEqual(counts["hit"], 1)
+            self.assertEqual(counts["miss"], 1)
+            self.assertEqual(counts["hit_rate"], 50)
+
+    @patch("bookwyrm.connectors.connector_manager.refresh_search_task.delay")
+    @patch("bookwyrm.connectors.connector_manager.async_connector_search")
+    def test_search_many_stale(self, search_mock, refresh_mock):
+        """old results are used while they're refreshed in the background"""
+        connector = connector_manager.load_connector(self.remote_connector)
+        cache = LocMemCache("connector-search", {})
+        cache.set(
+            connector_manager.get_search_cache_key(connector, "Old Book", 0.1),
+            {
+                "results": [
+                    {
+                        "title": "Old Book",
+                        "key": "http://fake.ciom/book/2",
+                        "confidence": 0.9,
+                    }
+                ],
+                "failed": False,
+                "updated": time.time() - 60 * 60 * 24,
+            },
+        )
+        with patch("bookwyrm.connectors.connector_manager.cache", cache):
+            result = connector_manager.search_many([("Old Book", 0.1)])
+            connector_manager.search_many([("Old Book", 0.1)])
+
+        self.assertEqual(result[("Old Book", 0.1)].title, "Old Book")
+        self.assertFalse(search_mock.called)
+        # the refresh is only queued once
+        self.assertEqual(refresh_mock.call_count, 1)
+        self.assertEqual(
+            refresh_mock.call_args[0], (self.remote_connector.id, "Old Book", 0.1)
+        )
+
+    def test_record_searches(self):
+        """keep track of how quickly and reliably a connector responds"""
+        self.remote_connector.record_searches([(False, 1.0), (False, 2.0)])
+        self.remote_connector.refresh_from_db()
+        self.assertAlmostEqual(self.remote_connector.search_latency, 1.2)
+        self.assertEqual(self.remote_connector.search_failures, 0)
+        self.assertAlmostEqual(self.remote_connector.search_deadline, 3.6)
+
+        self.remote_connector.record_searches([(True, 8.0)] * 4)
+        self.remote_connector.refresh_from_db()
+        self.assertEqual(self.remote_connector.search_failures, 4)
+        self.assertIsNone(self.remote_connector.disabled_until)
+        self.assertEqual(len(list(connector_manager.get_connectors())), 1)
+
+    def test_record_searches_disable(self):
+        """a connector that keeps failing isn't searched for a while"""
+        self.remote_connector.record_searches([(True, 8.0)] * 5)
+        self.remote_connector.refresh_from_db()
+        self.assertIsNotNone(self.remote_connector.disabled_until)
+        self.assertEqual(list(connector_manager.get_connectors()), [])
+
+        # a successful search brings it back
+        self.remote_connector.record_searches([(False, 1.0)])
+        self.remote_connector.refresh_from_db()
+        self.assertIsNone(self.remote_connector.disabled_until)
+        self.assertEqual(len(list(connector_manager.get_connectors())), 1)
+
+    def test_record_searches_timeout(self):
+        """a connector that slows down past its deadline is given longer"""
+        self.remote_connector.record_searches([(False, 1.0)])
+        self.assertEqual(self.remote_connector.search_deadline, 3.0)
+
+        self.remote_connector.record_searches([(True, 3.0)])
+        self.remote_connector.refresh_from_db()
+        self.assertAlmostEqual(self.remote_connector.search_latency, 1.4)
+        self.assertAlmostEqual(self.remote_connector.search_deadline, 4.2)
+
+        # an error that comes back quickly doesn't make it look faster
+        self.remote_connector.record_searches([(True, 0.1)])
+        self.remote_connector.refresh_from_db()
+        self.assertAlmostEqual(self.remote_connector.search_latency, 1.4)
+
+    def test_record_searches_concurrent(self):
+        """searches recorded at the same time are all counted"""
+        other = models.Connector.objects.get(id=self.remote_connector.id)
+        self.remote_connector.record_searches([(True, 1.0)])
+        other.record_searches([(True, 1.0)])
+        self.remote_connector.refresh_from_db()
+        self.assertEqual(self.remote_connector.search_failures, 2)
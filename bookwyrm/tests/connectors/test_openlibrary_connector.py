@@ -1,8 +1,11 @@
 """ testing book data connectors """
 import json
+import math
 import pathlib
 from unittest.mock import patch
 
+from django.core.files.base import ContentFile
+from django.db import connection
 from django.test import TestCase
 import responses
 
@@ -187,6 +190,79 @@ class Openlibrary(TestCase):
             self.connector.expand_book_data(edition)
             self.connector.expand_book_data(work)
 
+    @responses.activate
+    def test_expand_book_data_chunks(self):
+        """editions are added a chunk at a time"""
+        work = models.Work.objects.create(title="Test Work", openlibrary_key="OL1234W")
+        responses.add(
+            responses.GET,
+            "https://openlibrary.org/works/OL1234W/editions",
+            json=self.edition_list_data,
+        )
+        with patch(
+            "bookwyrm.connectors.openlibrary.create_editions_task.delay"
+        ) as mock, patch("bookwyrm.connectors.openlibrary.EDITIONS_CHUNK_SIZE", 5):
+            self.connector.expand_book_data(work)
+
+        editions = [
+            edition
+            for edition in self.edition_list_data["entries"]
+            if not ignore_edition(edition)
+        ]
+        self.assertEqual(mock.call_count, math.ceil(len(editions) / 5))
+        self.assertEqual(mock.call_args_list[0][0][2], editions[:5])
+        self.assertEqual(
+            [e for call in mock.call_args_list for e in call[0][2]], editions
+        )
+
+    @responses.activate
+    def test_create_editions_from_data(self):
+        """add a chunk of editions at once"""
+        author = models.Author.objects.create(
+            name="Garth Nix", remote_id="https://openlibrary.org/authors/OL382982A"
+        )
+        work = models.Work.objects.create(title="Sabriel")
+        existing = models.Edition.objects.create(
+            title="Sabriel", isbn_13="9780807216057", parent_work=work
+        )
+        editions_data = [
+            {k: v for k, v in edition.items() if k != "covers"}
+            for edition in self.edition_list_data["entries"]
+            if not ignore_edition(edition)
+        ]
+
+        with_cover = next(
+            edition
+            for edition in editions_data
+            if edition.get("isbn_13") != ["9780807216057"]
+        )
+        with_cover["covers"] = [12345]
+        savepoints = []
+
+        def get_image(url):
+            # covers are downloaded once the editions are committed
+            savepoints.append(len(connection.savepoint_ids))
+            self.assertEqual(url, "https://covers.openlibrary.org/b/id/12345-L.jpg")
+            return ContentFile(b"cover"), "jpg"
+
+        with patch("bookwyrm.connectors.abstract_connector.get_image", get_image):
+            result = self.connector.create_editions_from_data(work, editions_data)
+
+        self.assertEqual(savepoints, [len(connection.savepoint_ids)])
+        covered = result[editions_data.index(with_cover)]
+        covered.refresh_from_db()
+        self.assertTrue(covered.cover)
+        self.assertEqual(len(result), len(editions_data))
+        self.assertIn(existing, result)
+        existing.refresh_from_db()
+        self.assertEqual(existing.connector, self.connector.connector)
+        self.assertEqual(work.editions.count(), len({edition.id for edition in result}))
+        for edition in result:
+            self.assertEqual(edition.parent_work, work)
+            self.assertEqual(list(edition.authors.all()), [author])
+            self.assertTrue(edition.remote_id.startswith("https://"))
+            self.assertNotEqual(edition.remote_id, edition.origin_id)
+
     def test_get_description(self):
         """should do some cleanup on the description data"""
         description = get_description(self.work_data["description"])
@@ -123,11 +123,13 @@ class GenericImporter(TestCase):
         )
 
         MockTask = namedtuple("Task", ("id"))
-        with patch("bookwyrm.models.import_job.import_item_task.delay") as mock:
+        with patch("bookwyrm.models.import_job.import_batch_task.delay") as mock:
             mock.return_value = MockTask(123)
             start_import_task(import_job.id)
 
-        self.assertEqual(mock.call_count, 4)
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(len(mock.call_args.args[1]), 4)
+        self.assertFalse(import_job.items.exclude(task_id="123").exists())
 
     @responses.activate
     def test_import_item_task(self, *_):
@@ -1,8 +1,12 @@
 """ testing model activitypub utilities """
+import asyncio
 from unittest.mock import patch
 from collections import namedtuple
 from dataclasses import dataclass
 import re
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
 from django import db
 from django.test import TestCase
 
@@ -12,6 +16,7 @@ from bookwyrm.models import base_model
 from bookwyrm.models.activitypub_mixin import (
     ActivitypubMixin,
     ActivityMixin,
+    BroadcastClient,
     broadcast_task,
     ObjectMixin,
     OrderedCollectionMixin,
@@ -141,6 +146,28 @@ class ActivitypubMixins(TestCase):
         )
         self.assertEqual(result, matching_book)
 
+    def test_find_existing_many(self, *_):
+        """match lots of blobs of data at once"""
+        book = models.Edition.objects.create(
+            title="Test edition", openlibrary_key="OL1234"
+        )
+        other_book = models.Edition.objects.create(
+            title="Another test edition",
+            isbn_13="9780300000000",
+            remote_id="http://book.com/book",
+        )
+
+        with self.assertNumQueries(1):
+            results = models.Edition.find_existing_many(
+                [
+                    {"openlibraryKey": "OL1234"},
+                    {"id": "http://book.com/book"},
+                    {"isbn13": "9780300000000", "openlibraryKey": "OL5678"},
+                    {"openlibraryKey": "OL5678"},
+                ]
+            )
+        self.assertEqual(results, [book, other_book, other_book, None])
+
     def test_get_recipients_public_object(self, *_):
         """determines the recipients for an object's broadcast"""
         MockSelf = namedtuple("Self", ("privacy"))
@@ -452,12 +479,94 @@ class ActivitypubMixins(TestCase):
         self.assertEqual(page_2.orderedItems[-1]["content"], "<p>test status 0</p>")
 
     def test_broadcast_task(self, *_):
-        """Should be calling asyncio"""
+        """Should be sending the activity"""
         recipients = [
             "https://instance.example/user/inbox",
             "https://instance.example/okay/inbox",
         ]
-        with patch("bookwyrm.models.activitypub_mixin.asyncio.run") as mock:
+        with patch("bookwyrm.models.Delivery.deliver") as mock:
             broadcast_task(self.local_user.id, {}, recipients)
         self.assertTrue(mock.called)
         self.assertEqual(mock.call_count, 1)
+        self.assertEqual(mock.call_args[0], (self.local_user, {}, recipients))
+
+
+class BroadcastClientTest(TestCase):
+    """the long-lived loop and session used for broadcasts"""
+
+    def setUp(self):
+        """a fresh client"""
+        self.client = BroadcastClient()
+
+    def tearDown(self):
+        """don't leave loops open"""
+        self.client.close()
+
+    def test_run(self):
+        """the loop and session are re-used"""
+
+        async def get_session():
+            return self.client.get_session()
+
+        session = self.client.run(get_session())
+        loop = self.client.loop
+        self.assertEqual(self.client.run(get_session()), session)
+        self.assertEqual(self.client.loop, loop)
+        self.assertEqual(session.connector.limit, 100)
+        self.assertEqual(session.connector.limit_per_host, 8)
+
+    @patch("bookwyrm.models.activitypub_mixin.BROADCAST_MAX_CONNECTIONS", 1)
+    @patch("bookwyrm.models.activitypub_mixin.BROADCAST_SOCKET_TIMEOUT", 0.5)
+    def test_run_queued(self):
+        """waiting for a free connection doesn't count towards the timeout"""
+
+        async def inbox(_):
+            await asyncio.sleep(0.2)
+            return web.Response()
+
+        async def post(session, url):
+            async with session.post(url) as response:
+                return response.status
+
+        async def send_all():
+            app = web.Application()
+            app.router.add_post("/inbox", inbox)
+            server = TestServer(app)
+            await server.start_server()
+            session = self.client.get_session()
+            try:
+                # one connection, so the last request waits about a second
+                return await asyncio.gather(
+                    *(post(session, server.make_url("/inbox")) for _ in range(5))
+                )
+            finally:
+                await server.close()
+
+        self.assertEqual(self.client.run(send_all()), [200] * 5)
+
+    def test_run_forked(self):
+        """a forked process gets its own loop"""
+
+        async def get_session():
+            return self.client.get_session()
+
+        session = self.client.run(get_session())
+        loop = self.client.loop
+        with patch("bookwyrm.models.activitypub_mixin.os.getpid") as getpid:
+            getpid.return_value = -1
+            self.assertNotEqual(self.client.run(get_session()), session)
+            self.assertNotEqual(self.client.loop, loop)
+            self.client.close()
+        loop.run_until_complete(session.close())
+        loop.close()
+
+    def test_close(self):
+        """connections are closed"""
+
+        async def get_session():
+            return self.client.get_session()
+
+        session = self.client.run(get_session())
+        self.client.close()
+        self.assertTrue(session.closed)
+        self.assertIsNone(self.client.loop)
@@ -1,14 +1,18 @@
 """test bookwyrm user export functions"""
 import datetime
 import json
-from unittest.mock import patch
+import os
+import tempfile
+from unittest.mock import Mock, patch
 
+from django.core.files import File
 from django.core.serializers.json import DjangoJSONEncoder
 from django.test import TestCase
 from django.utils import timezone
 
 from bookwyrm import models
 import bookwyrm.models.bookwyrm_export_job as export_job
+from bookwyrm.utils.tar import BookwyrmTarFile
 
 
 class BookwyrmExport(TestCase):
@@ -229,3 +233,63 @@ class BookwyrmExport(TestCase):
             json_data["books"][0]["quotations"][0]["quote"],
             "<p>A rose by any other name</p>",
         )
+
+    @patch("bookwyrm.models.bookwyrm_export_job.EXPORT_CHUNK_SIZE", 1)
+    def test_json_export_chunks(self):
+        """books are exported a chunk at a time, and the job knows how far it's got"""
+        other_edition = models.Edition.objects.create(
+            title="Another Edition", parent_work=self.work
+        )
+        with patch(
+            "bookwyrm.models.activitypub_mixin.broadcast_task.apply_async"
+        ), patch("bookwyrm.activitystreams.add_book_statuses_task"):
+            models.ShelfBook.objects.create(
+                book=other_edition,
+                shelf=self.local_user.shelf_set.first(),
+                user=self.local_user,
+            )
+        job = models.BookwyrmExportJob.objects.create(user=self.local_user)
+
+        data = "".join(export_job.json_export_chunks(self.local_user, job=job))
+        json_data = json.loads(data)
+
+        self.assertEqual(json_data["preferredUsername"], "mouse")
+        self.assertEqual(
+            [book["edition"]["title"] for book in json_data["books"]],
+            ["Example Edition", "Another Edition"],
+        )
+        job.refresh_from_db()
+        self.assertEqual(job.books_total, 2)
+        self.assertEqual(job.books_exported, 2)
+        self.assertEqual(job.percent_complete, 100)
+
+    def test_tar_export(self):
+        """the json is written into the tar file"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "export.tar.gz")
+            with open(path, "wb") as export_file:
+                export_job.tar_export(self.local_user, File(export_file, name=path))
+
+            with BookwyrmTarFile.open(path, mode="r:gz") as tar:
+                json_data = json.loads(tar.read("archive.json").decode("utf-8"))
+
+        self.assertEqual(json_data["preferredUsername"], "mouse")
+        self.assertEqual(len(json_data["books"]), 1)
+
+    def test_add_images(self):
+        """images are added in order, with only a few read ahead at a time"""
+        added = []
+        ahead = []
+
+        def read_image(image):
+            ahead.append(len(ahead) - len(added))
+            return image.encode("utf-8")
+
+        tar = Mock()
+        tar.add_image.side_effect = lambda image, data: added.append((image, data))
+        images = [f"cover{i}" for i in range(20)]
+        with patch("bookwyrm.models.bookwyrm_export_job.read_image", read_image):
+            export_job.add_images(tar, images)
+
+        self.assertEqual(added, [(image, image.encode("utf-8")) for image in images])
+        self.assertLessEqual(max(ahead), export_job.COVER_READ_WORKERS)
@@ -11,6 +11,7 @@ from django.test import TestCase
 from bookwyrm import models
 from bookwyrm.utils.tar import BookwyrmTarFile
 from bookwyrm.models import bookwyrm_import_job
+from bookwyrm.models.job import ChildJob
 
 
 class BookwyrmImport(TestCase):  # pylint: disable=too-many-public-methods
@@ -543,3 +544,152 @@ class BookwyrmImport(TestCase):  # pylint: disable=too-many-public-methods
         self.assertEqual(
             models.Shelf.objects.filter(user=self.local_user.id).count(), 4
         )
+
+    def test_upsert_readthroughs_duplicate(self):
+        """Importing the same readthroughs twice doesn't duplicate them"""
+        readthroughs = [
+            {
+                "progress_mode": "PG",
+                "start_date": "2022-12-31T13:30:00Z",
+                "finish_date": "2023-08-23T14:30:00Z",
+                "stopped_date": None,
+                "is_active": True,
+            }
+        ]
+
+        bookwyrm_import_job.upsert_readthroughs(
+            readthroughs, self.local_user, self.book.id
+        )
+        bookwyrm_import_job.upsert_readthroughs(
+            readthroughs, self.local_user, self.book.id
+        )
+
+        self.assertEqual(models.ReadThrough.objects.count(), 1)
+        readthrough = models.ReadThrough.objects.get()
+        self.assertFalse(readthrough.is_active)
+        self.assertEqual(readthrough.remote_id, readthrough.get_remote_id())
+
+    @patch("bookwyrm.models.bookwyrm_import_job.IMPORT_CHUNK_SIZE", 1)
+    def test_process_books(self):
+        """The books are split into chunks imported by child jobs"""
+        job = models.BookwyrmImportJob.objects.create(
+            user=self.local_user, required=[], import_data=self.json_data
+        )
+
+        with patch(
+            "bookwyrm.models.bookwyrm_import_job.import_books_task.delay"
+        ) as mock, self.captureOnCommitCallbacks(execute=True):
+            bookwyrm_import_job.process_books(job)
+
+        self.assertEqual(job.child_jobs.count(), len(self.json_data["books"]))
+        self.assertEqual(
+            [call.kwargs["start"] for call in mock.call_args_list],
+            list(range(len(self.json_data["books"]))),
+        )
+        self.assertEqual(
+            bookwyrm_import_job.get_books_chunk(job.id, 1),
+            self.json_data["books"][1:2],
+        )
+
+    def test_process_books_shared(self):
+        """Shelves and lists are created before the chunks are imported"""
+        job = models.BookwyrmImportJob.objects.create(
+            user=self.local_user,
+            required=["include_shelves", "include_lists"],
+            import_data=self.json_data,
+        )
+
+        with patch(
+            "bookwyrm.models.bookwyrm_import_job.import_books_task.delay"
+        ), patch("bookwyrm.lists_stream.remove_list_task.delay"), patch(
+            "bookwyrm.models.activitypub_mixin.broadcast_task.apply_async"
+        ):
+            bookwyrm_import_job.process_books(job)
+            # and they aren't created again
+            bookwyrm_import_job.process_books(job)
+
+        self.assertEqual(
+            models.List.objects.filter(
+                user=self.local_user, name="my list of books"
+            ).count(),
+            1,
+        )
+        self.assertEqual(models.Shelf.objects.filter(user=self.local_user).count(), 4)
+
+    def test_create_authors_and_works(self):
+        """Books that share an author and work in different chunks don't each
+        create their own"""
+        first = self.json_data["books"][0]
+        second = json.loads(json.dumps(first))
+        second["edition"].update(
+            {
+                "id": "https://www.example.com/book/5",
+                "openlibraryKey": "OL1M",
+                "isbn13": "9780300070164",
+                "cover": {},
+            }
+        )
+        # the other book is already in the database
+        books = [first, second, self.json_data["books"][1]]
+
+        bookwyrm_import_job.create_authors_and_works(books)
+        self.assertEqual(models.Author.objects.count(), 1)
+        self.assertEqual(models.Work.objects.count(), 2)
+
+        with open(self.archive_file, "rb") as fileobj:
+            with BookwyrmTarFile.open(mode="r:gz", fileobj=fileobj) as tarfile:
+                editions = [
+                    bookwyrm_import_job.get_or_create_edition(book, tarfile)
+                    for book in (second, first)
+                ]
+
+        self.assertEqual(models.Author.objects.count(), 1)
+        self.assertEqual(models.Work.objects.count(), 2)
+        self.assertEqual(editions[0].parent_work, editions[1].parent_work)
+        self.assertEqual(
+            list(editions[0].authors.all()), list(editions[1].authors.all())
+        )
+
+    def test_upsert_lists_order(self):
+        """Books are added to the end of a list"""
+        book_data = self.json_data["books"][0]
+        other_book = models.Edition.objects.create(
+            title="Another Book", remote_id="https://example.com/book/9876"
+        )
+        with patch("bookwyrm.lists_stream.remove_list_task.delay"), patch(
+            "bookwyrm.models.activitypub_mixin.broadcast_task.apply_async"
+        ):
+            book_list = bookwyrm_import_job.create_list(
+                self.local_user, book_data["lists"][0]
+            )
+            models.ListItem.objects.create(
+                book=other_book, book_list=book_list, user=self.local_user, order=3
+            )
+            bookwyrm_import_job.upsert_lists(
+                self.local_user, book_data["lists"], self.book.id
+            )
+
+        self.assertEqual(
+            models.ListItem.objects.get(book=self.book, book_list=book_list).order, 4
+        )
+
+    def test_import_books_task_failed(self):
+        """A chunk that can't be imported is marked as failed"""
+        job = models.BookwyrmImportJob.objects.create(
+            user=self.local_user, required=[], import_data=self.json_data
+        )
+        child_job = ChildJob.objects.create(parent_job=job)
+
+        with patch(
+            "bookwyrm.models.bookwyrm_import_job.get_books_chunk",
+            side_effect=ValueError,
+        ), patch("bookwyrm.models.job.app.control.revoke"):
+            bookwyrm_import_job.import_books_task.run(
+                job_id=job.id, child_id=child_job.id, start=0
+            )
+
+        child_job.refresh_from_db()
+        self.assertEqual(child_job.status, "failed")
+        self.assertTrue(child_job.complete)
+        job.refresh_from_db()
+        self.assertTrue(job.complete)
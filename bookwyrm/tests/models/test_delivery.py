@@ -0,0 +1,289 @@
+""" testing retrying outgoing activities """
+import asyncio
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from bookwyrm import models
+from bookwyrm.models import delivery
+from bookwyrm.models.activitypub_mixin import BroadcastClient
+
+
+def mock_response(status):
+    """what sign_and_send returns"""
+    return Mock(status=status, ok=status < 400)
+
+
+@patch("bookwyrm.models.delivery.async_deliver", Mock())
+class Delivery(TestCase):
+    """keep trying to reach inboxes"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need a sender and some servers"""
+        with patch("bookwyrm.suggested_users.rerank_suggestions_task.delay"), patch(
+            "bookwyrm.activitystreams.populate_stream_task.delay"
+        ), patch("bookwyrm.lists_stream.populate_lists_task.delay"):
+            self.local_user = models.User.objects.create_user(
+                "mouse", "mouse@mouse.mouse", "password", local=True, localname="mouse"
+            )
+        self.server = models.FederatedServer.objects.create(server_name="up.example")
+        self.other_server = models.FederatedServer.objects.create(
+            server_name="down.example"
+        )
+
+    def test_deliver(self):
+        """only failed deliveries that might work later are saved"""
+        recipients = [
+            "https://up.example/inbox",
+            "https://up.example/user/rat/inbox",
+            "https://down.example/inbox",
+            "https://unknown.example/inbox",
+        ]
+        responses = [
+            mock_response(202),
+            mock_response(410),
+            mock_response(503),
+            None,
+        ]
+        with patch(
+            "bookwyrm.models.delivery.broadcast_client.run", return_value=responses
+        ):
+            models.Delivery.deliver(self.local_user, "{}", recipients)
+
+        pending = models.Delivery.objects.get(
+            status="pending", server=self.other_server
+        )
+        self.assertEqual(pending.destination, "https://down.example/inbox")
+        self.assertEqual(pending.attempts, 1)
+        self.assertEqual(pending.last_error, "HTTP 503")
+        self.assertGreater(pending.next_attempt, timezone.now())
+        self.assertTrue(
+            models.Delivery.objects.filter(
+                status="pending", server__isnull=True, last_error="No response"
+            ).exists()
+        )
+        # the 410 won't go any better next time, so it isn't kept
+        self.assertFalse(models.Delivery.objects.filter(status="failed").exists())
+        self.assertEqual(models.Delivery.objects.count(), 2)
+
+        self.server.refresh_from_db()
+        self.assertEqual(self.server.delivery_attempts, 1)
+        self.assertEqual(self.server.delivery_errors, 0)
+        self.other_server.refresh_from_db()
+        self.assertEqual(self.other_server.delivery_attempts, 1)
+        self.assertEqual(self.other_server.delivery_errors, 1)
+        self.assertEqual(self.other_server.consecutive_delivery_errors, 1)
+        self.assertTrue(self.other_server.is_available)
+
+    def test_deliver_unavailable(self):
+        """servers that keep failing are skipped"""
+        self.other_server.unavailable_until = timezone.now() + timedelta(hours=1)
+        self.other_server.save()
+
+        with patch(
+            "bookwyrm.models.delivery.broadcast_client.run",
+            return_value=[mock_response(202)],
+        ) as run_mock, patch("bookwyrm.models.delivery.async_deliver") as deliver_mock:
+            models.Delivery.deliver(
+                self.local_user,
+                "{}",
+                ["https://up.example/inbox", "https://down.example/inbox"],
+            )
+        self.assertEqual(run_mock.call_count, 1)
+        sent = deliver_mock.call_args[0][0]
+        self.assertEqual([d.destination for d in sent], ["https://up.example/inbox"])
+
+        deferred = models.Delivery.objects.get()
+        self.assertEqual(deferred.destination, "https://down.example/inbox")
+        self.assertEqual(deferred.attempts, 0)
+        self.assertEqual(deferred.next_attempt, self.other_server.unavailable_until)
+
+    def test_record_server_health(self):
+        """servers are paused after failing too many times in a row"""
+        models.FederatedServer.objects.filter(id=self.other_server.id).update(
+            consecutive_delivery_errors=delivery.SERVER_FAILURE_THRESHOLD - 1
+        )
+        delivery.record_server_health({self.server.id}, {self.other_server.id})
+
+        self.other_server.refresh_from_db()
+        self.assertFalse(self.other_server.is_available)
+        self.assertEqual(
+            self.other_server.consecutive_delivery_errors,
+            delivery.SERVER_FAILURE_THRESHOLD,
+        )
+
+        delivery.record_server_health({self.other_server.id}, set())
+        self.other_server.refresh_from_db()
+        self.assertTrue(self.other_server.is_available)
+        self.assertEqual(self.other_server.consecutive_delivery_errors, 0)
+
+    def test_get_backoff(self):
+        """wait longer after each failure"""
+        self.assertEqual(delivery.get_backoff(1), timedelta(minutes=5))
+        self.assertEqual(delivery.get_backoff(3), timedelta(minutes=20))
+        self.assertEqual(delivery.get_backoff(20), timedelta(days=1))
+
+    def test_retry_deliveries_task(self):
+        """due deliveries are re-sent"""
+        sent = models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://up.example/inbox",
+            server=self.server,
+            activity="{}",
+            attempts=1,
+        )
+        retry = models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://down.example/inbox",
+            server=self.other_server,
+            activity="{}",
+            attempts=1,
+        )
+        give_up = models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://down.example/user/inbox",
+            server=self.other_server,
+            activity="{}",
+            attempts=delivery.DELIVERY_MAX_ATTEMPTS - 1,
+        )
+        not_due = models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://up.example/user/inbox",
+            server=self.server,
+            activity="{}",
+            next_attempt=timezone.now() + timedelta(hours=1),
+        )
+
+        with patch(
+            "bookwyrm.models.delivery.broadcast_client.run",
+            return_value=[mock_response(202), mock_response(500), mock_response(500)],
+        ):
+            delivery.retry_deliveries_task()
+
+        self.assertFalse(models.Delivery.objects.filter(id=sent.id).exists())
+        retry.refresh_from_db()
+        self.assertEqual(retry.status, "pending")
+        self.assertEqual(retry.attempts, 2)
+        give_up.refresh_from_db()
+        self.assertEqual(give_up.status, "failed")
+        self.assertEqual(give_up.activity, "")
+        not_due.refresh_from_db()
+        self.assertEqual(not_due.attempts, 0)
+
+    def test_retry_deliveries_task_rejected(self):
+        """deliveries the receiving server turns down are dropped"""
+        rejected = models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://up.example/inbox",
+            server=self.server,
+            activity="{}",
+            attempts=1,
+        )
+        with patch(
+            "bookwyrm.models.delivery.broadcast_client.run",
+            return_value=[mock_response(404)],
+        ):
+            delivery.retry_deliveries_task()
+        self.assertFalse(models.Delivery.objects.filter(id=rejected.id).exists())
+
+    def test_prune_deliveries_task(self):
+        """deliveries given up on a while ago are removed"""
+        old = models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://down.example/inbox",
+            server=self.other_server,
+            status="failed",
+        )
+        models.Delivery.objects.filter(id=old.id).update(
+            created_date=timezone.now()
+            - delivery.DELIVERY_FAILED_RETENTION
+            - timedelta(days=1)
+        )
+        recent = models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://down.example/user/inbox",
+            server=self.other_server,
+            status="failed",
+        )
+        pending = models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://down.example/user/rat/inbox",
+            server=self.other_server,
+            activity="{}",
+        )
+        models.Delivery.objects.filter(id=pending.id).update(
+            created_date=timezone.now()
+            - delivery.DELIVERY_FAILED_RETENTION
+            - timedelta(days=1)
+        )
+
+        delivery.prune_deliveries_task()
+
+        self.assertEqual(
+            set(models.Delivery.objects.values_list("id", flat=True)),
+            {recent.id, pending.id},
+        )
+
+
+class AsyncDeliver(TestCase):
+    """sending deliveries all at once"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need a sender and a server"""
+        with patch("bookwyrm.suggested_users.rerank_suggestions_task.delay"), patch(
+            "bookwyrm.activitystreams.populate_stream_task.delay"
+        ), patch("bookwyrm.lists_stream.populate_lists_task.delay"):
+            self.local_user = models.User.objects.create_user(
+                "mouse", "mouse@mouse.mouse", "password", local=True, localname="mouse"
+            )
+        self.server = models.FederatedServer.objects.create(server_name="up.example")
+
+    @patch("bookwyrm.models.delivery.BROADCAST_MAX_CONNECTIONS", 2)
+    @patch("bookwyrm.models.delivery.BROADCAST_MAX_CONNECTIONS_PER_HOST", 1)
+    def test_send_deliveries_queued(self):
+        """more deliveries than connections wait their turn instead of failing"""
+        in_flight = []
+        most_in_flight = {"total": 0, "up.example": 0}
+
+        async def sign_and_send(_, __, ___, destination):
+            in_flight.append(destination)
+            most_in_flight["total"] = max(most_in_flight["total"], len(in_flight))
+            most_in_flight["up.example"] = max(
+                most_in_flight["up.example"],
+                len([d for d in in_flight if "up.example" in d]),
+            )
+            await asyncio.sleep(0.01)
+            in_flight.remove(destination)
+            return mock_response(202)
+
+        deliveries = [
+            models.Delivery(
+                sender=self.local_user,
+                destination=f"https://up.example/user/{i}/inbox",
+                server=self.server,
+                activity="{}",
+            )
+            for i in range(5)
+        ] + [
+            models.Delivery(
+                sender=self.local_user,
+                destination=f"https://other{i}.example/inbox",
+                activity="{}",
+            )
+            for i in range(5)
+        ]
+        client = BroadcastClient()
+        with patch("bookwyrm.models.delivery.broadcast_client", client), patch(
+            "bookwyrm.models.delivery.sign_and_send", sign_and_send
+        ):
+            unsent = delivery.send_deliveries(deliveries)
+            client.close()
+
+        self.assertEqual(unsent, [])
+        self.assertEqual(most_in_flight, {"total": 2, "up.example": 1})
+        self.server.refresh_from_db()
+        self.assertEqual(self.server.consecutive_delivery_errors, 0)
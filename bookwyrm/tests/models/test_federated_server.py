@@ -65,3 +65,14 @@ class FederatedServer(TestCase):
         self.inactive_remote_user.refresh_from_db()
         self.assertFalse(self.inactive_remote_user.is_active)
         self.assertEqual(self.inactive_remote_user.deactivation_reason, "self_deletion")
+
+    def test_is_blocked(self):
+        """blocking a server blocks its subdomains too"""
+        self.assertFalse(models.FederatedServer.is_blocked("https://test.server/user"))
+
+        self.server.block()
+
+        self.assertTrue(models.FederatedServer.is_blocked("https://test.server/user"))
+        self.assertTrue(models.FederatedServer.is_blocked("https://a.test.server/u"))
+        self.assertFalse(models.FederatedServer.is_blocked("https://best.server/u"))
+        self.assertFalse(models.FederatedServer.is_blocked("test.server"))
@@ -11,6 +11,7 @@ import responses
 from bookwyrm import models
 from bookwyrm.book_search import SearchResult
 from bookwyrm.connectors import connector_manager
+from bookwyrm.models import import_job
 
 
 class ImportJob(TestCase):
@@ -203,3 +204,75 @@ class ImportJob(TestCase):
                     book = item.get_book_from_identifier()
 
         self.assertEqual(book.title, "Sabriel")
+
+    def test_resolve_items_local_isbn(self):
+        """rows with isbns that are already known are found with one query"""
+        edition = models.Edition.objects.create(
+            title="The Raven Tower", isbn_13="9780356506999"
+        )
+        items = [
+            models.ImportItem.objects.create(
+                index=index,
+                job=self.job,
+                data={},
+                normalized_data={"isbn_13": '="9780356506999"'},
+            )
+            for index in range(2)
+        ]
+
+        with patch(
+            "bookwyrm.connectors.connector_manager.search_many"
+        ) as search_many, patch(
+            "bookwyrm.connectors.connector_manager.first_search_result"
+        ) as first_search_result:
+            import_job.resolve_items(items)
+            for item in items:
+                item.resolve()
+
+        self.assertFalse(search_many.called)
+        self.assertFalse(first_search_result.called)
+        self.assertEqual(items[0].book, edition)
+        self.assertEqual(items[1].book, edition)
+
+    def test_resolve_items_remote(self):
+        """rows that aren't known locally are searched for together, once each"""
+        connector_info = models.Connector.objects.create(
+            identifier="openlibrary.org",
+            name="OpenLibrary",
+            connector_file="openlibrary",
+            base_url="https://openlibrary.org",
+            books_url="https://openlibrary.org",
+            covers_url="https://covers.openlibrary.org",
+            search_url="https://openlibrary.org/search?q=",
+            priority=3,
+        )
+        result = SearchResult(
+            title="Test Result",
+            key="https://openlibrary.org/works/OL1234W",
+            connector=connector_manager.load_connector(connector_info),
+            confidence=1,
+        )
+        items = [
+            models.ImportItem.objects.create(
+                index=index,
+                job=self.job,
+                data={},
+                normalized_data={"isbn_13": '="9780356506999"'},
+            )
+            for index in range(2)
+        ]
+
+        with patch("bookwyrm.connectors.connector_manager.search_many") as search:
+            search.return_value = {("9780356506999", 0.999): result}
+            import_job.resolve_items(items)
+
+        self.assertEqual(search.call_count, 1)
+        self.assertEqual(search.call_args.args[0], [("9780356506999", 0.999)])
+        self.assertEqual(
+            items[0].first_search_result("9780356506999", min_confidence=0.999),
+            result,
+        )
+        self.assertEqual(
+            items[1].first_search_result("9780356506999", min_confidence=0.999),
+            result,
+        )
@@ -1,7 +1,9 @@
 """ testing models """
+import json
 from unittest.mock import patch
 from django.test import TestCase
 from bookwyrm import models
+from bookwyrm.models import notification as notification_model
 
 
 class Notification(TestCase):
@@ -194,6 +196,84 @@ class Notification(TestCase):
         )
         self.assertFalse(models.Notification.objects.exists())
 
+    def test_notify_many(self):
+        """Several users are added to a notification at once"""
+        models.Notification.notify_many(
+            self.local_user.id,
+            [self.remote_user.id, self.another_user.id],
+            notification_type=models.NotificationType.FAVORITE,
+        )
+        notification = models.Notification.objects.get()
+        self.assertEqual(notification.related_users.count(), 2)
+        self.assertFalse(notification.read)
+
+    def test_get_unread_counts(self):
+        """Unread notifications and mentions are counted"""
+        models.Notification.objects.create(
+            user=self.local_user, notification_type=models.NotificationType.FAVORITE
+        )
+        models.Notification.objects.create(
+            user=self.local_user, notification_type=models.NotificationType.MENTION
+        )
+        models.Notification.objects.create(
+            user=self.local_user,
+            notification_type=models.NotificationType.MENTION,
+            read=True,
+        )
+        self.assertEqual(
+            models.Notification.get_unread_counts(self.local_user),
+            {"unread": 2, "mentions": 1},
+        )
+        self.assertEqual(self.local_user.unread_notification_count, 2)
+        self.assertTrue(self.local_user.has_unread_mentions)
+
+    def test_unread_counts_updated(self):
+        """Stored counts change as notifications are added, read, and removed"""
+        with patch(
+            "bookwyrm.models.notification.change_unread_counts"
+        ) as change_mock, self.captureOnCommitCallbacks(execute=True):
+            notification = models.Notification.objects.create(
+                user=self.local_user, notification_type=models.NotificationType.REPLY
+            )
+            notification.read = True
+            notification.save()
+            # already read, so it doesn't change the counts
+            notification.delete()
+        self.assertEqual(change_mock.call_count, 2)
+        self.assertEqual(change_mock.call_args_list[0][0], (self.local_user.id, 1, 1))
+        self.assertEqual(change_mock.call_args_list[1][0], (self.local_user.id, -1, -1))
+
+    def test_notification_batch_task(self):
+        """A batch of likes on one status becomes one notification"""
+        with patch(
+            "bookwyrm.models.activitypub_mixin.broadcast_task.apply_async"
+        ), patch("bookwyrm.activitystreams.add_status_task.delay"):
+            status = models.Status.objects.create(user=self.local_user, content="hi")
+            for user in [self.remote_user, self.another_user]:
+                models.Favorite.objects.create(user=user, status=status)
+        models.Notification.objects.all().delete()
+
+        entries = [
+            json.dumps(
+                {
+                    "user": self.local_user.id,
+                    "related_user": user.id,
+                    "related_status": status.id,
+                    "notification_type": "FAVORITE",
+                }
+            )
+            for user in [self.remote_user, self.another_user, self.remote_user]
+        ]
+        with patch("bookwyrm.models.notification.r") as redis_mock:
+            redis_mock.pipeline.return_value.execute.return_value = [entries, None, 0]
+            notification_model.notification_batch_task()
+
+        notification = models.Notification.objects.get()
+        self.assertEqual(notification.related_status, status)
+        self.assertEqual(
+            set(notification.related_users.all()), {self.remote_user, self.another_user}
+        )
+
 
 class NotifyInviteRequest(TestCase):
     """let admins know of invite requests"""
@@ -0,0 +1,128 @@
+""" testing the running totals of ratings """
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from bookwyrm import models
+
+
+@patch("bookwyrm.activitystreams.add_status_task.delay")
+@patch("bookwyrm.activitystreams.remove_status_task.delay")
+@patch("bookwyrm.models.activitypub_mixin.broadcast_task.apply_async")
+class RatingAggregate(TestCase):
+    """ratings are counted as they're made"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need some users and a book"""
+        with patch("bookwyrm.suggested_users.rerank_suggestions_task.delay"), patch(
+            "bookwyrm.activitystreams.populate_stream_task.delay"
+        ), patch("bookwyrm.lists_stream.populate_lists_task.delay"):
+            self.local_user = models.User.objects.create_user(
+                "mouse@example.com",
+                "mouse@mouse.mouse",
+                "mouseword",
+                local=True,
+                localname="mouse",
+            )
+        with patch("bookwyrm.models.user.set_remote_server.delay"):
+            self.remote_user = models.User.objects.create_user(
+                "rat",
+                "rat@rat.rat",
+                "ratword",
+                remote_id="http://example.com/rat",
+                local=False,
+            )
+        self.work = models.Work.objects.create(title="Work title")
+        self.book = models.Edition.objects.create(
+            title="Test Book", parent_work=self.work
+        )
+        self.other_edition = models.Edition.objects.create(
+            title="Other Edition", parent_work=self.work
+        )
+
+    def test_rating_counted(self, *_):
+        """ratings of any edition add to the work's totals"""
+        models.ReviewRating.objects.create(
+            user=self.local_user, book=self.book, rating=5
+        )
+        models.Review.objects.create(
+            user=self.remote_user, book=self.other_edition, rating=2, name="hi"
+        )
+        # no rating, so it isn't counted
+        models.Review.objects.create(user=self.local_user, book=self.book, name="hi")
+
+        aggregate = self.work.rating_aggregate
+        self.assertEqual(aggregate.rating_count, 2)
+        self.assertEqual(aggregate.rating_sum, 7)
+        self.assertEqual(aggregate.rating_sum_squares, 29)
+        self.assertEqual(aggregate.average, 3.5)
+        self.assertEqual(aggregate.local_rating_count, 1)
+        self.assertEqual(aggregate.local_average, 5)
+        self.assertEqual(aggregate.local_deviation, 0)
+
+    def test_rating_changed(self, *_):
+        """editing a rating updates the totals"""
+        review = models.Review.objects.create(
+            user=self.local_user, book=self.book, rating=5, name="hi"
+        )
+        models.Review.objects.create(
+            user=self.local_user, book=self.book, rating=3, name="hi"
+        )
+        review.rating = 1
+        review.save()
+
+        aggregate = models.RatingAggregate.objects.get(work=self.work)
+        self.assertEqual(aggregate.average, 2)
+        self.assertEqual(aggregate.local_deviation, 1)
+
+    def test_rating_moved(self, *_):
+        """moving a review to another work updates both works"""
+        other_work = models.Work.objects.create(title="Other work")
+        other_book = models.Edition.objects.create(
+            title="Other Book", parent_work=other_work
+        )
+        review = models.Review.objects.create(
+            user=self.local_user, book=self.book, rating=5, name="hi"
+        )
+        models.Review.objects.create(
+            user=self.local_user, book=self.book, rating=3, name="hi"
+        )
+
+        review.book = other_book
+        review.save()
+
+        self.assertEqual(
+            models.RatingAggregate.objects.get(work=self.work).rating_count, 1
+        )
+        self.assertEqual(models.RatingAggregate.objects.get(work=self.work).average, 3)
+        self.assertEqual(
+            models.RatingAggregate.objects.get(work=other_work).rating_count, 1
+        )
+        self.assertEqual(models.RatingAggregate.objects.get(work=other_work).average, 5)
+
+    def test_rating_deleted(self, *_):
+        """deleted ratings aren't counted"""
+        review = models.ReviewRating.objects.create(
+            user=self.local_user, book=self.book, rating=5
+        )
+        self.assertTrue(models.RatingAggregate.objects.filter(work=self.work).exists())
+
+        review.delete()
+        self.assertFalse(models.RatingAggregate.objects.filter(work=self.work).exists())
+
+    def test_rebuild(self, *_):
+        """the totals can be re-counted from scratch"""
+        models.ReviewRating.objects.create(
+            user=self.local_user, book=self.book, rating=4
+        )
+        models.ReviewRating.objects.create(
+            user=self.remote_user, book=self.other_edition, rating=2
+        )
+        models.RatingAggregate.objects.all().delete()
+
+        self.assertEqual(models.RatingAggregate.rebuild(), 1)
+        aggregate = models.RatingAggregate.objects.get(work=self.work)
+        self.assertEqual(aggregate.rating_count, 2)
+        self.assertEqual(aggregate.average, 3)
+        self.assertEqual(aggregate.local_average, 4)
@@ -0,0 +1,214 @@
+""" testing the yearly reading stats """
+from datetime import datetime
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+import pytz
+
+from bookwyrm import models
+
+
+def make_date(*args):
+    """helper function to easily generate a date obj"""
+    return datetime(*args, tzinfo=pytz.UTC)
+
+
+@patch("bookwyrm.activitystreams.add_status_task.delay")
+@patch("bookwyrm.activitystreams.remove_status_task.delay")
+@patch("bookwyrm.models.activitypub_mixin.broadcast_task.apply_async")
+class ReadingStats(TestCase):
+    """a year of reading, added up as it happens"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need a user and some books"""
+        with patch("bookwyrm.suggested_users.rerank_suggestions_task.delay"), patch(
+            "bookwyrm.activitystreams.populate_stream_task.delay"
+        ), patch("bookwyrm.lists_stream.populate_lists_task.delay"):
+            self.local_user = models.User.objects.create_user(
+                "mouse@local.com",
+                "mouse@mouse.com",
+                "mouseword",
+                local=True,
+                localname="mouse",
+            )
+        work = models.Work.objects.create(title="Test Work")
+        self.short_book = models.Edition.objects.create(
+            title="Short", parent_work=work, pages=100
+        )
+        self.long_book = models.Edition.objects.create(
+            title="Long", parent_work=work, pages=500
+        )
+        self.no_pages = models.Edition.objects.create(title="Unknown", parent_work=work)
+
+    def test_readthrough_finished(self, *_):
+        """finishing books adds them to the year"""
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.long_book,
+            finish_date=make_date(2020, 3, 1),
+        )
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.short_book,
+            finish_date=make_date(2020, 2, 1),
+        )
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.no_pages,
+            finish_date=make_date(2020, 4, 1),
+        )
+        # a different year
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.short_book,
+            finish_date=make_date(2021, 4, 1),
+        )
+
+        stats = models.ReadingStats.objects.get(user=self.local_user, year=2020)
+        self.assertEqual(stats.finished_count, 3)
+        self.assertEqual(
+            stats.book_ids, [self.short_book.id, self.long_book.id, self.no_pages.id]
+        )
+        self.assertEqual(stats.pages_total, 600)
+        self.assertEqual(stats.pages_average, 300)
+        self.assertEqual(stats.no_page_count, 1)
+        self.assertEqual(stats.book_pages_lowest, self.short_book)
+        self.assertEqual(stats.book_pages_highest, self.long_book)
+
+    def test_readthrough_moved(self, *_):
+        """changing the finish date moves the book between years"""
+        readthrough = models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.long_book,
+            finish_date=make_date(2020, 3, 1),
+        )
+        readthrough.finish_date = make_date(2021, 3, 1)
+        readthrough.save()
+
+        self.assertEqual(
+            models.ReadingStats.objects.get(user=self.local_user, year=2020).book_ids,
+            [],
+        )
+        self.assertEqual(
+            models.ReadingStats.objects.get(user=self.local_user, year=2021).book_ids,
+            [self.long_book.id],
+        )
+
+        readthrough.delete()
+        self.assertEqual(
+            models.ReadingStats.objects.get(user=self.local_user, year=2021).book_ids,
+            [],
+        )
+
+    def test_readthrough_timezone(self, *_):
+        """books finished around new year count in the reader's own timezone"""
+        models.User.objects.filter(id=self.local_user.id).update(
+            preferred_timezone="America/New_York"
+        )
+        # it's someone else in another timezone who makes the change
+        with timezone.override(pytz.timezone("Asia/Tokyo")):
+            models.ReadThrough.objects.create(
+                user=self.local_user,
+                book=self.long_book,
+                # the evening of new year's eve in new york
+                finish_date=make_date(2021, 1, 1, 3),
+            )
+
+        self.assertEqual(
+            models.ReadingStats.objects.get(user=self.local_user, year=2020).book_ids,
+            [self.long_book.id],
+        )
+        self.assertFalse(
+            models.ReadingStats.objects.filter(user=self.local_user, year=2021).exists()
+        )
+
+        models.ReadingStats.objects.all().delete()
+        models.ReadingStats.rebuild()
+        self.assertEqual(
+            list(models.ReadingStats.objects.values_list("year", flat=True)), [2020]
+        )
+
+    def test_readthrough_unknown_timezone(self, *_):
+        """a timezone pytz doesn't recognize counts as UTC"""
+        models.User.objects.filter(id=self.local_user.id).update(
+            preferred_timezone="America/Los Angeles"
+        )
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.long_book,
+            finish_date=make_date(2021, 1, 1, 3),
+        )
+        self.assertTrue(
+            models.ReadingStats.objects.filter(user=self.local_user, year=2021).exists()
+        )
+
+        models.ReadingStats.objects.all().delete()
+        models.ReadingStats.rebuild()
+        self.assertEqual(
+            list(models.ReadingStats.objects.values_list("year", flat=True)), [2021]
+        )
+
+    def test_rating(self, *_):
+        """rating a finished book updates the year's ratings"""
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.long_book,
+            finish_date=make_date(2020, 3, 1),
+        )
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.short_book,
+            finish_date=make_date(2020, 3, 1),
+        )
+        models.ReviewRating.objects.create(
+            user=self.local_user, book=self.short_book, rating=3
+        )
+        review = models.ReviewRating.objects.create(
+            user=self.local_user, book=self.long_book, rating=5
+        )
+
+        stats = models.ReadingStats.objects.get(user=self.local_user, year=2020)
+        self.assertEqual(stats.ratings_count, 2)
+        self.assertEqual(stats.rating_average, 4)
+        self.assertEqual(stats.review_rating_highest_id, review.id)
+        self.assertEqual(stats.five_star_book_ids, [self.long_book.id])
+
+        review.delete()
+        stats.refresh_from_db()
+        self.assertEqual(stats.ratings_count, 1)
+        self.assertEqual(stats.five_star_book_ids, [])
+
+    def test_get_for_year(self, *_):
+        """stats that haven't been added up yet are calculated when needed"""
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.long_book,
+            finish_date=make_date(2020, 3, 1),
+        )
+        models.ReadingStats.objects.all().delete()
+
+        stats = models.ReadingStats.get_for_year(self.local_user, 2020)
+        self.assertEqual(stats.book_ids, [self.long_book.id])
+        self.assertEqual(models.ReadingStats.objects.count(), 1)
+
+    def test_rebuild(self, *_):
+        """every year with a finished book is added up"""
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.long_book,
+            finish_date=make_date(2020, 3, 1),
+        )
+        models.ReadThrough.objects.create(
+            user=self.local_user,
+            book=self.long_book,
+            finish_date=make_date(2022, 3, 1),
+        )
+        models.ReadingStats.objects.all().delete()
+
+        self.assertEqual(models.ReadingStats.rebuild(), 2)
+        self.assertEqual(
+            set(models.ReadingStats.objects.values_list("year", flat=True)),
+            {2020, 2022},
+        )
@@ -93,6 +93,81 @@ class Status(TestCase):
         self.assertEqual(sibling.thread_id, parent.id)
         self.assertEqual(grandchild.thread_id, parent.id)
 
+        self.assertEqual(parent.thread_path, [parent.id])
+        self.assertEqual(sibling.thread_path, [parent.id, sibling.id])
+        self.assertEqual(grandchild.thread_path, [parent.id, child.id, grandchild.id])
+
+    def test_get_ancestors(self, *_):
+        """the chain of statuses above a reply"""
+        parent = models.Status.objects.create(content="hi", user=self.local_user)
+        hidden = models.Status.objects.create(
+            content="hello", reply_parent=parent, user=self.local_user, privacy="direct"
+        )
+        child = models.Status.objects.create(
+            content="hey", reply_parent=hidden, user=self.local_user
+        )
+        grandchild = models.Status.objects.create(
+            content="hi hello", reply_parent=child, user=self.local_user
+        )
+
+        self.assertEqual(parent.get_ancestors(self.local_user), [])
+        self.assertEqual(
+            grandchild.get_ancestors(self.local_user), [parent, hidden, child]
+        )
+        self.assertEqual(grandchild.get_ancestors(self.local_user, depth=1), [child])
+        # stops at the status that can't be seen
+        self.assertEqual(grandchild.get_ancestors(self.anonymous_user), [child])
+
+    def test_get_replies_page(self, *_):
+        """replies, and replies to replies"""
+        parent = models.Status.objects.create(content="hi", user=self.local_user)
+        child = models.Status.objects.create(
+            content="hello", reply_parent=parent, user=self.local_user
+        )
+        hidden = models.Status.objects.create(
+            content="hey", reply_parent=parent, user=self.local_user, privacy="direct"
+        )
+        grandchild = models.Status.objects.create(
+            content="hi hello", reply_parent=child, user=self.local_user
+        )
+        models.Status.objects.create(
+            content="hey hey", reply_parent=hidden, user=self.local_user
+        )
+        great_grandchild = models.Status.objects.create(
+            content="hey hello", reply_parent=grandchild, user=self.local_user
+        )
+
+        replies, children = parent.get_replies_page(self.local_user)
+        self.assertEqual(list(replies), [child.id, hidden.id])
+        self.assertEqual(len(children), 5)
+        self.assertEqual(children[:3], [child, grandchild, great_grandchild])
+
+        # replies to statuses that can't be seen aren't shown
+        replies, children = parent.get_replies_page(self.anonymous_user, depth=2)
+        self.assertEqual(list(replies), [child.id])
+        self.assertEqual(children, [child, grandchild])
+
+        replies, children = child.get_replies_page(self.local_user)
+        self.assertEqual(children, [grandchild, great_grandchild])
+
+    def test_thread_mixed_types(self, *_):
+        """a review's thread includes replies that aren't reviews"""
+        review = models.Review.objects.create(
+            content="hi", user=self.local_user, book=self.book
+        )
+        reply = models.Status.objects.create(
+            content="hello", reply_parent=review, user=self.local_user
+        )
+        reply_review = models.Review.objects.create(
+            content="hey", reply_parent=reply, user=self.local_user, book=self.book
+        )
+
+        replies, children = review.get_replies_page(self.local_user)
+        self.assertEqual(list(replies), [reply.id])
+        self.assertEqual(children, [reply, reply_review])
+        self.assertIsInstance(children[1], models.Review)
+        self.assertEqual(reply_review.get_ancestors(self.local_user), [review, reply])
+
     def test_status_type(self, *_):
         """class name"""
         self.assertEqual(models.Status().status_type, "Note")
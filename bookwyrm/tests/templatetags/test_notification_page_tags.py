@@ -36,3 +36,27 @@ class NotificationPageTags(TestCase):
 
         result = notification_page_tags.related_status(notification)
         self.assertIsInstance(result, models.Status)
+
+    def test_get_related_users(self, *_):
+        """the most recent users, up to a limit"""
+        with patch("bookwyrm.models.user.set_remote_server.delay"):
+            users = [
+                models.User.objects.create_user(
+                    f"rat{i}",
+                    f"rat{i}@rat.rat",
+                    "ratword",
+                    local=False,
+                    remote_id=f"https://example.com/users/rat{i}",
+                    inbox=f"https://example.com/users/rat{i}/inbox",
+                    outbox=f"https://example.com/users/rat{i}/outbox",
+                )
+                for i in range(12)
+            ]
+        notification = models.Notification.objects.create(
+            user=self.user, notification_type="FAVORITE"
+        )
+        for user in users:
+            notification.related_users.add(user)
+
+        result = notification_page_tags.get_related_users(notification)
+        self.assertEqual(result, list(reversed(users))[:10])
@@ -0,0 +1,148 @@
+""" testing the redis follower and block sets """
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from bookwyrm import activitystreams, models
+from bookwyrm.audience_index import audience_index
+
+
+@patch("bookwyrm.models.activitypub_mixin.broadcast_task.apply_async")
+@patch("bookwyrm.activitystreams.add_status_task.delay")
+@patch("bookwyrm.activitystreams.add_book_statuses_task.delay")
+@patch("bookwyrm.suggested_users.rerank_suggestions_task.delay")
+@patch("bookwyrm.activitystreams.populate_stream_task.delay")
+@patch("bookwyrm.lists_stream.populate_lists_task.delay")
+@patch("bookwyrm.lists_stream.remove_user_lists_task.delay")
+@patch("bookwyrm.suggested_users.remove_suggestion_task.delay")
+class AudienceIndex(TestCase):
+    """resolving audiences without querying users"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need some users"""
+        with patch("bookwyrm.suggested_users.rerank_suggestions_task.delay"), patch(
+            "bookwyrm.activitystreams.populate_stream_task.delay"
+        ), patch("bookwyrm.lists_stream.populate_lists_task.delay"):
+            self.local_user = models.User.objects.create_user(
+                "mouse", "mouse@mouse.mouse", "password", local=True, localname="mouse"
+            )
+            self.another_user = models.User.objects.create_user(
+                "nutria",
+                "nutria@nutria.nutria",
+                "password",
+                local=True,
+                localname="nutria",
+            )
+        with patch("bookwyrm.models.user.set_remote_server.delay"):
+            self.remote_user = models.User.objects.create_user(
+                "rat",
+                "rat@rat.com",
+                "ratword",
+                local=False,
+                remote_id="https://example.com/users/rat",
+                inbox="https://example.com/users/rat/inbox",
+                outbox="https://example.com/users/rat/outbox",
+            )
+
+    def test_key_ids(self, *_):
+        """redis key generation"""
+        self.assertEqual(audience_index.followers_id(1), "1-audience-followers")
+        self.assertEqual(audience_index.blocks_id(1), "1-audience-blocks")
+
+    def test_get_audience_public(self, *_):
+        """everyone who isn't blocked"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        with patch("bookwyrm.audience_index.r") as redis_mock:
+            redis_mock.pipeline.return_value.execute.return_value = [
+                {b"1", b"2", b"3"},
+                {b"2"},
+            ]
+            audience = audience_index.get_audience(status)
+        self.assertEqual(audience, {1, 3})
+
+    def test_get_audience_followers(self, *_):
+        """only followers who aren't blocked"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="followers"
+        )
+        with patch("bookwyrm.audience_index.r") as redis_mock:
+            redis_mock.pipeline.return_value.execute.return_value = [
+                {b"1", b"2", b"3"},
+                {b"2"},
+                {b"2", b"3", b"4"},
+            ]
+            audience = audience_index.get_audience(status)
+        self.assertEqual(audience, {3})
+        smembers = redis_mock.pipeline.return_value.smembers
+        self.assertEqual(
+            smembers.call_args_list[2][0][0],
+            f"{self.remote_user.id}-audience-followers",
+        )
+
+    def test_get_audience_direct(self, *_):
+        """only mentioned users"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="direct"
+        )
+        with patch("bookwyrm.audience_index.r") as redis_mock:
+            audience = audience_index.get_audience(status)
+        self.assertEqual(audience, set())
+        self.assertFalse(redis_mock.pipeline.called)
+
+        status = models.Comment.objects.create(
+            user=self.remote_user,
+            content="hi",
+            privacy="direct",
+            book=models.Edition.objects.create(title="test book"),
+        )
+        status.mention_users.add(self.local_user)
+        with patch("bookwyrm.audience_index.r") as redis_mock:
+            redis_mock.pipeline.return_value.execute.return_value = [
+                {str(self.local_user.id).encode(), str(self.another_user.id).encode()},
+                set(),
+            ]
+            audience = audience_index.get_audience(status)
+        self.assertEqual(audience, {self.local_user.id})
+
+    def test_add_block(self, *_):
+        """blocked users are recorded on both sides"""
+        with patch("bookwyrm.audience_index.r") as redis_mock:
+            audience_index.add_block(self.local_user, self.remote_user)
+        sadd = redis_mock.pipeline.return_value.sadd
+        # the remote user doesn't need to be recorded
+        self.assertEqual(sadd.call_count, 1)
+        self.assertEqual(
+            sadd.call_args[0],
+            (f"{self.remote_user.id}-audience-blocks", self.local_user.id),
+        )
+
+    def test_get_expected(self, *_):
+        """the database version of a user's sets"""
+        self.remote_user.followers.add(self.local_user)
+        with patch("bookwyrm.activitystreams.remove_user_statuses_task.delay"):
+            models.UserBlocks.objects.create(
+                user_subject=self.another_user, user_object=self.remote_user
+            )
+        followers, blocks = audience_index.get_expected(self.remote_user)
+        self.assertEqual(followers, {self.local_user.id})
+        self.assertEqual(blocks, {self.another_user.id})
+
+    def test_homestream_get_audience(self, *_):
+        """the home stream only uses followers"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        with patch(
+            "bookwyrm.audience_index.settings.ENABLE_AUDIENCE_INDEX", True
+        ), patch(
+            "bookwyrm.audience_index.AudienceIndex.get_audience"
+        ) as audience_mock, patch(
+            "bookwyrm.audience_index.AudienceIndex.get_followers"
+        ) as followers_mock:
+            audience_mock.return_value = {self.local_user.id, self.another_user.id}
+            followers_mock.return_value = {self.local_user.id}
+            users = activitystreams.HomeStream().get_audience(status)
+        self.assertEqual(users, [self.local_user.id])
@@ -0,0 +1,86 @@
+""" testing the in-memory block lists """
+from unittest.mock import Mock, patch
+
+from django.test import TestCase
+
+from bookwyrm import blocklist, models
+
+
+@patch("bookwyrm.blocklist.listener.start")
+@patch("bookwyrm.blocklist.Blocklist.can_cache", return_value=True)
+class Blocklist(TestCase):
+    """don't query block lists for every request"""
+
+    def tearDown(self):
+        """don't leave the test's block lists behind"""
+        for value in list(blocklist.blocklists.values()):
+            value.invalidate()
+        blocklist.blocklists.pop("test", None)
+
+    def test_contains(self, *_):
+        """values are only loaded once"""
+        load = Mock(return_value=["1.2.3.4"])
+        test_blocklist = blocklist.Blocklist("test", load)
+
+        self.assertTrue(test_blocklist.contains("1.2.3.4"))
+        self.assertFalse(test_blocklist.contains("4.3.2.1"))
+        self.assertEqual(load.call_count, 1)
+
+    def test_contains_expired(self, *_):
+        """values are re-loaded when they're too old"""
+        load = Mock(return_value=[])
+        test_blocklist = blocklist.Blocklist("test", load)
+
+        with patch("bookwyrm.blocklist.time.monotonic", return_value=0):
+            test_blocklist.contains("1.2.3.4")
+        with patch(
+            "bookwyrm.blocklist.time.monotonic",
+            return_value=blocklist.BLOCKLIST_MAX_AGE + 1,
+        ):
+            test_blocklist.contains("1.2.3.4")
+        self.assertEqual(load.call_count, 2)
+
+    def test_contains_no_cache(self, _, start_mock):
+        """values loaded in a transaction aren't kept"""
+        load = Mock(return_value=[])
+        test_blocklist = blocklist.Blocklist("test", load)
+
+        with patch("bookwyrm.blocklist.Blocklist.can_cache", return_value=False):
+            test_blocklist.contains("1.2.3.4")
+            test_blocklist.contains("1.2.3.4")
+        self.assertEqual(load.call_count, 2)
+        self.assertFalse(start_mock.called)
+
+    def test_changed(self, *_):
+        """editing a block list re-loads it, and tells other processes"""
+        load = Mock(return_value=[])
+        test_blocklist = blocklist.Blocklist("test", load)
+        test_blocklist.contains("1.2.3.4")
+
+        with patch("bookwyrm.blocklist.r.publish") as publish_mock:
+            with self.captureOnCommitCallbacks(execute=True):
+                test_blocklist.changed()
+        publish_mock.assert_called_once_with(blocklist.BLOCKLIST_CHANNEL, "test")
+
+        test_blocklist.contains("1.2.3.4")
+        self.assertEqual(load.call_count, 2)
+
+    def test_handle_message(self, *_):
+        """another process changed a block list"""
+        load = Mock(return_value=[])
+        test_blocklist = blocklist.Blocklist("test", load)
+        test_blocklist.contains("1.2.3.4")
+
+        blocklist.listener.handle_message({"data": b"test"})
+
+        test_blocklist.contains("1.2.3.4")
+        self.assertEqual(load.call_count, 2)
+
+    def test_blocked_addresses(self, *_):
+        """blocking an address takes effect right away"""
+        self.assertFalse(blocklist.blocked_addresses.contains("1.2.3.4"))
+
+        with patch("bookwyrm.blocklist.r.publish"):
+            models.IPBlocklist.objects.create(address="1.2.3.4")
+
+        self.assertTrue(blocklist.blocked_addresses.contains("1.2.3.4"))
@@ -118,6 +118,18 @@ class BookSearch(TestCase):
         results = book_search.search_title_author("Edition", 0)
         self.assertEqual(results, [self.first_edition])  # highest edition rank
 
+    def test_search_title_author_one_query(self):
+        """the best edition of each work is found in a single query"""
+        other_work = models.Work.objects.create(title="Other Work")
+        other_edition = models.Edition.objects.create(
+            title="Other Edition", parent_work=other_work
+        )
+        with self.assertNumQueries(1):
+            results = book_search.search_title_author("Edition", 0)
+        self.assertEqual(len(results), 2)
+        self.assertIn(self.first_edition, results)
+        self.assertIn(other_edition, results)
+
     def test_format_search_result(self):
         """format a search result"""
         result = book_search.format_search_result(self.first_edition)
@@ -0,0 +1,108 @@
+""" testing the public key cache for incoming signatures """
+from unittest.mock import patch
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+
+from bookwyrm import key_cache, models
+
+
+class KeyCache(TestCase):
+    """don't look up keys for every request"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need a remote user"""
+        with patch("bookwyrm.models.user.set_remote_server.delay"):
+            self.remote_user = models.User.objects.create_user(
+                "rat",
+                "rat@rat.com",
+                "ratword",
+                local=False,
+                remote_id="https://example.com/users/rat",
+                inbox="https://example.com/users/rat/inbox",
+                outbox="https://example.com/users/rat/outbox",
+            )
+            self.remote_user.key_pair = models.KeyPair.objects.create(
+                remote_id="https://example.com/users/rat/#main-key",
+                public_key="-----BEGIN PUBLIC KEY-----",
+            )
+            self.remote_user.save(broadcast=False, update_fields=["key_pair"])
+        self.key_id = self.remote_user.key_pair.remote_id
+
+    def setUp(self):
+        """start with an empty cache"""
+        patcher = patch("bookwyrm.key_cache.cache", LocMemCache("key-cache", {}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        key_cache.cache.clear()
+
+    def test_get_public_key(self):
+        """the key is looked up once"""
+        with patch(
+            "bookwyrm.key_cache.activitypub.resolve_remote_id",
+            return_value=self.remote_user,
+        ) as resolve_mock:
+            result = key_cache.get_public_key(self.key_id, self.remote_user.remote_id)
+            self.assertEqual(result, self.remote_user.key_pair.public_key)
+            result = key_cache.get_public_key(self.key_id, self.remote_user.remote_id)
+            self.assertEqual(result, self.remote_user.key_pair.public_key)
+        self.assertEqual(resolve_mock.call_count, 1)
+
+    def test_get_public_key_legacy(self):
+        """older bookwyrm instances sign with a different keyId"""
+        with patch(
+            "bookwyrm.key_cache.activitypub.resolve_remote_id",
+            return_value=self.remote_user,
+        ):
+            result = key_cache.get_public_key(
+                f"{self.remote_user.remote_id}#main-key",
+                self.remote_user.remote_id,
+            )
+        self.assertEqual(result, self.remote_user.key_pair.public_key)
+
+    def test_get_public_key_wrong_actor(self):
+        """a key can't be used to sign for someone else"""
+        with patch(
+            "bookwyrm.key_cache.activitypub.resolve_remote_id",
+            return_value=self.remote_user,
+        ):
+            key_cache.get_public_key(self.key_id, self.remote_user.remote_id)
+            with self.assertRaises(ValueError):
+                key_cache.get_public_key(self.key_id, "https://example.com/users/cat")
+            with self.assertRaises(ValueError):
+                key_cache.get_public_key(
+                    "https://example.com/users/cat/#main-key",
+                    self.remote_user.remote_id,
+                )
+
+    def test_get_public_key_unknown_actor(self):
+        """actors that can't be found aren't looked for over and over"""
+        with patch(
+            "bookwyrm.key_cache.activitypub.resolve_remote_id", return_value=None
+        ) as resolve_mock:
+            self.assertIsNone(
+                key_cache.get_public_key(self.key_id, self.remote_user.remote_id)
+            )
+            self.assertIsNone(
+                key_cache.get_public_key(self.key_id, self.remote_user.remote_id)
+            )
+        self.assertEqual(resolve_mock.call_count, 1)
+
+    def test_refresh_public_key(self):
+        """keys are refreshed in the background, and not too often"""
+        with patch("bookwyrm.key_cache.refresh_public_key_task.delay") as mock:
+            key_cache.refresh_public_key(self.remote_user.remote_id)
+            key_cache.refresh_public_key(self.remote_user.remote_id)
+        mock.assert_called_once_with(self.remote_user.remote_id)
+
+    def test_invalidate_public_key(self):
+        """saving a key pair clears it from the cache"""
+        with patch(
+            "bookwyrm.key_cache.activitypub.resolve_remote_id",
+            return_value=self.remote_user,
+        ) as resolve_mock:
+            key_cache.get_public_key(self.key_id, self.remote_user.remote_id)
+            self.remote_user.key_pair.save()
+            key_cache.get_public_key(self.key_id, self.remote_user.remote_id)
+        self.assertEqual(resolve_mock.call_count, 2)
@@ -0,0 +1,123 @@
+""" testing the books featured on the landing and about pages """
+import time
+from unittest.mock import patch
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+
+from bookwyrm import landing_data, models
+from bookwyrm.templatetags import landing_page_tags
+
+
+@patch("bookwyrm.landing_data.cache", LocMemCache("landing-data", {}))
+@patch("bookwyrm.activitystreams.add_status_task.delay")
+@patch("bookwyrm.models.activitypub_mixin.broadcast_task.apply_async")
+class LandingData(TestCase):
+    """the landing page is worked out ahead of time"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need a user and some books"""
+        with patch("bookwyrm.suggested_users.rerank_suggestions_task.delay"), patch(
+            "bookwyrm.activitystreams.populate_stream_task.delay"
+        ), patch("bookwyrm.lists_stream.populate_lists_task.delay"):
+            self.local_user = models.User.objects.create_user(
+                "mouse@example.com",
+                "mouse@mouse.mouse",
+                "mouseword",
+                local=True,
+                localname="mouse",
+            )
+        self.work = models.Work.objects.create(title="Good work")
+        self.book = models.Edition.objects.create(
+            title="Good book", parent_work=self.work, cover="covers/good.jpg"
+        )
+        self.other_work = models.Work.objects.create(title="Other work")
+        self.other_book = models.Edition.objects.create(
+            title="Other book", parent_work=self.other_work, cover="covers/other.jpg"
+        )
+
+    def setUp(self):
+        """start with nothing stored"""
+        landing_data.cache.clear()
+
+    def test_get_superlatives(self, *_):
+        """the most liked and most divisive works"""
+        with patch("bookwyrm.activitystreams.remove_status_task.delay"):
+            models.ReviewRating.objects.create(
+                user=self.local_user, book=self.book, rating=5
+            )
+            models.ReviewRating.objects.create(
+                user=self.local_user, book=self.other_book, rating=1
+            )
+            models.ReviewRating.objects.create(
+                user=self.local_user, book=self.other_book, rating=5
+            )
+
+        result = landing_data.get_superlatives()
+        self.assertEqual(result["top_rated"], (self.work.id, 5))
+        self.assertEqual(result["controversial"], self.other_work.id)
+        self.assertIsNone(result["wanted"])
+
+    def test_get_landing_book_ids(self, *_):
+        """recently reviewed books, once each"""
+        with patch("bookwyrm.activitystreams.remove_status_task.delay"):
+            models.Review.objects.create(
+                user=self.local_user, book=self.book, name="first"
+            )
+            models.Review.objects.create(
+                user=self.local_user, book=self.other_book, name="second"
+            )
+            models.Review.objects.create(
+                user=self.local_user, book=self.other_book, name="third"
+            )
+
+        self.assertEqual(
+            landing_data.get_landing_book_ids(), [self.other_book.id, self.book.id]
+        )
+
+    def test_get_landing_data(self, *_):
+        """the data is only calculated when it's missing or stale"""
+        with patch(
+            "bookwyrm.landing_data.calculate_landing_data",
+            return_value={"updated": time.time()},
+        ) as calculate_mock, patch(
+            "bookwyrm.landing_data.update_landing_data_task.delay"
+        ) as task_mock:
+            landing_data.get_landing_data()
+            landing_data.get_landing_data()
+        self.assertEqual(calculate_mock.call_count, 1)
+        self.assertFalse(task_mock.called)
+
+    def test_get_landing_data_stale(self, *_):
+        """out of date data is still shown, but refreshed in the background"""
+        stale = {"updated": time.time() - landing_data.LANDING_DATA_MAX_AGE - 1}
+        landing_data.cache.set(landing_data.LANDING_DATA_KEY, stale)
+        with patch("bookwyrm.landing_data.update_landing_data_task.delay") as task_mock:
+            self.assertEqual(landing_data.get_landing_data(), stale)
+            self.assertEqual(landing_data.get_landing_data(), stale)
+        task_mock.assert_called_once_with()
+
+    def test_landing_page_tags(self, *_):
+        """the template tags load the stored works and books"""
+        landing_data.cache.set(
+            landing_data.LANDING_DATA_KEY,
+            {
+                "superlatives": {
+                    "top_rated": (self.work.id, 4.5),
+                    "controversial": None,
+                    "wanted": self.other_work.id,
+                },
+                "landing_books": [self.other_book.id, self.book.id],
+                "updated": time.time(),
+            },
+        )
+        superlatives = landing_page_tags.get_book_superlatives()
+        self.assertEqual(superlatives["top_rated"], self.work)
+        self.assertEqual(superlatives["top_rated"].rating, 4.5)
+        self.assertIsNone(superlatives["controversial"])
+        self.assertEqual(superlatives["wanted"], self.other_work)
+
+        self.assertEqual(
+            landing_page_tags.get_landing_books(), [self.other_book, self.book]
+        )
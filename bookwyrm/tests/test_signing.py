@@ -1,5 +1,6 @@
 """ getting and verifying signatures """
 import time
+from base64 import b64decode
 from collections import namedtuple
 from urllib.parse import urlsplit
 import pathlib
@@ -10,13 +11,19 @@ import responses
 
 import pytest
 
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15  # pylint: disable=no-name-in-module
+
 from django.test import TestCase, Client
 from django.utils.http import http_date
 
 from bookwyrm import models
 from bookwyrm.activitypub import Follow
+from bookwyrm.key_cache import refresh_public_key_task
 from bookwyrm.settings import DOMAIN
 from bookwyrm.signatures import create_key_pair, make_signature, make_digest
+from bookwyrm.signatures import SignerCache
 
 
 def get_follow_activity(follower, followee):
@@ -170,7 +177,16 @@ class Signature(TestCase):
             self.assertEqual(response.status_code, 200)
             self.assertTrue(accept_mock.called)
 
-            # Try with new key:
+            # Try with new key, which is fetched in the background:
+            with patch(
+                "bookwyrm.key_cache.refresh_public_key_task.delay"
+            ) as refresh_mock:
+                response = self.send_test_request(sender=new_sender)
+            self.assertEqual(response.status_code, 401)
+            refresh_mock.assert_called_once_with(self.fake_remote.remote_id)
+            refresh_public_key_task(self.fake_remote.remote_id)
+
+            # and works once the sender tries again:
             with patch(
                 "bookwyrm.models.relationship.UserFollowRequest.accept"
             ) as accept_mock:
@@ -179,7 +195,8 @@ class Signature(TestCase):
             self.assertTrue(accept_mock.called)
 
             # Now the old key will fail:
-            response = self.send_test_request(sender=self.fake_remote)
+            with patch("bookwyrm.key_cache.refresh_public_key_task.delay"):
+                response = self.send_test_request(sender=self.fake_remote)
             self.assertEqual(response.status_code, 401)
 
     @responses.activate
@@ -221,3 +238,52 @@ class Signature(TestCase):
                 self.mouse, date=http_date(time.time() - 301)
             )
             self.assertEqual(response.status_code, 401)
+
+
+class SignerCacheTest(TestCase):
+    """don't parse the same private key over and over"""
+
+    def setUp(self):
+        """a couple of keys"""
+        self.key, _ = create_key_pair()
+        self.other_key, _ = create_key_pair()
+
+    def test_get(self):
+        """keys are only imported once"""
+        cache = SignerCache()
+        with patch(
+            "bookwyrm.signatures.RSA.import_key", wraps=RSA.import_key
+        ) as import_mock:
+            signer = cache.get(self.key)
+            self.assertIs(cache.get(self.key), signer)
+            self.assertIsNot(cache.get(self.other_key), signer)
+        self.assertEqual(import_mock.call_count, 2)
+
+    def test_get_evicts(self):
+        """the least recently used key is dropped"""
+        cache = SignerCache(maxsize=1)
+        signer = cache.get(self.key)
+        cache.get(self.other_key)
+        self.assertEqual(len(cache.signers), 1)
+        self.assertIsNot(cache.get(self.key), signer)
+
+    def test_forget(self):
+        """a replaced key is dropped"""
+        cache = SignerCache()
+        signer = cache.get(self.key)
+        cache.forget(self.key)
+        self.assertIsNot(cache.get(self.key), signer)
+
+    def test_make_signature(self):
+        """signatures made with a cached key still verify"""
+        sender = Sender("https://example.com/user/mouse", KeyPair(self.key, ""))
+        now = http_date()
+        signature = make_signature("post", sender, "https://example.com/inbox", now)
+        signed = dict(pair.split("=", 1) for pair in signature.split(","))
+        message = f"(request-target): post /inbox\nhost: example.com\ndate: {now}"
+
+        # raises a ValueError if it doesn't match
+        pkcs1_15.new(RSA.import_key(self.key).public_key()).verify(
+            SHA256.new(message.encode("utf8")),
+            b64decode(signed["signature"].strip('"')),
+        )
@@ -0,0 +1,161 @@
+""" testing the display-ready status cache """
+import pickle
+from unittest.mock import patch
+
+from django.core.paginator import Paginator
+from django.test import TestCase
+from django.utils import timezone
+
+from bookwyrm import models, status_cache
+
+
+@patch("bookwyrm.models.activitypub_mixin.broadcast_task.apply_async")
+@patch("bookwyrm.activitystreams.add_status_task.delay")
+@patch("bookwyrm.activitystreams.add_book_statuses_task.delay")
+@patch("bookwyrm.suggested_users.rerank_suggestions_task.delay")
+@patch("bookwyrm.activitystreams.populate_stream_task.delay")
+class StatusCache(TestCase):
+    """loading statuses without querying for them"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need some statuses"""
+        with patch("bookwyrm.suggested_users.rerank_suggestions_task.delay"), patch(
+            "bookwyrm.activitystreams.populate_stream_task.delay"
+        ), patch("bookwyrm.lists_stream.populate_lists_task.delay"):
+            self.local_user = models.User.objects.create_user(
+                "mouse", "mouse@mouse.mouse", "password", local=True, localname="mouse"
+            )
+        with patch("bookwyrm.models.user.set_remote_server.delay"):
+            self.remote_user = models.User.objects.create_user(
+                "rat",
+                "rat@rat.com",
+                "ratword",
+                local=False,
+                remote_id="https://example.com/users/rat",
+                inbox="https://example.com/users/rat/inbox",
+                outbox="https://example.com/users/rat/outbox",
+            )
+        work = models.Work.objects.create(title="test work")
+        self.book = models.Edition.objects.create(title="test book", parent_work=work)
+
+    def test_get_hydrated_statuses(self, *_):
+        """cached statuses aren't queried"""
+        cached = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        status = models.Comment.objects.create(
+            user=self.remote_user, content="hi", privacy="public", book=self.book
+        )
+        cached_data = status_cache.serialize_status(
+            status_cache.hydrate_statuses([cached.id]).get()
+        )
+        with patch("bookwyrm.status_cache.cache") as cache_mock:
+            cache_mock.get_many.return_value = {
+                f"hydrated-status-{cached.id}": cached_data
+            }
+            versions = [
+                (cached.id, cached.updated_date),
+                (status.id, status.updated_date),
+            ]
+            # one query for the status, and one each for prefetched mentions
+            with self.assertNumQueries(3):
+                result = status_cache.get_hydrated_statuses(versions)
+        self.assertEqual(result, {cached.id: cached, status.id: status})
+        self.assertIsInstance(result[status.id], models.Comment)
+        self.assertEqual(
+            list(cache_mock.get_many.call_args[0][0]),
+            [f"hydrated-status-{cached.id}", f"hydrated-status-{status.id}"],
+        )
+        self.assertEqual(
+            list(cache_mock.set_many.call_args[0][0].keys()),
+            [f"hydrated-status-{status.id}"],
+        )
+
+    def test_serialize_status(self, *_):
+        """statuses survive the trip through the cache"""
+        parent = models.Status.objects.create(
+            user=self.local_user, content="hello", privacy="public"
+        )
+        status = models.Comment.objects.create(
+            user=self.remote_user,
+            content="hi",
+            privacy="public",
+            book=self.book,
+            reply_parent=parent,
+        )
+        status.mention_users.add(self.local_user)
+        status.mention_books.add(self.book)
+        hydrated = status_cache.hydrate_statuses([status.id]).get()
+
+        data = pickle.loads(pickle.dumps(status_cache.serialize_status(hydrated)))
+        with self.assertNumQueries(0):
+            result = status_cache.deserialize_status(data)
+            self.assertIsInstance(result, models.Comment)
+            self.assertEqual(result.id, status.id)
+            self.assertEqual(result.content, "hi")
+            self.assertEqual(result.published_date, status.published_date)
+            self.assertEqual(result.book, self.book)
+            self.assertEqual(result.book.title, "test book")
+            self.assertEqual(result.user.username, self.remote_user.username)
+            self.assertEqual(result.reply_parent, parent)
+            self.assertEqual(list(result.mention_users.all()), [self.local_user])
+            self.assertEqual(list(result.mention_books.all()), [self.book])
+        # only what's needed to show the user is cached
+        self.assertIn("password", result.user.get_deferred_fields())
+        self.assertNotIn("mouse@mouse.mouse", str(data))
+
+    def test_get_hydrated_statuses_stale(self, *_):
+        """a status that changed without being invalidated is loaded again"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        cached_data = status_cache.serialize_status(
+            status_cache.hydrate_statuses([status.id]).get()
+        )
+        models.Status.objects.filter(id=status.id).update(
+            content="hello", updated_date=timezone.now()
+        )
+        with patch("bookwyrm.status_cache.cache") as cache_mock:
+            cache_mock.get_many.return_value = {
+                f"hydrated-status-{status.id}": cached_data
+            }
+            result = status_cache.get_hydrated_statuses(
+                status_cache.get_status_versions(
+                    models.Status.objects.filter(id=status.id)
+                )
+            )
+        self.assertEqual(result[status.id].content, "hello")
+        self.assertEqual(
+            list(cache_mock.set_many.call_args[0][0].keys()),
+            [f"hydrated-status-{status.id}"],
+        )
+
+    def test_hydrate_page(self, *_):
+        """a page of versions becomes a page of statuses"""
+        first = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        second = models.Comment.objects.create(
+            user=self.remote_user, content="hi", privacy="public", book=self.book
+        )
+        page = Paginator(
+            status_cache.get_status_versions(models.Status.objects.order_by("-id")), 1
+        ).get_page(2)
+        with patch("bookwyrm.status_cache.cache") as cache_mock:
+            cache_mock.get_many.return_value = {}
+            result = status_cache.hydrate_page(page)
+        self.assertEqual(list(result), [first])
+        self.assertTrue(result.has_previous())
+        self.assertFalse(result.has_next())
+        self.assertNotIn(second, list(result))
+
+    def test_invalidate_on_save(self, *_):
+        """saving a status clears it from the cache"""
+        status = models.Status.objects.create(
+            user=self.remote_user, content="hi", privacy="public"
+        )
+        with patch("bookwyrm.status_cache.cache.delete") as mock:
+            status.content = "hello"
+            status.save()
+        mock.assert_called_with(f"hydrated-status-{status.id}")
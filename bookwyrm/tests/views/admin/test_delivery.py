@@ -0,0 +1,86 @@
+""" test for app action functionality """
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group
+from django.template.response import TemplateResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django_celery_beat.models import PeriodicTask
+
+from bookwyrm import models, views
+from bookwyrm.management.commands import initdb
+from bookwyrm.tests.validate_html import validate_html
+
+
+class DeliveryViews(TestCase):
+    """every response to a get request, html or json"""
+
+    @classmethod
+    def setUpTestData(self):  # pylint: disable=bad-classmethod-argument
+        """we need basic test data and mocks"""
+        with patch("bookwyrm.suggested_users.rerank_suggestions_task.delay"), patch(
+            "bookwyrm.activitystreams.populate_stream_task.delay"
+        ), patch("bookwyrm.lists_stream.populate_lists_task.delay"):
+            self.local_user = models.User.objects.create_user(
+                "mouse@local.com",
+                "mouse@mouse.mouse",
+                "password",
+                local=True,
+                localname="mouse",
+            )
+        initdb.init_groups()
+        initdb.init_permissions()
+        group = Group.objects.get(name="admin")
+        self.local_user.groups.set([group])
+        models.SiteSettings.objects.create()
+
+    def setUp(self):
+        """individual test setup"""
+        self.factory = RequestFactory()
+
+    def test_deliveries_get(self):
+        """there are so many views, this just makes sure it LOADS"""
+        server = models.FederatedServer.objects.create(
+            server_name="down.example",
+            delivery_attempts=4,
+            delivery_errors=3,
+            consecutive_delivery_errors=3,
+        )
+        models.Delivery.objects.create(
+            sender=self.local_user,
+            destination="https://down.example/inbox",
+            server=server,
+            activity="{}",
+        )
+        models.FederatedServer.objects.create(server_name="up.example")
+        view = views.Deliveries.as_view()
+        request = self.factory.get("")
+        request.user = self.local_user
+
+        result = view(request)
+        self.assertIsInstance(result, TemplateResponse)
+        validate_html(result.render())
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.context_data["pending_count"], 1)
+        self.assertEqual(list(result.context_data["servers"]), [server])
+
+    def test_deliveries_schedule(self):
+        """schedule the retry task"""
+        view = views.Deliveries.as_view()
+        request = self.factory.post("", {"every": 5, "period": "minutes"})
+        request.user = self.local_user
+
+        result = view(request)
+        self.assertEqual(result.status_code, 302)
+        task = PeriodicTask.objects.get(name="retry-deliveries")
+        self.assertEqual(task.task, "bookwyrm.models.delivery.retry_deliveries_task")
+        task = PeriodicTask.objects.get(name="prune-deliveries")
+        self.assertEqual(task.task, "bookwyrm.models.delivery.prune_deliveries_task")
+        self.assertEqual(task.interval.every, 1)
+        self.assertEqual(task.interval.period, "days")
+
+        request = self.factory.get("")
+        request.user = self.local_user
+        result = views.Deliveries.as_view()(request)
+        validate_html(result.render())
+        self.assertIsNotNone(result.context_data["prune_task"])
@@ -3,6 +3,7 @@ import json
 import pathlib
 from unittest.mock import patch
 
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.exceptions import PermissionDenied
 from django.http import HttpResponseNotAllowed, HttpResponseNotFound
 from django.test import TestCase, Client
@@ -128,6 +129,84 @@ class Inbox(TestCase):
                 )
         self.assertEqual(result.status_code, 200)
 
+    def test_inbox_duplicate(self):
+        """the same activity arriving twice is only handled once"""
+        cache = LocMemCache("inbox", {})
+        activity = {
+            "id": "https://example.com/users/rat/follows/1",
+            "type": "Follow",
+            "actor": "https://example.com/users/rat",
+            "object": "https://example.com/user/mouse",
+        }
+        with patch("bookwyrm.views.inbox.cache", cache), patch(
+            "bookwyrm.views.inbox.has_valid_signature", return_value=True
+        ), patch("bookwyrm.views.inbox.sometimes_async_activity_task") as task_mock:
+            for _ in range(2):
+                result = self.client.post(
+                    "/inbox", json.dumps(activity), content_type="application/json"
+                )
+                self.assertEqual(result.status_code, 200)
+            self.assertEqual(task_mock.call_count, 1)
+            self.assertEqual(
+                views.inbox.get_activity_counts(),
+                {"Follow": {"received": 1, "duplicate": 1}},
+            )
+
+    def test_inbox_failed_not_seen(self):
+        """an activity that fails can be sent again"""
+        cache = LocMemCache("inbox", {})
+        activity = {
+            "id": "https://example.com/users/rat/follows/1",
+            "type": "Follow",
+            "actor": "https://example.com/users/rat",
+            "object": "https://example.com/user/mouse",
+        }
+        with patch("bookwyrm.views.inbox.cache", cache), patch(
+            "bookwyrm.views.inbox.has_valid_signature", return_value=True
+        ), patch(
+            "bookwyrm.views.inbox.sometimes_async_activity_task",
+            side_effect=ValueError,
+        ):
+            with self.assertRaises(ValueError):
+                self.client.post(
+                    "/inbox", json.dumps(activity), content_type="application/json"
+                )
+            self.assertFalse(views.inbox.has_seen_activity(activity))
+
+    @patch("bookwyrm.views.inbox.settings.INBOX_BATCH_DELAY", 5)
+    def test_inbox_batch(self):
+        """activities are buffered when batching is enabled"""
+        with patch(
+            "bookwyrm.views.inbox.has_valid_signature", return_value=True
+        ), patch("bookwyrm.views.inbox.r") as redis_mock, patch(
+            "bookwyrm.views.inbox.activity_batch_task.apply_async"
+        ) as task_mock, patch(
+            "bookwyrm.views.inbox.sometimes_async_activity_task"
+        ) as sync_mock:
+            redis_mock.set.return_value = True
+            result = self.client.post(
+                "/inbox",
+                json.dumps(self.create_json),
+                content_type="application/json",
+            )
+        self.assertEqual(result.status_code, 200)
+        self.assertFalse(sync_mock.called)
+        self.assertEqual(json.loads(redis_mock.rpush.call_args[0][1]), self.create_json)
+        task_mock.assert_called_once_with(countdown=5)
+
+    def test_activity_batch_task(self):
+        """buffered activities are handled, even if one of them fails"""
+        entries = [json.dumps({"type": "Fish"}), json.dumps({"type": "Follow"})]
+        with patch("bookwyrm.views.inbox.r") as redis_mock, patch(
+            "bookwyrm.views.inbox.activitypub.parse"
+        ) as parse_mock:
+            redis_mock.pipeline.return_value.execute.return_value = [entries, True, 0]
+            parse_mock.side_effect = [ValueError, parse_mock.return_value]
+            views.inbox.activity_batch_task()
+        self.assertEqual(parse_mock.call_count, 2)
+        self.assertEqual(parse_mock.return_value.action.call_count, 1)
+        redis_mock.delete.assert_called_once_with(views.inbox.INBOX_BATCH_SCHEDULED_ID)
+
     def test_is_blocked_user_agent(self):
         """check for blocked servers"""
         request = self.factory.post(
@@ -1,7 +1,7 @@
 """ test for app action functionality """
 from unittest.mock import patch
 
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.test import TestCase
 from django.test.client import RequestFactory
 
@@ -65,12 +65,41 @@ class ExportViews(TestCase):
         request = self.factory.post("")
         request.user = self.local_user
         export = views.Export.as_view()(request)
-        self.assertIsInstance(export, HttpResponse)
+        self.assertIsInstance(export, StreamingHttpResponse)
         self.assertEqual(export.status_code, 200)
         # pylint: disable=line-too-long
         self.assertEqual(
-            export.content,
+            b"".join(export.streaming_content),
             b"title,author_text,remote_id,openlibrary_key,inventaire_id,librarything_key,goodreads_key,bnf_id,viaf,wikidata,asin,aasin,isfdb,isbn_10,isbn_13,oclc_number,start_date,finish_date,stopped_date,rating,review_name,review_cw,review_content,review_published,shelf,shelf_name,shelf_date\r\n"
             + b"Test Book,,%b,,,,,beep,,,,,,123456789X,9781234567890,,,,,,,,,,to-read,To Read,%b\r\n"
             % (self.book.remote_id.encode("utf-8"), book_date),
         )
+
+    @patch("bookwyrm.views.preferences.export.EXPORT_CHUNK_SIZE", 1)
+    def test_export_file_chunks(self, *_):
+        """every book is exported when they're loaded a few at a time"""
+        other_book = models.Edition.objects.create(
+            title="Another Book", parent_work=self.work
+        )
+        models.ShelfBook.objects.create(
+            shelf=self.local_user.shelf_set.first(),
+            user=self.local_user,
+            book=self.book,
+        )
+        with patch("bookwyrm.models.activitypub_mixin.broadcast_task.apply_async"):
+            models.Review.objects.create(
+                user=self.local_user,
+                book=other_book,
+                name="Good",
+                content="It was good",
+                rating=4,
+            )
+        request = self.factory.post("")
+        request.user = self.local_user
+        export = views.Export.as_view()(request)
+        rows = b"".join(export.streaming_content).decode("utf-8").splitlines()
+
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(rows[1].startswith("Test Book,"))
+        self.assertTrue(rows[2].startswith("Another Book,"))
+        self.assertIn(",4.00,Good,,It was good,", rows[2])
@@ -10,12 +10,12 @@ from django.template.response import TemplateResponse
 from django.test import TestCase
 from django.test.client import RequestFactory
 
-from bookwyrm import forms, models, views
+from bookwyrm import activitystreams, forms, models, views
 from bookwyrm.activitypub import ActivitypubResponse
 from bookwyrm.tests.validate_html import validate_html
 
 
-@patch("bookwyrm.activitystreams.ActivityStream.get_activity_stream")
+@patch("bookwyrm.activitystreams.ActivityStream.get_activity_stream_page")
 @patch("bookwyrm.activitystreams.add_status_task.delay")
 @patch("bookwyrm.suggested_users.rerank_suggestions_task.delay")
 @patch("bookwyrm.activitystreams.populate_stream_task.delay")
@@ -66,6 +66,33 @@ class FeedViews(TestCase):
         validate_html(result.render())
         self.assertEqual(result.status_code, 200)
 
+    @patch("bookwyrm.suggested_users.SuggestedUsers.get_suggestions")
+    def test_feed_cursor(self, _, *args):
+        """pages are loaded from the cursor in the query string"""
+        stream_mock = args[-1]
+        with patch("bookwyrm.models.activitypub_mixin.broadcast_task.apply_async"):
+            status = models.Status.objects.create(content="hi", user=self.another_user)
+        stream_mock.return_value = activitystreams.StreamPage(
+            [(status, f"1643328000.25_{status.id}")], has_next=True, has_previous=True
+        )
+        view = views.Feed.as_view()
+        request = self.factory.get("", {"before": "1643328000.5_3"})
+        request.user = self.local_user
+        result = view(request, "home")
+        self.assertIsInstance(result, TemplateResponse)
+        html = result.render()
+        validate_html(html)
+        self.assertEqual(result.status_code, 200)
+        self.assertIn(f"before=1643328000.25_{status.id}#feed".encode(), html.content)
+        self.assertIn(f"after=1643328000.25_{status.id}#feed".encode(), html.content)
+        self.assertEqual(stream_mock.call_args[1]["before"], (1643328000.5, 3))
+        self.assertIsNone(stream_mock.call_args[1]["after"])
+
+        request = self.factory.get("", {"after": "nan_3"})
+        request.user = self.local_user
+        view(request, "home")
+        self.assertIsNone(stream_mock.call_args[1]["after"])
+
     @patch("bookwyrm.suggested_users.SuggestedUsers.get_suggestions")
     def test_save_feed_settings(self, *_):
         """update display preferences"""
@@ -1,7 +1,9 @@
 """ test for app action functionality """
 from unittest.mock import patch
 from django.template.response import TemplateResponse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.test.client import RequestFactory
 
 from bookwyrm import models
@@ -278,6 +280,35 @@ class NotificationViews(TestCase):
         validate_html(result.render())
         self.assertEqual(result.status_code, 200)
 
+    def test_notifications_page_related_users(self):
+        """the users shown with each notification are loaded all at once"""
+        for notification_type in ["FAVORITE", "BOOST", "FOLLOW"]:
+            notification = models.Notification.objects.create(
+                user=self.local_user,
+                notification_type=notification_type,
+                related_status=self.status,
+            )
+            # one at a time, because add() doesn't keep the order it's given
+            notification.related_users.add(self.another_user)
+            notification.related_users.add(self.local_user)
+        view = views.Notifications.as_view()
+        request = self.factory.get("")
+        request.user = self.local_user
+        result = view(request)
+
+        for notification in result.context_data["notifications"]:
+            self.assertEqual(notification.related_user_count, 2)
+            self.assertEqual(
+                notification.related_users_preview,
+                [self.local_user, self.another_user],
+            )
+        with CaptureQueriesContext(connection) as queries:
+            validate_html(result.render())
+        # nothing about the related users is loaded one notification at a time
+        self.assertFalse(
+            [q for q in queries if "notification_related_users" in q["sql"]]
+        )
+
     def test_clear_notifications(self):
         """erase notifications"""
         models.Notification.objects.create(
@@ -293,3 +324,46 @@ class NotificationViews(TestCase):
         result = view(request)
         self.assertEqual(result.status_code, 302)
         self.assertEqual(models.Notification.objects.count(), 1)
+
+    def test_notifications_page_pagination(self):
+        """older notifications are on the next page, and stay unread until shown"""
+        with patch("bookwyrm.views.notifications.NOTIFICATIONS_PAGE_LENGTH", 2):
+            notifications = [
+                models.Notification.objects.create(
+                    user=self.local_user,
+                    notification_type="FAVORITE",
+                    related_status=self.status,
+                )
+                for _ in range(3)
+            ]
+            for notification in notifications:
+                notification.related_users.add(self.another_user)
+            view = views.Notifications.as_view()
+            request = self.factory.get("")
+            request.user = self.local_user
+            result = view(request)
+            page = result.context_data["notifications"]
+            self.assertEqual(list(page), [notifications[2], notifications[1]])
+            self.assertTrue(page.has_next)
+            self.assertFalse(page.has_previous)
+            self.assertEqual(
+                models.Notification.objects.filter(read=False).get(),
+                notifications[0],
+            )
+
+            request = self.factory.get("", {"before": page.next_cursor})
+            request.user = self.local_user
+            result = view(request)
+            validate_html(result.render())
+            page = result.context_data["notifications"]
+            self.assertEqual(list(page), [notifications[0]])
+            self.assertFalse(page.has_next)
+            self.assertTrue(page.has_previous)
+            self.assertFalse(models.Notification.objects.filter(read=False).exists())
+
+            request = self.factory.get("", {"after": page.previous_cursor})
+            request.user = self.local_user
+            result = view(request)
+            page = result.context_data["notifications"]
+            self.assertEqual(list(page), [notifications[2], notifications[1]])
+            self.assertFalse(page.has_previous)
@@ -82,7 +82,7 @@ class Views(TestCase):
         )
         mock_result = SearchResult(title="Mock Book", connector=connector, key="hello")
 
-        request = self.factory.get("", {"q": "Test Book", "remote": True})
+        request = self.factory.get("", {"q": "Test Book", "remote": True, "wait": True})
         request.user = self.local_user
         with patch("bookwyrm.views.search.is_api_request") as is_api:
             is_api.return_value = False
@@ -101,6 +101,60 @@ class Views(TestCase):
         connector_results = response.context_data["remote_results"]
         self.assertEqual(connector_results[0]["results"][0].title, "Mock Book")
 
+    def test_search_books_progressive(self):
+        """remote results are loaded by the page after it's rendered"""
+        view = views.Search.as_view()
+        connector = models.Connector.objects.create(
+            identifier="example.com",
+            connector_file="openlibrary",
+            base_url="https://example.com",
+            books_url="https://example.com/books",
+            covers_url="https://example.com/covers",
+            search_url="https://example.com/search?q=",
+        )
+
+        request = self.factory.get("", {"q": "Test Book", "remote": True})
+        request.user = self.local_user
+        with patch("bookwyrm.views.search.is_api_request") as is_api:
+            is_api.return_value = False
+            with patch("bookwyrm.connectors.connector_manager.search") as remote_search:
+                response = view(request)
+
+        self.assertFalse(remote_search.called)
+        self.assertIsInstance(response, TemplateResponse)
+        validate_html(response.render())
+        self.assertEqual(list(response.context_data["remote_connectors"]), [connector])
+
+    def test_remote_book_search(self):
+        """one connector's results"""
+        connector = models.Connector.objects.create(
+            identifier="example.com",
+            connector_file="openlibrary",
+            base_url="https://example.com",
+            books_url="https://example.com/books",
+            covers_url="https://example.com/covers",
+            search_url="https://example.com/search?q=",
+        )
+        mock_result = SearchResult(title="Mock Book", connector=connector, key="hello")
+
+        request = self.factory.get("", {"q": "Test Book"})
+        request.user = self.local_user
+        with patch("bookwyrm.connectors.connector_manager.search") as remote_search:
+            remote_search.return_value = [
+                {"results": [mock_result], "connector": connector}
+            ]
+            response = views.remote_book_search(request, connector.id)
+
+        self.assertIsInstance(response, TemplateResponse)
+        # this is a fragment of the search page, not a whole html document
+        self.assertIn("Mock Book", response.render().content.decode())
+        self.assertEqual(
+            remote_search.call_args[1]["connectors"][0].identifier, "example.com"
+        )
+        self.assertEqual(
+            response.context_data["result_set"]["results"][0].title, "Mock Book"
+        )
+
     def test_search_book_anonymous(self):
         """Don't search remote for logged out user"""
         view = views.Search.as_view()
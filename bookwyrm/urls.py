@@ -167,6 +167,11 @@ urlpatterns = [
         views.Federation.as_view(),
         name="settings-federation",
     ),
+    re_path(
+        r"^settings/deliveries/?$",
+        views.Deliveries.as_view(),
+        name="settings-deliveries",
+    ),
     re_path(
         r"^settings/federation/(?P<server>\d+)/?$",
         views.FederatedServer.as_view(),
@@ -431,6 +436,11 @@ urlpatterns = [
     # search
     re_path(r"^search.json/?$", views.Search.as_view(), name="search"),
     re_path(r"^search/?$", views.Search.as_view(), name="search"),
+    re_path(
+        r"^search/remote/(?P<connector_id>\d+)/?$",
+        views.remote_book_search,
+        name="search-remote",
+    ),
     # imports
     re_path(r"^import/?$", views.Import.as_view(), name="import"),
     re_path(r"^user-import/?$", views.UserImport.as_view(), name="user-import"),
@@ -1,7 +1,7 @@
 """manage tar files for user exports"""
 import io
 import tarfile
-from typing import Any, Optional
+from typing import Any, IO, Optional
 from uuid import uuid4
 from django.core.files import File
 
@@ -16,13 +16,25 @@ class BookwyrmTarFile(tarfile.TarFile):
         info.size = len(data)
         self.addfile(info, fileobj=buffer)
 
+    def write_file(self, fileobj: IO[bytes], filename: str = "archive.json") -> None:
+        """Add the contents of an open file to the archive"""
+        info = tarfile.TarInfo(filename)
+        info.size = fileobj.seek(0, io.SEEK_END)
+        fileobj.seek(0)
+        self.addfile(info, fileobj=fileobj)
+
     def add_image(
-        self, image: Any, filename: Optional[str] = None, directory: Any = ""
+        self,
+        image: Any,
+        filename: Optional[str] = None,
+        directory: Any = "",
+        data: Optional[bytes] = None,
     ) -> None:
         """
         Add an image to the tar archive
         :param str filename: overrides the file name set by image
         :param str directory: the directory in the archive to put the image
+        :param bytes data: the contents of the image, if it's already been read
         """
         if filename is not None:
             file_type = image.name.rsplit(".", maxsplit=1)[-1]
@@ -31,6 +43,11 @@ class BookwyrmTarFile(tarfile.TarFile):
             filename = f"{directory}{image.name}"
 
         info = tarfile.TarInfo(name=filename)
+        if data is not None:
+            info.size = len(data)
+            self.addfile(info, fileobj=io.BytesIO(data))
+            return
+
         info.size = image.size
 
         self.addfile(info, fileobj=image)
@@ -7,6 +7,7 @@ from .admin.automod import schedule_automod_task, unschedule_automod_task
 from .admin.celery_status import CeleryStatus, celery_ping
 from .admin.schedule import ScheduledTasks
 from .admin.dashboard import Dashboard
+from .admin.delivery import Deliveries
 from .admin.federation import Federation, FederatedServer
 from .admin.federation import AddFederatedServer, ImportServerBlocklist
 from .admin.federation import block_server, unblock_server, refresh_server
@@ -152,7 +153,7 @@ from .rss_feed import (
     RssQuotesOnlyFeed,
     RssCommentsOnlyFeed,
 )
-from .search import Search
+from .search import Search, remote_book_search
 from .setup import InstanceConfig, CreateAdmin
 from .status import CreateStatus, EditStatus, DeleteStatus, update_progress
 from .status import edit_readthrough
@@ -11,6 +11,9 @@ from django import forms
 import redis
 
 from celerywyrm import settings
+from bookwyrm import models
+from bookwyrm.connectors.connector_manager import get_search_cache_counts
+from bookwyrm.views.inbox import get_activity_counts
 from bookwyrm.tasks import (
     app as celery,
     LOW,
@@ -80,6 +83,11 @@ class CeleryStatus(View):
             "stats": stats,
             "active_tasks": active_tasks,
             "queues": queues,
+            "inbox_counts": get_activity_counts(),
+            "search_cache_counts": get_search_cache_counts(),
+            "connectors": models.Connector.objects.filter(active=True).order_by(
+                "priority"
+            ),
             "form": form,
             "errors": errors,
         }
@@ -0,0 +1,94 @@
+""" how are outgoing activities doing """
+from django.contrib.auth.decorators import login_required, permission_required
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Q
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views import View
+from django_celery_beat.models import PeriodicTask, IntervalSchedule
+
+from bookwyrm import forms, models
+from bookwyrm.models.delivery import DELIVERY_FAILED_RETENTION
+from bookwyrm.settings import PAGE_LENGTH
+
+
+# pylint: disable= no-self-use
+@method_decorator(login_required, name="dispatch")
+@method_decorator(
+    permission_required("bookwyrm.control_federation", raise_exception=True),
+    name="dispatch",
+)
+class Deliveries(View):
+    """activities waiting to be re-sent, and servers that aren't responding"""
+
+    def get(self, request):
+        """queue depth and server health"""
+        data = delivery_view_data(request)
+        return TemplateResponse(request, "settings/federation/deliveries.html", data)
+
+    def post(self, request):
+        """schedule the tasks that re-send deliveries and clear out old ones"""
+        form = forms.IntervalScheduleForm(request.POST)
+        if not form.is_valid():
+            data = delivery_view_data(request)
+            data["task_form"] = form
+            return TemplateResponse(
+                request, "settings/federation/deliveries.html", data
+            )
+
+        with transaction.atomic():
+            schedule, _ = IntervalSchedule.objects.get_or_create(**form.cleaned_data)
+            PeriodicTask.objects.get_or_create(
+                interval=schedule,
+                name="retry-deliveries",
+                task="bookwyrm.models.delivery.retry_deliveries_task",
+            )
+            daily, _ = IntervalSchedule.objects.get_or_create(
+                every=1, period=IntervalSchedule.DAYS
+            )
+            PeriodicTask.objects.get_or_create(
+                interval=daily,
+                name="prune-deliveries",
+                task="bookwyrm.models.delivery.prune_deliveries_task",
+            )
+        return redirect("settings-deliveries")
+
+
+def delivery_view_data(request):
+    """helper to get data for the deliveries page"""
+    now = timezone.now()
+    deliveries = models.Delivery.objects
+    servers = (
+        models.FederatedServer.objects.annotate(
+            pending_deliveries=Count("delivery", filter=Q(delivery__status="pending")),
+            failed_deliveries=Count("delivery", filter=Q(delivery__status="failed")),
+        )
+        .filter(
+            Q(consecutive_delivery_errors__gt=0)
+            | Q(pending_deliveries__gt=0)
+            | Q(failed_deliveries__gt=0)
+        )
+        .order_by("-consecutive_delivery_errors", "-pending_deliveries", "id")
+    )
+    paginated = Paginator(servers, PAGE_LENGTH)
+    page = paginated.get_page(request.GET.get("page"))
+
+    return {
+        "pending_count": deliveries.filter(status="pending").count(),
+        "due_count": deliveries.filter(status="pending", next_attempt__lte=now).count(),
+        "failed_count": deliveries.filter(status="failed").count(),
+        "unavailable_count": models.FederatedServer.objects.filter(
+            unavailable_until__gt=now
+        ).count(),
+        "servers": page,
+        "page_range": paginated.get_elided_page_range(
+            page.number, on_each_side=2, on_ends=1
+        ),
+        "task": PeriodicTask.objects.filter(name="retry-deliveries").first(),
+        "prune_task": PeriodicTask.objects.filter(name="prune-deliveries").first(),
+        "retention_days": DELIVERY_FAILED_RETENTION.days,
+        "task_form": forms.IntervalScheduleForm(),
+    }
@@ -3,7 +3,7 @@ from datetime import date
 from uuid import uuid4
 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Sum, Min, Case, When
+from django.db.models import Min, Case, When
 from django.http import Http404
 from django.shortcuts import redirect
 from django.template.response import TemplateResponse
@@ -41,16 +41,9 @@ class AnnualSummary(View):
         )
 
         # get data
-        read_book_ids_in_year = (
-            user.readthrough_set.filter(
-                finish_date__year__gte=year,
-                finish_date__year__lt=int(year) + 1,
-            )
-            .order_by("finish_date")
-            .values_list("book__id", flat=True)
-        )
+        stats = models.ReadingStats.get_for_year(user, int(year))
 
-        if len(read_book_ids_in_year) == 0:
+        if not stats.book_ids:
             data = {
                 "summary_user": user,
                 "year": year,
@@ -61,23 +54,7 @@ class AnnualSummary(View):
             }
             return TemplateResponse(request, "annual_summary/layout.html", data)
 
-        read_books_in_year = get_books_from_shelfbooks(read_book_ids_in_year)
-
-        # pages stats queries
-        page_stats = read_books_in_year.aggregate(Sum("pages"), Avg("pages"))
-        book_list_by_pages = read_books_in_year.filter(pages__gte=0).order_by("pages")
-
-        # books with no pages
-        no_page_list = read_books_in_year.filter(pages__exact=None).count()
-
-        # rating stats queries
-        ratings = (
-            models.Review.objects.filter(user=user)
-            .exclude(deleted=True)
-            .exclude(rating=None)
-            .filter(book_id__in=read_book_ids_in_year)
-        )
-        ratings_stats = ratings.aggregate(Avg("rating"))
+        read_books_in_year = get_books_from_shelfbooks(stats.book_ids)
 
         # annual goal status
         goal_status = get_goal_status(user, year)
@@ -86,23 +63,17 @@ class AnnualSummary(View):
             "summary_user": user,
             "year": year,
             "year_key": year_key,
-            "books_total": len(read_books_in_year),
+            "books_total": len(stats.book_ids),
             "books": read_books_in_year,
-            "pages_total": page_stats["pages__sum"] or 0,
-            "pages_average": round(
-                page_stats["pages__avg"] if page_stats["pages__avg"] else 0
-            ),
-            "book_pages_lowest": book_list_by_pages.first(),
-            "book_pages_highest": book_list_by_pages.last(),
-            "no_page_number": no_page_list,
-            "ratings_total": ratings.count(),
-            "rating_average": round(
-                ratings_stats["rating__avg"] if ratings_stats["rating__avg"] else 0, 2
-            ),
-            "book_rating_highest": ratings.order_by("-rating").first(),
-            "best_ratings_books_ids": [
-                review.book_id for review in ratings.filter(rating=5)
-            ],
+            "pages_total": stats.pages_total,
+            "pages_average": stats.pages_average,
+            "book_pages_lowest": stats.book_pages_lowest,
+            "book_pages_highest": stats.book_pages_highest,
+            "no_page_number": stats.no_page_count,
+            "ratings_total": stats.ratings_count,
+            "rating_average": stats.rating_average,
+            "book_rating_highest": stats.review_rating_highest,
+            "best_ratings_books_ids": stats.five_star_book_ids,
             "paginated_years": paginated_years,
             "goal_status": goal_status,
         }
@@ -3,7 +3,7 @@ from uuid import uuid4
 
 from django.contrib.auth.decorators import login_required, permission_required
 from django.core.paginator import Paginator
-from django.db.models import Avg, Q
+from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
 from django.template.response import TemplateResponse
@@ -87,7 +87,9 @@ class Book(View):
             ).select_related("user")
             if not user_statuses
             else None,
-            "rating": reviews.aggregate(Avg("rating"))["rating__avg"],
+            "rating": models.RatingAggregate.objects.filter(work=book.parent_work)
+            .values_list("average", flat=True)
+            .first(),
             "lists": lists,
             "update_error": kwargs.get("update_error", False),
         }
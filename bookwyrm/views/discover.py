@@ -7,6 +7,7 @@ from django.utils.decorators import method_decorator
 from django.views import View
 
 from bookwyrm import activitystreams
+from bookwyrm.status_cache import get_status_versions, hydrate_page
 
 
 # pylint: disable= no-self-use
@@ -28,20 +29,26 @@ class Discover(View):
             )
         )
 
+        # only the ids and edit dates are paginated, the statuses can be cached
         large_activities = Paginator(
-            activities.filter(mention_books__isnull=True)
-            # exclude statuses with no user-provided content for large panels
-            .exclude(
-                Q(Q(content="") | Q(content__isnull=True)) & Q(quotation__isnull=True),
+            get_status_versions(
+                activities.filter(mention_books__isnull=True)
+                # exclude statuses with no user-provided content for large panels
+                .exclude(
+                    Q(Q(content="") | Q(content__isnull=True))
+                    & Q(quotation__isnull=True),
+                )
             ),
             6,
         )
         small_activities = Paginator(
-            activities.filter(
-                Q(mention_books__isnull=False)
-                | Q(
-                    Q(Q(content="") | Q(content__isnull=True))
-                    & Q(quotation__isnull=True),
+            get_status_versions(
+                activities.filter(
+                    Q(mention_books__isnull=False)
+                    | Q(
+                        Q(Q(content="") | Q(content__isnull=True))
+                        & Q(quotation__isnull=True),
+                    )
                 )
             ),
             4,
@@ -49,7 +56,7 @@ class Discover(View):
 
         page = request.GET.get("page")
         data = {
-            "large_activities": large_activities.get_page(page),
-            "small_activities": small_activities.get_page(page),
+            "large_activities": hydrate_page(large_activities.get_page(page)),
+            "small_activities": hydrate_page(small_activities.get_page(page)),
         }
         return TemplateResponse(request, "discover/discover.html", data)
@@ -1,5 +1,6 @@
 """ non-interactive pages """
 from datetime import date
+import math
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
 from django.db.models import Q
@@ -42,14 +43,14 @@ class Feed(View):
         tab = [s for s in STREAMS if s["key"] == tab]
         tab = tab[0] if tab else STREAMS[0]
 
-        activities = activitystreams.streams[tab["key"]].get_activity_stream(
-            request.user
+        activities = activitystreams.streams[tab["key"]].get_activity_stream_page(
+            request.user,
+            before=get_cursor(request, "before"),
+            after=get_cursor(request, "after"),
+            queryset_filter=lambda q: filter_stream_by_status_type(
+                q, allowed_types=request.user.feed_status_types
+            ),
         )
-        filtered_activities = filter_stream_by_status_type(
-            activities,
-            allowed_types=request.user.feed_status_types,
-        )
-        paginated = Paginator(filtered_activities, PAGE_LENGTH)
 
         suggestions = suggested_users.get_suggestions(request.user)
 
@@ -58,19 +59,19 @@ class Feed(View):
             if get_annual_summary_year()
             else None
         )
-        readthroughs = (
+        has_summary_read_throughs = (
             models.ReadThrough.objects.filter(
                 user=request.user, finish_date__lte=cutoff
-            )
+            ).exists()
             if get_annual_summary_year()
-            else []
+            else False
         )
 
         data = {
             **feed_page_data(request.user),
             **{
                 "user": request.user,
-                "activities": paginated.get_page(request.GET.get("page")),
+                "activities": activities,
                 "suggested_users": suggestions,
                 "tab": tab,
                 "streams": STREAMS,
@@ -80,7 +81,7 @@ class Feed(View):
                 "path": f"/{tab['key']}",
                 "annual_summary_year": get_annual_summary_year(),
                 "has_tour": True,
-                "has_summary_read_throughs": len(readthroughs),
+                "has_summary_read_throughs": has_summary_read_throughs,
             },
         }
         return TemplateResponse(request, "feed/feed.html", data)
@@ -150,54 +151,9 @@ class Status(View):
         if redirect_local_path := maybe_redirect_local_path(request, status):
             return redirect_local_path
 
-        visible_thread = (
-            models.Status.privacy_filter(request.user)
-            .filter(thread_id=status.thread_id)
-            .values_list("id", flat=True)
-        )
-        visible_thread = list(visible_thread)
-
-        ancestors = models.Status.objects.select_subclasses().raw(
-            """
-            WITH RECURSIVE get_thread(depth, id, path) AS (
-
-                SELECT 1, st.id, ARRAY[st.id]
-                FROM bookwyrm_status st
-                WHERE id = '%s' AND id = ANY(%s)
-
-                UNION
-
-                SELECT (gt.depth + 1), st.reply_parent_id, path || st.id
-                FROM get_thread gt, bookwyrm_status st
-
-                WHERE st.id = gt.id AND depth < 5 AND st.id = ANY(%s)
-
-            )
-
-            SELECT * FROM get_thread ORDER BY path DESC;
-        """,
-            params=[status.reply_parent_id or 0, visible_thread, visible_thread],
-        )
-        children = models.Status.objects.select_subclasses().raw(
-            """
-            WITH RECURSIVE get_thread(depth, id, path) AS (
-
-                SELECT 1, st.id, ARRAY[st.id]
-                FROM bookwyrm_status st
-                WHERE reply_parent_id = '%s' AND id = ANY(%s)
-
-                UNION
-
-                SELECT (gt.depth + 1), st.id, path || st.id
-                FROM get_thread gt, bookwyrm_status st
-
-                WHERE st.reply_parent_id = gt.id AND depth < 5 AND st.id = ANY(%s)
-
-            )
-
-            SELECT * FROM get_thread ORDER BY path;
-        """,
-            params=[status.id, visible_thread, visible_thread],
+        ancestors = status.get_ancestors(request.user)
+        replies, children = status.get_replies_page(
+            request.user, request.GET.get("page")
         )
 
         data = {
@@ -205,6 +161,7 @@ class Status(View):
             **{
                 "status": status,
                 "children": children,
+                "replies": replies,
                 "ancestors": ancestors,
                 "title": status.page_title,
                 "description": status.page_description,
@@ -281,3 +238,14 @@ def get_suggested_books(user, max_books=5):
         suggested_books.append(shelf_preview)
         book_count += len(shelf_preview["books"])
     return suggested_books
+
+
+def get_cursor(request, key):
+    """the rank and status id from a cursor in the query string, if there's a
+    valid one"""
+    try:
+        rank, status_id = request.GET.get(key).split("_")
+        cursor = (float(rank), int(status_id))
+    except (AttributeError, ValueError):
+        return None
+    return cursor if math.isfinite(cursor[0]) else None
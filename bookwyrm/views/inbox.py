@@ -1,10 +1,12 @@
 """ incoming activities """
+import hashlib
 import json
 import re
 import logging
 
 import requests
 
+from django.core.cache import cache
 from django.http import HttpResponse, Http404
 from django.core.exceptions import BadRequest, PermissionDenied
 from django.shortcuts import get_object_or_404
@@ -12,13 +14,25 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
-from bookwyrm import activitypub, models
+from bookwyrm import activitypub, models, settings
+from bookwyrm.key_cache import get_public_key, refresh_public_key
+from bookwyrm.redis_store import r
 from bookwyrm.tasks import app, INBOX
 from bookwyrm.signatures import Signature
 from bookwyrm.utils import regex
 
 logger = logging.getLogger(__name__)
 
+# how long to remember activities, so that the same one arriving through
+# several shared inboxes is only handled once
+SEEN_ACTIVITY_TIMEOUT = 60 * 60 * 24
+# the most activities a single batch task will handle
+INBOX_BATCH_SIZE = 100
+# how long to wait for a scheduled batch task before allowing another to be queued
+INBOX_BATCH_SCHEDULE_TIMEOUT = 300
+INBOX_BATCH_ID = "inbox-batch"
+INBOX_BATCH_SCHEDULED_ID = "inbox-batch-scheduled"
+
 
 @method_decorator(csrf_exempt, name="dispatch")
 # pylint: disable=no-self-use
@@ -40,6 +54,11 @@ class Inbox(View):
         except json.decoder.JSONDecodeError:
             raise BadRequest()
 
+        # we've already got this one from another inbox
+        if has_seen_activity(activity_json):
+            count_activity(activity_json.get("type"), "duplicate")
+            return HttpResponse()
+
         # let's be extra sure we didn't block this domain
         raise_is_blocked_activity(activity_json)
 
@@ -59,7 +78,23 @@ class Inbox(View):
                 return HttpResponse()
             return HttpResponse(status=401)
 
-        sometimes_async_activity_task(activity_json)
+        # only mark signed activities as seen, so they can't be pre-empted.
+        # this also catches a duplicate that arrived while this one was checked
+        if not mark_activity_seen(activity_json):
+            count_activity(activity_json["type"], "duplicate")
+            return HttpResponse()
+        count_activity(activity_json["type"], "received")
+
+        if settings.INBOX_BATCH_DELAY:
+            queue_activity_for_batch(activity_json)
+            return HttpResponse()
+
+        try:
+            sometimes_async_activity_task(activity_json)
+        except Exception:
+            # let the sender try again
+            forget_activity(activity_json)
+            raise
         return HttpResponse()
 
 
@@ -97,6 +132,70 @@ def raise_is_blocked_activity(activity_json):
         raise PermissionDenied()
 
 
+def seen_activity_key(activity_json):
+    """the cache key for an activity that has been received, if it has an id"""
+    activity_id = activity_json.get("id")
+    if not activity_id or not isinstance(activity_id, str):
+        return None
+    return f"inbox-seen-{hashlib.sha256(activity_id.encode('utf8')).hexdigest()}"
+
+
+def has_seen_activity(activity_json):
+    """has this activity already been received"""
+    key = seen_activity_key(activity_json)
+    return bool(key and cache.get(key))
+
+
+def mark_activity_seen(activity_json):
+    """remember an activity, returns False if it was already received"""
+    key = seen_activity_key(activity_json)
+    if not key:
+        return True
+    return cache.add(key, True, timeout=SEEN_ACTIVITY_TIMEOUT)
+
+
+def forget_activity(activity_json):
+    """an activity that wasn't handled, and should be accepted again"""
+    key = seen_activity_key(activity_json)
+    if key:
+        cache.delete(key)
+
+
+def activity_count_key(activity_type, outcome):
+    """the cache key for how many activities of a type have been received"""
+    return f"inbox-{outcome}-{activity_type}"
+
+
+def count_activity(activity_type, outcome):
+    """keep track of how many activities of each type come in"""
+    if activity_type not in activitypub.activity_objects:
+        return
+    key = activity_count_key(activity_type, outcome)
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # the key expired in the meantime, so this one doesn't get counted
+        pass
+
+
+def get_activity_counts():
+    """received and duplicate activities for each type, in order of popularity"""
+    keys = {
+        activity_count_key(activity_type, outcome): (activity_type, outcome)
+        for activity_type in activitypub.activity_objects
+        for outcome in ("received", "duplicate")
+    }
+    counts = {}
+    for key, count in cache.get_many(keys).items():
+        activity_type, outcome = keys[key]
+        counts.setdefault(activity_type, {"received": 0, "duplicate": 0})
+        counts[activity_type][outcome] = count
+    return dict(
+        sorted(counts.items(), key=lambda item: item[1]["received"], reverse=True)
+    )
+
+
 def sometimes_async_activity_task(activity_json):
     """Sometimes we can effectively respond to a request without queuing a new task,
     and whenever that is possible, we should do it."""
@@ -121,32 +220,57 @@ def activity_task(activity_json):
     activity.action()
 
 
+def queue_activity_for_batch(activity_json):
+    """buffer an activity to be handled along with its neighbors"""
+    r.rpush(INBOX_BATCH_ID, json.dumps(activity_json))
+    schedule_activity_batch(settings.INBOX_BATCH_DELAY)
+
+
+def schedule_activity_batch(countdown):
+    """make sure there's a task on its way to process the buffer"""
+    # the expiry means a lost task can't stall the buffer indefinitely
+    expiry = countdown + INBOX_BATCH_SCHEDULE_TIMEOUT
+    if r.set(INBOX_BATCH_SCHEDULED_ID, 1, nx=True, ex=expiry):
+        activity_batch_task.apply_async(countdown=countdown)
+
+
+@app.task(queue=INBOX)
+def activity_batch_task():
+    """handle the buffered activities"""
+    # clear the flag first so anything queued from now on gets its own task
+    r.delete(INBOX_BATCH_SCHEDULED_ID)
+    pipeline = r.pipeline()
+    pipeline.lrange(INBOX_BATCH_ID, 0, INBOX_BATCH_SIZE - 1)
+    pipeline.ltrim(INBOX_BATCH_ID, INBOX_BATCH_SIZE, -1)
+    pipeline.llen(INBOX_BATCH_ID)
+    entries, _, remaining = pipeline.execute()
+    if remaining:
+        schedule_activity_batch(0)
+
+    for entry in entries:
+        try:
+            activitypub.parse(json.loads(entry)).action()
+        # one bad activity shouldn't hold up the rest of the batch
+        # pylint: disable=broad-except
+        except Exception as err:
+            logger.exception(err)
+
+
 def has_valid_signature(request, activity):
     """verify incoming signature"""
     try:
         signature = Signature.parse(request)
-        remote_user = activitypub.resolve_remote_id(
-            activity.get("actor"), model=models.User
-        )
-        if not remote_user:
+        public_key = get_public_key(signature.key_id, activity.get("actor"))
+        if not public_key:
             return False
 
-        if signature.key_id != remote_user.key_pair.remote_id:
-            if (
-                signature.key_id != f"{remote_user.remote_id}#main-key"
-            ):  # legacy Bookwyrm
-                raise ValueError("Wrong actor created signature.")
-
         try:
-            signature.verify(remote_user.key_pair.public_key, request)
+            signature.verify(public_key, request)
         except ValueError:
-            old_key = remote_user.key_pair.public_key
-            remote_user = activitypub.resolve_remote_id(
-                remote_user.remote_id, model=models.User, refresh=True
-            )
-            if remote_user.key_pair.public_key == old_key:
-                raise  # Key unchanged.
-            signature.verify(remote_user.key_pair.public_key, request)
+            # the key may have changed, but fetching it would hold up the response.
+            # the sender will try again, by which point the key will be updated
+            refresh_public_key(activity.get("actor"))
+            raise
     except (ValueError, requests.exceptions.HTTPError):
         return False
     return True
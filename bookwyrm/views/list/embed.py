@@ -1,7 +1,6 @@
 """ book list views"""
 from django.core.paginator import Paginator
-from django.db.models import Avg, DecimalField
-from django.db.models.functions import Coalesce
+from django.db.models import F
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
@@ -38,19 +37,18 @@ class EmbedList(View):
         directional_sort_by = {
             "order": "order",
             "title": "book__title",
-            "rating": "average_rating",
+            "rating": "book__parent_work__rating_aggregate__average",
         }[sort_by]
-        if direction == "descending":
+        if sort_by == "rating":
+            # unrated books sort as though they were rated zero
+            if direction == "descending":
+                directional_sort_by = F(directional_sort_by).desc(nulls_last=True)
+            else:
+                directional_sort_by = F(directional_sort_by).asc(nulls_first=True)
+        elif direction == "descending":
             directional_sort_by = "-" + directional_sort_by
 
         items = book_list.listitem_set.prefetch_related("user", "book", "book__authors")
-        if sort_by == "rating":
-            items = items.annotate(
-                average_rating=Avg(
-                    Coalesce("book__review__rating", 0.0),
-                    output_field=DecimalField(),
-                )
-            )
         items = items.filter(approved=True).order_by(directional_sort_by)
 
         paginated = Paginator(items, PAGE_LENGTH)
@@ -5,8 +5,7 @@ from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Avg, DecimalField, Q, Max
-from django.db.models.functions import Coalesce
+from django.db.models import F, Q, Max
 from django.http import HttpResponseBadRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.template.response import TemplateResponse
@@ -140,18 +139,16 @@ def sort_list(request, items):
     directional_sort_by = {
         "order": "order",
         "sort_title": "book__sort_title",
-        "rating": "average_rating",
+        "rating": "book__parent_work__rating_aggregate__average",
     }[sort_by]
-    if direction == "descending":
-        directional_sort_by = "-" + directional_sort_by
-
     if sort_by == "rating":
-        items = items.annotate(
-            average_rating=Avg(
-                Coalesce("book__review__rating", 0.0),
-                output_field=DecimalField(),
-            )
-        )
+        # unrated books sort as though they were rated zero
+        if direction == "descending":
+            directional_sort_by = F(directional_sort_by).desc(nulls_last=True)
+        else:
+            directional_sort_by = F(directional_sort_by).asc(nulls_first=True)
+    elif direction == "descending":
+        directional_sort_by = "-" + directional_sort_by
     return items.order_by(directional_sort_by)
 
 
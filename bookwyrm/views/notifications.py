@@ -1,10 +1,21 @@
 """ non-interactive pages """
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
 from django.contrib.auth.decorators import login_required
+from django.db.models import Count, OuterRef, Q, Subquery
 from django.template.response import TemplateResponse
 from django.utils.decorators import method_decorator
 from django.shortcuts import redirect
 from django.views import View
 
+from bookwyrm import models
+from bookwyrm.activitystreams import StreamPage
+from bookwyrm.models.notification import RELATED_USERS_PREVIEW_LENGTH
+
+NOTIFICATIONS_PAGE_LENGTH = 50
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
 
 # pylint: disable= no-self-use
 @method_decorator(login_required, name="dispatch")
@@ -14,9 +25,7 @@ class Notifications(View):
     def get(self, request, notification_type=None):
         """people are interacting with you, get hyped"""
         notifications = (
-            request.user.notification_set.all()
-            .order_by("-updated_date")
-            .select_related(
+            request.user.notification_set.select_related(
                 "related_status",
                 "related_status__reply_parent",
                 "related_group",
@@ -24,23 +33,110 @@ class Notifications(View):
             )
             .prefetch_related(
                 "related_reports",
-                "related_users",
                 "related_list_items",
             )
+            .annotate(related_user_count=Count("related_users"))
         )
         if notification_type == "mentions":
             notifications = notifications.filter(
                 notification_type__in=["REPLY", "MENTION", "TAG"]
             )
-        unread = [n.id for n in notifications.filter(read=False)[:50]]
+        page = get_notifications_page(
+            notifications,
+            before=get_cursor(request, "before"),
+            after=get_cursor(request, "after"),
+        )
+        prefetch_related_users(page)
+
+        # only the notifications being shown have been seen
+        unread = [n.id for n in page if not n.read]
         data = {
-            "notifications": notifications[:50],
+            "notifications": page,
             "unread": unread,
+            "path": request.path,
         }
-        notifications.update(read=True)
+        if unread:
+            models.Notification.mark_read(
+                request.user,
+                request.user.notification_set.filter(id__in=unread, read=False),
+            )
         return TemplateResponse(request, "notifications/notifications_page.html", data)
 
     def post(self, request):
         """permanently delete notification for user"""
         request.user.notification_set.filter(read=True).delete()
         return redirect("notifications")
+
+
+def get_notifications_page(notifications, before=None, after=None):
+    """a page of notifications, newest first, starting from a cursor"""
+    if after:
+        updated_date, notification_id = after
+        notifications = notifications.filter(
+            Q(updated_date__gt=updated_date)
+            | Q(updated_date=updated_date, id__gt=notification_id)
+        ).order_by("updated_date", "id")
+    else:
+        if before:
+            updated_date, notification_id = before
+            notifications = notifications.filter(
+                Q(updated_date__lt=updated_date)
+                | Q(updated_date=updated_date, id__lt=notification_id)
+            )
+        notifications = notifications.order_by("-updated_date", "-id")
+
+    # one extra, to find out if there's another page
+    page = list(notifications[: NOTIFICATIONS_PAGE_LENGTH + 1])
+    has_more = len(page) > NOTIFICATIONS_PAGE_LENGTH
+    page = page[:NOTIFICATIONS_PAGE_LENGTH]
+    if after:
+        page.reverse()
+
+    return StreamPage(
+        [
+            (notification, get_notification_cursor(notification))
+            for notification in page
+        ],
+        has_next=has_more if not after else True,
+        has_previous=has_more if after else bool(before),
+    )
+
+
+def prefetch_related_users(notifications):
+    """load the users shown with each notification in one query, instead of
+    every related user or one query per notification"""
+    through = models.Notification.related_users.through
+    recent = (
+        through.objects.filter(notification=OuterRef("notification"))
+        .order_by("-id")
+        .values("id")[:RELATED_USERS_PREVIEW_LENGTH]
+    )
+    previews = defaultdict(list)
+    for related in (
+        through.objects.filter(
+            notification__in=[n.id for n in notifications], id__in=Subquery(recent)
+        )
+        .select_related("user")
+        .order_by("-id")
+    ):
+        previews[related.notification_id].append(related.user)
+    for notification in notifications:
+        notification.related_users_preview = previews[notification.id]
+
+
+def get_notification_cursor(notification):
+    """where a notification is in the list, as a string for the query string"""
+    microseconds = (notification.updated_date - EPOCH) // timedelta(microseconds=1)
+    return f"{microseconds}_{notification.id}"
+
+
+def get_cursor(request, key):
+    """the date and id from a cursor in the query string, if there's a valid one"""
+    try:
+        microseconds, notification_id = request.GET.get(key).split("_")
+        return (
+            EPOCH + timedelta(microseconds=int(microseconds)),
+            int(notification_id),
+        )
+    except (AttributeError, ValueError, OverflowError):
+        return None
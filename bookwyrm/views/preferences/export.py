@@ -1,12 +1,12 @@
 """ Let users export their book data """
 from datetime import timedelta
 import csv
-import io
 
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db.models import Exists, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.http import HttpResponse, StreamingHttpResponse
 from django.template.response import TemplateResponse
 from django.utils import timezone
 from django.views import View
@@ -17,6 +17,15 @@ from bookwyrm import models
 from bookwyrm.models.bookwyrm_export_job import BookwyrmExportJob
 from bookwyrm.settings import PAGE_LENGTH
 
+# how many books are loaded at a time while streaming the csv export
+EXPORT_CHUNK_SIZE = 500
+# columns that are annotated under another name, because Edition already has
+# a "shelf" relation (from Shelf.books)
+EXPORT_ANNOTATION_NAMES = {
+    "shelf": "export_shelf",
+    "shelf_name": "export_shelf_name",
+}
+
 
 # pylint: disable=no-self-use,too-many-locals
 @method_decorator(login_required, name="dispatch")
@@ -29,116 +38,132 @@ class Export(View):
 
     def post(self, request):
         """Download the csv file of a user's book data"""
-        books = models.Edition.viewer_aware_objects(request.user)
-        books_shelves = books.filter(Q(shelves__user=request.user)).distinct()
-        books_readthrough = books.filter(Q(readthrough__user=request.user)).distinct()
-        books_review = books.filter(Q(review__user=request.user)).distinct()
-        books_comment = books.filter(Q(comment__user=request.user)).distinct()
-        books_quotation = books.filter(Q(quotation__user=request.user)).distinct()
-
-        books = set(
-            list(books_shelves)
-            + list(books_readthrough)
-            + list(books_review)
-            + list(books_comment)
-            + list(books_quotation)
+        return StreamingHttpResponse(
+            stream_book_data(request.user),
+            content_type="text/csv",
+            headers={
+                "Content-Disposition": 'attachment; filename="bookwyrm-export.csv"'
+            },
         )
 
-        csv_string = io.StringIO()
-        writer = csv.writer(csv_string)
 
-        deduplication_fields = [
-            f.name
-            for f in models.Edition._meta.get_fields()  # pylint: disable=protected-access
-            if getattr(f, "deduplication_field", False)
+class Echo:
+    """a file-like object that hands back what is written to it, so the csv writer
+    can be used to build rows for a streaming response"""
+
+    def write(self, value):
+        """return the row instead of storing it"""
+        return value
+
+
+def get_export_fields():
+    """the columns of the csv export"""
+    deduplication_fields = [
+        f.name
+        for f in models.Edition._meta.get_fields()  # pylint: disable=protected-access
+        if getattr(f, "deduplication_field", False)
+    ]
+    return (
+        ["title", "author_text"]
+        + deduplication_fields
+        + [
+            "start_date",
+            "finish_date",
+            "stopped_date",
+            "rating",
+            "review_name",
+            "review_cw",
+            "review_content",
+            "review_published",
+            "shelf",
+            "shelf_name",
+            "shelf_date",
         ]
-        fields = (
-            ["title", "author_text"]
-            + deduplication_fields
-            + [
-                "start_date",
-                "finish_date",
-                "stopped_date",
-                "rating",
-                "review_name",
-                "review_cw",
-                "review_content",
-                "review_published",
-                "shelf",
-                "shelf_name",
-                "shelf_date",
-            ]
+    )
+
+
+def get_export_books(user):
+    """every book the user has shelved, read, or written about, with the user's
+    latest activity for each book annotated on"""
+    book = OuterRef("pk")
+    readthrough = models.ReadThrough.objects.filter(user=user, book=book).order_by(
+        "-start_date", "-finish_date", "-id"
+    )
+    rating = models.Review.objects.filter(
+        user=user, book=book, rating__isnull=False
+    ).order_by("-published_date", "-id")
+    review = models.Review.objects.filter(
+        user=user, book=book, content__isnull=False
+    ).order_by("-published_date", "-id")
+    shelfbook = models.ShelfBook.objects.filter(user=user, book=book).order_by(
+        "shelved_date", "created_date", "updated_date", "id"
+    )
+
+    def latest(queryset, field):
+        """the value of a field from the first of the user's rows for a book"""
+        return Subquery(queryset.values(field)[:1])
+
+    return (
+        models.Edition.objects.filter(
+            Exists(shelfbook)
+            | Exists(readthrough)
+            | Exists(models.Review.objects.filter(user=user, book=book))
+            | Exists(models.Comment.objects.filter(user=user, book=book))
+            | Exists(models.Quotation.objects.filter(user=user, book=book))
         )
-        writer.writerow(fields)
-
-        for book in books:
-            # I think this is more efficient than doing a subquery in the view? but idk
-            review_rating = (
-                models.Review.objects.filter(
-                    user=request.user, book=book, rating__isnull=False
-                )
-                .order_by("-published_date")
-                .first()
-            )
-
-            book.rating = review_rating.rating if review_rating else None
-
-            readthrough = (
-                models.ReadThrough.objects.filter(user=request.user, book=book)
-                .order_by("-start_date", "-finish_date")
-                .first()
-            )
-            if readthrough:
-                book.start_date = (
-                    readthrough.start_date.date() if readthrough.start_date else None
-                )
-                book.finish_date = (
-                    readthrough.finish_date.date() if readthrough.finish_date else None
-                )
-                book.stopped_date = (
-                    readthrough.stopped_date.date()
-                    if readthrough.stopped_date
-                    else None
-                )
-
-            review = (
-                models.Review.objects.filter(
-                    user=request.user, book=book, content__isnull=False
-                )
-                .order_by("-published_date")
-                .first()
-            )
-            if review:
-                book.review_published = (
-                    review.published_date.date() if review.published_date else None
-                )
-                book.review_name = review.name
-                book.review_cw = review.content_warning
-                book.review_content = (
-                    review.raw_content if review.raw_content else review.content
-                )  # GoodReads imported reviews do not have raw_content, but content.
-
-            shelfbook = (
-                models.ShelfBook.objects.filter(user=request.user, book=book)
-                .order_by("-shelved_date", "-created_date", "-updated_date")
-                .last()
-            )
-            if shelfbook:
-                book.shelf = shelfbook.shelf.identifier
-                book.shelf_name = shelfbook.shelf.name
-                book.shelf_date = (
-                    shelfbook.shelved_date.date() if shelfbook.shelved_date else None
-                )
-
-            writer.writerow([getattr(book, field, "") or "" for field in fields])
-
-        return HttpResponse(
-            csv_string.getvalue(),
-            content_type="text/csv",
-            headers={
-                "Content-Disposition": 'attachment; filename="bookwyrm-export.csv"'
-            },
+        .annotate(
+            start_date=latest(readthrough, "start_date"),
+            finish_date=latest(readthrough, "finish_date"),
+            stopped_date=latest(readthrough, "stopped_date"),
+            rating=latest(rating, "rating"),
+            review_name=latest(review, "name"),
+            review_cw=latest(review, "content_warning"),
+            # GoodReads imported reviews do not have raw_content, but content.
+            review_content=Coalesce(
+                NullIf(
+                    latest(review, "raw_content"), Value("", output_field=TextField())
+                ),
+                latest(review, "content"),
+                output_field=TextField(),
+            ),
+            review_published=latest(review, "published_date"),
+            export_shelf=latest(shelfbook, "shelf__identifier"),
+            export_shelf_name=latest(shelfbook, "shelf__name"),
+            shelf_date=latest(shelfbook, "shelved_date"),
         )
+        .prefetch_related("authors")
+        .order_by("id")
+    )
+
+
+def stream_book_data(user):
+    """the csv export, a row at a time, loading books in chunks"""
+    writer = csv.writer(Echo())
+    fields = get_export_fields()
+    date_fields = {
+        "start_date",
+        "finish_date",
+        "stopped_date",
+        "review_published",
+        "shelf_date",
+    }
+    yield writer.writerow(fields)
+
+    books = get_export_books(user)
+    last_id = 0
+    while True:
+        chunk = list(books.filter(id__gt=last_id)[:EXPORT_CHUNK_SIZE])
+        for book in chunk:
+            row = []
+            for field in fields:
+                value = getattr(book, EXPORT_ANNOTATION_NAMES.get(field, field), "")
+                if field in date_fields and value:
+                    value = value.date()
+                row.append(value or "")
+            yield writer.writerow(row)
+        if len(chunk) < EXPORT_CHUNK_SIZE:
+            return
+        last_id = chunk[-1].id
 
 
 # pylint: disable=no-self-use
@@ -2,13 +2,16 @@
 
 import re
 
+from django.contrib.auth.decorators import login_required
 from django.contrib.postgres.search import TrigramSimilarity, SearchRank, SearchQuery
 from django.core.paginator import Paginator
 from django.db.models import F
 from django.db.models.functions import Greatest
 from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
 from django.views import View
+from django.views.decorators.http import require_GET
 
 from csp.decorators import csp_update
 
@@ -86,13 +89,38 @@ def book_search(request):
     }
     # if a logged in user requested remote results or got no local results, try remote
     if request.user.is_authenticated and (not local_results or search_remote):
-        data["remote_results"] = connector_manager.search(
-            query, min_confidence=min_confidence
-        )
         data["remote"] = True
+        if request.GET.get("wait"):
+            data["remote_results"] = connector_manager.search(
+                query, min_confidence=min_confidence
+            )
+        else:
+            # the page loads each connector's results as they come in
+            data["remote_connectors"] = connector_manager.get_search_connectors()
     return TemplateResponse(request, "search/book.html", data)
 
 
+@login_required
+@require_GET
+@csp_update(IMG_SRC="*")
+def remote_book_search(request, connector_id):
+    """one connector's results, to be added to the search page"""
+    query = isbn_check_and_format(request.GET.get("q"))
+    min_confidence = request.GET.get("min_confidence", 0)
+    connector_info = get_object_or_404(
+        connector_manager.get_search_connectors(), id=connector_id
+    )
+    connector = connector_manager.load_connector(connector_info)
+    results = connector_manager.search(
+        query, min_confidence=min_confidence, connectors=[connector]
+    )
+    return TemplateResponse(
+        request,
+        "search/remote_results.html",
+        {"result_set": results[0] if results else None},
+    )
+
+
 def author_search(request):
     """search for an author"""
     query = request.GET.get("q").strip()
@@ -9,10 +9,11 @@ from bookwyrm import activitystreams
 @login_required
 def get_notification_count(request):
     """any notifications waiting?"""
+    counts = request.user.get_unread_notification_counts()
     return JsonResponse(
         {
-            "count": request.user.unread_notification_count,
-            "has_mentions": request.user.has_unread_mentions,
+            "count": counts["unread"],
+            "has_mentions": counts["mentions"] > 0,
         }
     )
 
@@ -30,6 +30,7 @@ mypy \
 collectstatic_watch \
 populate_streams \
 populate_lists_streams \
+rebuild_audience_index \
 populate_suggestions \
 generate_thumbnails \
 generate_preview_images \
@@ -71,6 +72,7 @@ __bw_complete "$commands" "stylelint"                         "run SCSS linting
 __bw_complete "$commands" "formatters"                        "run multiple formatter tools"
 __bw_complete "$commands" "populate_streams"                  "populate the main streams"
 __bw_complete "$commands" "populate_lists_streams"            "populate streams for book lists"
+__bw_complete "$commands" "rebuild_audience_index"            "rebuild the redis follower/block sets used for feeds"
 __bw_complete "$commands" "populate_suggestions"              "populate book suggestions"
 __bw_complete "$commands" "generate_thumbnails"               "generate book thumbnails"
 __bw_complete "$commands" "generate_preview_images"           "generate site/book/user preview images"
@@ -94,6 +96,7 @@ __bw_complete_subcommand "up" -a "(docker-compose config --service)"
 __bw_complete_subcommand "pytest" -a "bookwyrm/tests/**.py"
 __bw_complete_subcommand "populate_streams" -a "--stream=" -d "pick a single stream to populate"
 __bw_complete_subcommand "populate_streams" -l stream -a "home local books"
+__bw_complete_subcommand "rebuild_audience_index" -l verify -d "check the index against the database instead of rebuilding"
 __bw_complete_subcommand "generate_preview_images" -a "--all"\
 	-d "Generates images for ALL types: site, users and books. Can use a lot of computing power."
 __bw_complete_subcommand "set_cors_to_s3" -a "**.json"
@@ -27,6 +27,7 @@ mypy
 collectstatic_watch
 populate_streams
 populate_lists_streams
+rebuild_audience_index
 populate_suggestions
 generate_thumbnails
 generate_preview_images